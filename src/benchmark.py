@@ -0,0 +1,406 @@
+"""
+処理速度の計測用スクリプト
+
+使い方:
+    python benchmark.py extract (PDFファイル) [--workers N] [--pages-per-shard N]
+    python benchmark.py twophase (PDFファイル)
+    python benchmark.py rules (PDFファイル) [--lines N] [--extra-rules N]
+    python benchmark.py classify (PDFファイル) [--lines N] [--workers N] [--lines-per-chunk N]
+    python benchmark.py submit [--units N] [--chars N] [--browser NAME]
+    python benchmark.py session [--sessions N] [--browser NAME] [--settle-secs N] (psutilが必要)
+"""
+import argparse
+import os
+import tempfile
+
+from concurrent.futures import ProcessPoolExecutor
+from data import Browser, default_settings
+from itertools import cycle, islice
+from pathlib import Path
+from pdfextractor import CountPDFPages, IterPDFPageLines, ScanPDFPageLines
+from pdfminer.high_level import extract_text
+from ruleset import ClassifyLines, RuleSet
+from time import perf_counter, sleep
+
+
+# 原文の入力の計測に用いる、DeepLのページの代わりのページ
+# 入力欄・出力欄はDeepLと同じクラスを持ち、入力されるたびに原文を大文字にしたものを訳文として出力する
+STAND_IN_PAGE = """<!DOCTYPE html>
+<html>
+<body>
+<textarea class="lmt__textarea lmt__source_textarea lmt__textarea_base_style"></textarea>
+<textarea class="lmt__textarea lmt__target_textarea lmt__textarea_base_style"></textarea>
+<script>
+var source = document.querySelector("textarea.lmt__source_textarea");
+var target = document.querySelector("textarea.lmt__target_textarea");
+source.addEventListener("input", function () { target.value = source.value.toUpperCase(); });
+</script>
+</body>
+</html>
+"""
+
+# 正規表現の数を増やした場合の計測に用いる、ヘッダやフッタなどによくある語
+SYNTHETIC_WORDS = ["Proceedings", "arXiv", "doi", "Journal", "Conference", "Copyright", "Preprint", "Vol", "Licensed", "Downloaded"]
+
+
+def DefaultRuleSet(name, extra_rules=0, target=None):
+    """
+    既定の設定における、指定の種類の正規表現をまとめたRuleSetを作る
+
+    Args:
+        name (string): 正規表現の種類(start_linesなど) 一段深いものは"replace_parts/standard"のように指定する
+        extra_rules (int, optional): 既定の正規表現の後ろに追加する、架空の正規表現の数
+        target (string, optional): 置換後の文字列 渡された場合は置換条件として扱う
+
+    Returns:
+        RuleSet: 有効な正規表現をコンパイルしてまとめたもの
+    """
+    subsettings = default_settings["regular_expressions"]
+    for key in name.split("/"):
+        subsettings = subsettings[key]
+    enabled_list = list(subsettings["list_bool_enabled"])
+    ignorecase_list = list(subsettings["list_bool_ignore_case"])
+    pattern_list = list(subsettings["list_str_pattern"])
+    for i in range(extra_rules):
+        enabled_list.append(True)
+        ignorecase_list.append(i % 2 == 0)
+        pattern_list.append(SYNTHETIC_WORDS[i % len(SYNTHETIC_WORDS)] + str(i) + r"\b.*\d+")
+    target_list = None if target is None else [target] * len(pattern_list)
+    return RuleSet(enabled_list, ignorecase_list, pattern_list, target_list)
+
+
+def Benchmark_Extract(args):
+    """
+    PDFからのテキスト抽出を、単一プロセスと複数プロセスで比較する
+    """
+    # 単一プロセスでの抽出
+    start = perf_counter()
+    serial = list(IterPDFPageLines(args.filename))
+    serial_secs = perf_counter() - start
+
+    # 複数プロセスでの抽出
+    start = perf_counter()
+    parallel = list(IterPDFPageLines(args.filename, workers=args.workers, pages_per_shard=args.pages_per_shard))
+    parallel_secs = perf_counter() - start
+
+    print("pages            : " + str(len(serial)))
+    print("serial           : {:.2f} s".format(serial_secs))
+    print("parallel         : {:.2f} s (workers={}, pages_per_shard={})".format(parallel_secs, args.workers, args.pages_per_shard))
+    print("speedup          : {:.2f}x".format(serial_secs / parallel_secs))
+    print("identical output : " + str(serial == parallel))
+
+
+def ExtractByStartEnd(lines, start_rules, end_rules):
+    """
+    抽出開始・終了条件のみで、抽出する行を選ぶ(抽出開始条件が有効な場合の、PDFTextExtractの行の選び方と同じ)
+
+    Args:
+        lines (iterable of string): 対象の行
+        start_rules (RuleSet): 抽出開始条件の正規表現
+        end_rules (RuleSet): 抽出終了条件の正規表現
+
+    Returns:
+        list of string: 抽出する行のリスト(空行は除く)
+    """
+    extracted = []
+    lines_extracting = False
+    for line in lines:
+        if line == "":
+            continue
+        if start_rules.Search(line) is not None:
+            lines_extracting = True
+        if end_rules.Search(line) is not None:
+            lines_extracting = False
+        if lines_extracting:
+            extracted.append(line)
+    return extracted
+
+
+def Benchmark_TwoPhase(args):
+    """
+    extract_textによる文書全体の抽出と、大まかな抽出で開始ページを探してから
+    そのページ以降(終了条件にヒットするまで)のみレイアウト解析を行う二段階の抽出を比較する
+    抽出開始・終了条件で選んだ行が、文書全体から選んだ場合と一致するかも確かめる
+    """
+    start_rules = DefaultRuleSet("start_lines")
+    end_rules = DefaultRuleSet("end_lines")
+
+    # 文書全体を一度に抽出
+    start = perf_counter()
+    single_lines = extract_text(args.filename).splitlines()
+    single_secs = perf_counter() - start
+
+    # 二段階の抽出
+    start = perf_counter()
+    # 1段階目: 大まかな抽出で抽出開始条件にヒットするページを探す
+    first_page = 0
+    for page_index, lines in ScanPDFPageLines(args.filename):
+        if any(start_rules.Search(line) is not None for line in lines):
+            first_page = page_index
+            break
+    scan_secs = perf_counter() - start
+    # 2段階目: そのページ以降を、抽出終了条件にヒットするまでレイアウト解析する
+    last_page = first_page
+    two_phase_lines = []
+    for page_index, lines in IterPDFPageLines(args.filename, range(first_page, CountPDFPages(args.filename))):
+        last_page = page_index
+        two_phase_lines.extend(lines)
+        if any(end_rules.Search(line) is not None for line in lines):
+            break
+    two_phase_secs = perf_counter() - start
+
+    # 抽出開始・終了条件で選んだ行を比べる
+    single_extracted = ExtractByStartEnd(single_lines, start_rules, end_rules)
+    two_phase_extracted = ExtractByStartEnd(two_phase_lines, start_rules, end_rules)
+
+    print("pages            : " + str(CountPDFPages(args.filename)))
+    print("laid out pages   : {}-{}".format(first_page + 1, last_page + 1))
+    print("extract_text     : {:.2f} s".format(single_secs))
+    print("two-phase        : {:.2f} s (scan {:.2f} s)".format(two_phase_secs, scan_secs))
+    print("speedup          : {:.2f}x".format(single_secs / two_phase_secs))
+    print("extracted lines  : {} (two-phase {})".format(len(single_extracted), len(two_phase_extracted)))
+    print("identical output : " + str(single_extracted == two_phase_extracted))
+
+
+def SearchSeparately(rules, string):
+    """
+    RuleSet.Searchと同じ結果を、正規表現を一つずつ調べて求める(比較用)
+    """
+    for rule in rules.rules:
+        if rule.regex.search(string):
+            return rule
+    return None
+
+
+def SubSeparately(rules, string):
+    """
+    RuleSet.Subと同じ結果を、正規表現を一つずつ調べて置換して求める(比較用)
+    """
+    for rule in rules.rules:
+        string = rule.regex.sub(rule.target, string)
+    return string
+
+
+def Benchmark_Rules(args):
+    """
+    行ごとの正規表現の判定と置換を、正規表現を一つずつ調べる場合と、RuleSetによる場合で比較する
+    PDFから抽出した行を繰り返して、指定の行数の文章とする
+    """
+    pdf_lines = [t for _, lines in IterPDFPageLines(args.filename) for t in lines if t != ""]
+    corpus = list(islice(cycle(pdf_lines), args.lines))
+
+    print("lines            : " + str(len(corpus)))
+    for name in ["start_lines", "end_lines", "ignore_lines", "chart_start_lines", "header_lines"]:
+        rules = DefaultRuleSet(name, args.extra_rules if name == "ignore_lines" else 0)
+
+        # 一つずつ調べる
+        start = perf_counter()
+        separate = [SearchSeparately(rules, t) for t in corpus]
+        separate_secs = perf_counter() - start
+
+        # RuleSetで調べる
+        start = perf_counter()
+        combined = [rules.Search(t) for t in corpus]
+        combined_secs = perf_counter() - start
+
+        print("{:<17}: {} rules, {:.0f} -> {:.0f} lines/s ({:.2f}x), identical: {}".format(
+            name, len(rules.rules), len(corpus) / separate_secs, len(corpus) / combined_secs,
+            separate_secs / combined_secs, separate == combined))
+
+    for name in ["replace_parts/standard", "replace_parts/markdown"]:
+        rules = DefaultRuleSet(name, args.extra_rules, target="")
+
+        # 一つずつ置換する
+        start = perf_counter()
+        separate = [SubSeparately(rules, t) for t in corpus]
+        separate_secs = perf_counter() - start
+
+        # RuleSetで置換する
+        start = perf_counter()
+        combined = [rules.Sub(t) for t in corpus]
+        combined_secs = perf_counter() - start
+
+        # 全体をまとめて置換する
+        start = perf_counter()
+        bulk = rules.SubLines(corpus)
+        bulk_secs = perf_counter() - start
+
+        print("{:<17}: {} rules, {:.0f} -> {:.0f} lines/s ({:.2f}x), bulk {:.0f} lines/s ({:.2f}x), identical: {}".format(
+            name.split("/")[1], len(rules.rules), len(corpus) / separate_secs, len(corpus) / combined_secs,
+            separate_secs / combined_secs, len(corpus) / bulk_secs, separate_secs / bulk_secs, separate == combined == bulk))
+
+
+def Benchmark_Classify(args):
+    """
+    開始・終了・無視条件による行の判定を、単一プロセスと複数プロセスで比較する
+    PDFから抽出した行を繰り返して、指定の行数の文章とする
+    """
+    pdf_lines = [t for _, lines in IterPDFPageLines(args.filename) for t in lines if t != ""]
+    corpus = list(islice(cycle(pdf_lines), args.lines))
+    rule_sets = [DefaultRuleSet(name) for name in ["start_lines", "end_lines", "ignore_lines"]]
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+
+    # 単一プロセスでの判定
+    start = perf_counter()
+    serial = ClassifyLines(rule_sets, corpus)
+    serial_secs = perf_counter() - start
+
+    # 複数プロセスでの判定(プロセスの起動も含む)
+    start = perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parallel = ClassifyLines(rule_sets, corpus, executor, args.lines_per_chunk)
+    parallel_secs = perf_counter() - start
+
+    # 複数プロセスの結果はプロセス間で受け渡した番号から対応させたものなので、パターンで比べる
+    def Patterns(results):
+        return [{i: rule.pattern for i, rule in hits.items()} for hits in results]
+
+    print("lines            : " + str(len(corpus)))
+    print("serial           : {:.2f} s".format(serial_secs))
+    print("parallel         : {:.2f} s (workers={}, lines_per_chunk={})".format(parallel_secs, workers, args.lines_per_chunk))
+    print("speedup          : {:.2f}x".format(serial_secs / parallel_secs))
+    print("identical output : " + str(Patterns(serial) == Patterns(parallel)))
+
+
+def Benchmark_Submit(args):
+    """
+    原文の入力にかかる時間を、send_keysによるキー入力とスクリプトによる入力で比較する
+    DeepLの代わりにローカルのページを開き、入力を始めてからページが原文全体を受け取るまでを1単位ごとに計る
+    """
+    # WebDriverを使わない計測でseleniumやwxを必要としないよう、ここで読み込む
+    from deeplmanager import CreateWebDriver, InputByScript, SOURCE_TEXTAREA, TARGET_TEXTAREA
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    sample = "The quick brown fox jumps over the lazy dog. "
+    units = []
+    for i in range(args.units):
+        # 単位ごとに異なる文にする
+        text = str(i) + " " + "".join(islice(cycle(sample), args.chars))
+        units.append(text[:args.chars])
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        page = Path(tmpdir) / "stand_in.html"
+        page.write_text(STAND_IN_PAGE, encoding="utf-8")
+        driver = CreateWebDriver(args.browser)
+        try:
+            driver.get(page.as_uri())
+            source = driver.find_element_by_css_selector(SOURCE_TEXTAREA)
+            target = driver.find_element_by_css_selector(TARGET_TEXTAREA)
+
+            def Submit(input_function):
+                secs = []
+                for text in units:
+                    start = perf_counter()
+                    input_function(text)
+                    WebDriverWait(driver, 600, poll_frequency=0.01).until(
+                        lambda d: target.get_property("value") == text.upper())
+                    secs.append(perf_counter() - start)
+                return secs
+
+            def SendKeys(text):
+                source.clear()
+                source.send_keys(text)
+
+            send_keys_secs = Submit(SendKeys)
+            script_secs = Submit(lambda text: InputByScript(driver, source, text))
+        finally:
+            driver.quit()
+
+    send_keys_mean = sum(send_keys_secs) / len(send_keys_secs)
+    script_mean = sum(script_secs) / len(script_secs)
+    print("units            : {} ({} chars each)".format(len(units), args.chars))
+    print("send_keys        : {:.3f} s/unit (max {:.3f} s)".format(send_keys_mean, max(send_keys_secs)))
+    print("script           : {:.3f} s/unit (max {:.3f} s)".format(script_mean, max(script_secs)))
+    print("speedup          : {:.2f}x".format(send_keys_mean / script_mean))
+
+
+def Benchmark_Session(args):
+    """
+    ウェブブラウザのセッション1つあたりのメモリ使用量とCPU時間を、通常の起動と軽量モードで比較する
+    セッションごとにDeepLを開いて短い文を翻訳させ、ドライバとウェブブラウザのプロセス全体を計る
+    """
+    import psutil
+    from deeplmanager import CreateWebDriver, InputByScript, SOURCE_TEXTAREA, TARGET_TEXTAREA
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    def Processes(driver):
+        # ドライバのプロセスと、そこから起動されたウェブブラウザのプロセス
+        root = psutil.Process(driver.service.process.pid)
+        return [root] + root.children(recursive=True)
+
+    for lightweight in [False, True]:
+        drivers = []
+        try:
+            start = perf_counter()
+            for _ in range(args.sessions):
+                drivers.append(CreateWebDriver(args.browser, lightweight))
+            for driver in drivers:
+                driver.get("https://www.deepl.com/translator")
+            for driver in drivers:
+                InputByScript(driver, driver.find_element_by_css_selector(SOURCE_TEXTAREA), "This is a test sentence.")
+            for driver in drivers:
+                WebDriverWait(driver, 60).until(
+                    lambda d: d.find_element_by_css_selector(TARGET_TEXTAREA).get_property("value") != "")
+            ready_secs = perf_counter() - start
+            sleep(args.settle_secs)
+
+            rss = 0
+            cpu_secs = 0.0
+            for driver in drivers:
+                for process in Processes(driver):
+                    try:
+                        rss += process.memory_info().rss
+                        times = process.cpu_times()
+                        cpu_secs += times.user + times.system
+                    except psutil.NoSuchProcess:
+                        pass
+        finally:
+            for driver in drivers:
+                driver.quit()
+
+        print("{:<17}: {:.0f} MB/session, {:.2f} CPU s/session, ready in {:.2f} s ({} sessions)".format(
+            "lightweight" if lightweight else "standard", rss / args.sessions / 2 ** 20,
+            cpu_secs / args.sessions, ready_secs, args.sessions))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DeepL PDF Translatorの各処理の速度を計測する")
+    subparsers = parser.add_subparsers(dest="target", required=True)
+
+    parser_extract = subparsers.add_parser("extract", help="PDFからのテキスト抽出")
+    parser_extract.add_argument("filename")
+    parser_extract.add_argument("--workers", type=int, default=0)
+    parser_extract.add_argument("--pages-per-shard", type=int, default=8)
+    parser_extract.set_defaults(func=Benchmark_Extract)
+
+    parser_two_phase = subparsers.add_parser("twophase", help="二段階の抽出")
+    parser_two_phase.add_argument("filename")
+    parser_two_phase.set_defaults(func=Benchmark_TwoPhase)
+
+    parser_rules = subparsers.add_parser("rules", help="正規表現による行の判定")
+    parser_rules.add_argument("filename")
+    parser_rules.add_argument("--lines", type=int, default=100000)
+    parser_rules.add_argument("--extra-rules", type=int, default=0)
+    parser_rules.set_defaults(func=Benchmark_Rules)
+
+    parser_classify = subparsers.add_parser("classify", help="開始・終了・無視条件による行の判定の並列化")
+    parser_classify.add_argument("filename")
+    parser_classify.add_argument("--lines", type=int, default=100000)
+    parser_classify.add_argument("--workers", type=int, default=0)
+    parser_classify.add_argument("--lines-per-chunk", type=int, default=5000)
+    parser_classify.set_defaults(func=Benchmark_Classify)
+
+    parser_submit = subparsers.add_parser("submit", help="原文の入力")
+    parser_submit.add_argument("--units", type=int, default=5)
+    parser_submit.add_argument("--chars", type=int, default=4500)
+    parser_submit.add_argument("--browser", choices=[b.value for b in Browser], default=Browser.CHROME.value)
+    parser_submit.set_defaults(func=Benchmark_Submit)
+
+    parser_session = subparsers.add_parser("session", help="ウェブブラウザのセッションのメモリ使用量とCPU時間")
+    parser_session.add_argument("--sessions", type=int, default=2)
+    parser_session.add_argument("--browser", choices=[b.value for b in Browser if b != Browser.REMOTE], default=Browser.CHROME.value)
+    parser_session.add_argument("--settle-secs", type=float, default=5.0)
+    parser_session.set_defaults(func=Benchmark_Session)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,106 @@
+"""
+翻訳に用いるウェブブラウザを常駐させるスクリプト
+
+ウェブブラウザを起動してDeepLのページを開いたまま待機し、その接続先をbrowser_daemon.jsonに記録する
+設定のweb_driver/bool_use_browser_daemonを有効にすると、DeepL PDF Translatorは
+ウェブブラウザを起動する代わりにこれに接続し、終了時も閉じずに接続を切るだけにする
+そのため、DeepL PDF Translatorを起動し直してもウェブブラウザの起動を待たずに済む
+プロファイルを保存するディレクトリを指定すれば、DeepLへのログインなども次回の常駐時に引き継がれる
+
+使い方:
+    python browserdaemon.py [--browser NAME] [--port N] [--profile DIR] [--lightweight]
+    Ctrl+Cで終了すると、ウェブブラウザを閉じて記録を削除する
+"""
+import argparse
+import json
+
+from data import Browser
+from deeplmanager import DAEMON_STATE_PATH, BrowserCapabilities, ResolveDriverPath
+from pathlib import Path
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.webdriver.firefox.service import Service as FirefoxService
+from settings import Settings
+from time import sleep
+
+
+def StartService(browser, port):
+    """
+    ドライバを、指定のポートで待ち受けるサーバとして起動する
+
+    Args:
+        browser (string): 使用するウェブブラウザ(Browserの値)
+        port (int): 待ち受けるポート
+
+    Returns:
+        Service: 起動したドライバ
+    """
+    driver_path = ResolveDriverPath(browser)
+    if browser == Browser.FIREFOX.value:
+        service = FirefoxService(driver_path, port=port)
+    else:
+        # Chromium版のEdgeのドライバはChromeのものと同じ引数で起動できる
+        service = ChromeService(driver_path, port=port)
+    service.start()
+    return service
+
+
+def IsAlive(driver):
+    """
+    Returns:
+        bool: ウェブブラウザが今も開いているならTrue
+    """
+    try:
+        driver.get_window_position()
+        return True
+    except WebDriverException:
+        return False
+
+
+def RunDaemon(args):
+    """
+    ウェブブラウザを起動してDeepLのページを開き、Ctrl+Cで終了するまで待機する
+    ウェブブラウザが閉じられた場合は開き直す
+    """
+    profile = None if args.profile == "" else Path(args.profile).resolve()
+    if profile is not None:
+        profile.mkdir(parents=True, exist_ok=True)
+    service = StartService(args.browser, args.port)
+    driver = None
+    try:
+        while True:
+            driver = webdriver.Remote(command_executor=service.service_url, desired_capabilities=BrowserCapabilities(args.browser, profile, args.lightweight))
+            driver.get("https://www.deepl.com/translator")
+            # 接続先を記録する
+            DAEMON_STATE_PATH.write_text(json.dumps({
+                "browser": args.browser,
+                "url": service.service_url,
+                "session_id": driver.session_id
+            }, indent=4), encoding="utf-8")
+            print(args.browser + "を常駐させました(" + service.service_url + ")。Ctrl+Cで終了します。")
+
+            while IsAlive(driver):
+                sleep(args.check_secs)
+            print(args.browser + "が閉じられたため、開き直します。")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if DAEMON_STATE_PATH.exists():
+            DAEMON_STATE_PATH.unlink()
+        if driver is not None and IsAlive(driver):
+            driver.quit()
+        service.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="翻訳に用いるウェブブラウザを常駐させる")
+    local_browsers = [b.value for b in Browser if b != Browser.REMOTE]
+    default_browser = Settings().web_browser if Settings().web_browser in local_browsers else Browser.FIREFOX.value
+    parser.add_argument("--browser", choices=local_browsers, default=default_browser)
+    parser.add_argument("--port", type=int, default=9515)
+    parser.add_argument("--profile", default="browser_profile", help="プロファイルを保存するディレクトリ 空なら一時的なプロファイルを用いる")
+    parser.add_argument("--lightweight", action="store_true", help="ウインドウを表示せず、画像やWebフォントを読み込まない")
+    parser.add_argument("--check-secs", type=float, default=5.0, help="ウェブブラウザが閉じられていないか確かめる間隔")
+    args = parser.parse_args()
+    RunDaemon(args)
@@ -17,12 +17,15 @@ class MainWindow_MenuBar_Menu(Enum):
 
 class RegularExpressionsWindow_MenuBar_Menu(Enum):
     SHOW_MARKDOWN_SETTINGS = 1
+    PROFILE_RULES = 2
+    SHOW_RULE_PROFILE = 3
 
 
 class Browser(Enum):
     CHROME = "Chrome"
     EDGE = "Edge"
     FIREFOX = "FireFox"
+    REMOTE = "Remote"
 
 
 class Target_Lang(Enum):
@@ -220,8 +223,41 @@ default_settings = {
     "bool_output_type_markdown": True,
     "bool_output_source": True,
     "bool_source_as_comment": True,
+    "pdf_extraction": {
+        "int_parallel_workers": 1,
+        "int_pages_per_shard": 8,
+        "int_lines_per_chunk": 5000,
+        "bool_use_cache": True,
+        "int_cache_size_mb": 200,
+        "bool_stop_at_end_condition": False,
+        "bool_use_outline": False,
+        "bool_two_phase_extraction": False,
+        "bool_bulk_replace": True,
+        "bool_output_report": False
+    },
+    "web_driver": {
+        "int_session_pool_size": 2,
+        "int_session_idle_secs": 300,
+        "int_tabs_per_session": 1,
+        "bool_use_browser_daemon": False,
+        "str_remote_browser": Browser.CHROME.value,
+        "list_str_remote_urls": [
+            "http://localhost:4444/wd/hub"
+        ],
+        "list_int_remote_max_sessions": [
+            2
+        ],
+        "int_remote_retry_secs": 300,
+        "bool_lightweight_browser": False,
+        "str_browser_profile_dir": "browser_profiles",
+        "str_chrome_driver_path": "",
+        "str_edge_driver_path": "",
+        "str_firefox_driver_path": ""
+    },
     "regular_expressions": {
         "bool_show_markdown_settings": True,
+        "bool_profile_rules": False,
+        "int_rule_time_budget_ms": 2000,
         "start_lines": {
             "bool_enabled_overall": True,
             "bool_output_hit_lines": False,
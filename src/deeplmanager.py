@@ -1,41 +1,545 @@
+import json
 import re
 import selenium.common.exceptions as sce
+import urllib3
 import wx
 
+from contextlib import contextmanager
 from data import Browser
+from drivercache import BrowserVersion, DriverCache
+from pathlib import Path
 from re import search
 from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.support.ui import WebDriverWait
 from settings import Settings
 from sys import stderr
-from time import sleep
+from threading import Condition, Event, Lock, Thread
+from time import monotonic, sleep
 from webdriver_manager.chrome import ChromeDriverManager
 from webdriver_manager.firefox import GeckoDriverManager
 from webdriver_manager.microsoft import EdgeChromiumDriverManager
 
 
+# 原文の入力欄・訳文の出力欄・翻訳の進行度を示すポップアップのCSSセレクタ
+# ポップアップは通常時はdiv.lmt_progress_popupだが、可視化するときは
+# lmt_progress_popup--visible(_2)が追加される
+SOURCE_TEXTAREA = "textarea.lmt__textarea.lmt__source_textarea.lmt__textarea_base_style"
+TARGET_TEXTAREA = "textarea.lmt__textarea.lmt__target_textarea.lmt__textarea_base_style"
+PROGRESS_POPUP = "div.lmt__progress_popup.lmt__progress_popup--visible.lmt__progress_popup--visible_2"
+
+# 入力欄の値を一度に書き換え、キー入力したときと同じくページに入力を通知するスクリプト
+# ページ側のフレームワークが値の変化を検知できるよう、要素ではなくプロトタイプのsetterで書き換える
+INPUT_SCRIPT = """
+var textarea = arguments[0];
+var setter = Object.getOwnPropertyDescriptor(HTMLTextAreaElement.prototype, "value").set;
+textarea.focus();
+setter.call(textarea, arguments[1]);
+textarea.dispatchEvent(new Event("input", {bubbles: true}));
+textarea.dispatchEvent(new Event("change", {bubbles: true}));
+"""
+
+
+# 常駐させたウェブブラウザ(browserdaemon.py)の接続先を記録するファイル
+DAEMON_STATE_PATH = Path("browser_daemon.json")
+
+
+# ウェブブラウザごとの、ドライバを求めるwebdriver_managerのクラス
+DRIVER_MANAGERS = {
+    Browser.CHROME.value: ChromeDriverManager,
+    Browser.EDGE.value: EdgeChromiumDriverManager,
+    Browser.FIREFOX.value: GeckoDriverManager
+}
+
+# ドライバのパスのキャッシュ
+# 複数のセッションを同時に作成してもwebdriver_managerでの問い合わせが重複しないよう、ロックして求める
+_driver_cache = DriverCache()
+_driver_lock = Lock()
+
+
+def ResolveDriverPath(browser_setting, refresh=False):
+    """
+    指定のウェブブラウザのドライバの実行ファイルのパスを求める
+    設定でパスが指定されていればそれを使う
+    そうでなければウェブブラウザのバージョンごとにキャッシュしたものを使い、キャッシュに無い場合のみ
+    webdriver_managerで求める(webdriver_managerのおかげで自動でダウンロードしてくれる)
+
+    Args:
+        browser_setting (string): 使用するウェブブラウザ(Browserの値)
+        refresh (bool, optional): Trueならキャッシュを使わず、ウェブブラウザのバージョンも調べ直して求める
+
+    Returns:
+        string: ドライバのパス 無効なウェブブラウザが指定された場合はNone
+    """
+    if browser_setting not in DRIVER_MANAGERS:
+        return None
+    driver_paths = {
+        Browser.CHROME.value: Settings.WebDriver().chrome_driver_path,
+        Browser.EDGE.value: Settings.WebDriver().edge_driver_path,
+        Browser.FIREFOX.value: Settings.WebDriver().firefox_driver_path
+    }
+    if driver_paths[browser_setting] != "":
+        return driver_paths[browser_setting]
+
+    with _driver_lock:
+        version = BrowserVersion(browser_setting, refresh)
+        if not refresh:
+            driver_path = _driver_cache.Lookup(browser_setting, version)
+            if driver_path is not None:
+                return driver_path
+        driver_path = DRIVER_MANAGERS[browser_setting]().install()
+        _driver_cache.Store(browser_setting, version, driver_path)
+        return driver_path
+
+
+# 軽量モードでのウインドウの大きさ DeepLのページがスマートフォン向けの表示にならない程度に小さくする
+LIGHTWEIGHT_WINDOW_SIZE = (1024, 768)
+
+
+def BrowserCapabilities(browser, profile=None, lightweight=False):
+    """
+    ウェブブラウザのセッションを作成するときに渡す設定を作る
+
+    Args:
+        browser (string): 使用するウェブブラウザ(RemoteではないBrowserの値)
+        profile (Path, optional): プロファイルを保存するディレクトリ Noneなら一時的なプロファイルを用いる
+        lightweight (bool, optional): Trueならウインドウを表示せず(ヘッドレス)、画像やWebフォントを読み込まず、
+            ページの読み込みはDOMの構築が終わった時点で完了と見なす
+
+    Returns:
+        dict: セッションの設定
+    """
+    width, height = LIGHTWEIGHT_WINDOW_SIZE
+    if browser == Browser.FIREFOX.value:
+        options = webdriver.FirefoxOptions()
+        if profile is not None:
+            options.add_argument("-profile")
+            options.add_argument(str(profile))
+        if lightweight:
+            options.headless = True
+            options.add_argument("--width=" + str(width))
+            options.add_argument("--height=" + str(height))
+            # 画像とWebフォントを読み込まない
+            options.set_preference("permissions.default.image", 2)
+            options.set_preference("gfx.downloadable_fonts.enabled", False)
+            options.set_preference("browser.display.use_document_fonts", 0)
+        capabilities = options.to_capabilities()
+    else:
+        args = [] if profile is None else ["--user-data-dir=" + str(profile)]
+        prefs = {}
+        if lightweight:
+            args += [
+                "--headless",
+                "--disable-gpu",
+                "--window-size=" + str(width) + "," + str(height),
+                "--blink-settings=imagesEnabled=false",
+                "--disable-remote-fonts",
+                "--disable-extensions",
+                "--mute-audio"
+            ]
+            prefs["profile.managed_default_content_settings.images"] = 2
+        if browser == Browser.EDGE.value:
+            # Chromium版のEdgeは、Chromeと同じ引数をms:edgeOptionsで受け取る
+            edge_options = {"args": args}
+            if len(prefs) > 0:
+                edge_options["prefs"] = prefs
+            capabilities = {"browserName": "MicrosoftEdge", "ms:edgeOptions": edge_options}
+        else:
+            options = webdriver.ChromeOptions()
+            for arg in args:
+                options.add_argument(arg)
+            if len(prefs) > 0:
+                options.add_experimental_option("prefs", prefs)
+            capabilities = options.to_capabilities()
+    if lightweight:
+        capabilities["pageLoadStrategy"] = "eager"
+    return capabilities
+
+
+def CreateWebDriver(browser_setting, lightweight=False, profile=None):
+    """
+    指定のウェブブラウザのWebDriverを起動する
+    Remoteが指定された場合は、Remote WebDriverのノードにセッションを作成する
+
+    Args:
+        browser_setting (string): 使用するウェブブラウザ(Browserの値)
+        lightweight (bool, optional): 軽量モードで起動するか(BrowserCapabilitiesを参照)
+        profile (Path, optional): プロファイルを保存するディレクトリ Remoteでは用いない
+
+    Returns:
+        WebDriver: 起動したWebDriver 無効なウェブブラウザが指定された場合はNone
+    """
+    if browser_setting == Browser.REMOTE.value:
+        return _remote_nodes.CreateWebDriver(BrowserCapabilities(Settings.WebDriver().remote_browser, lightweight=lightweight))
+    driver_path = ResolveDriverPath(browser_setting)
+    if driver_path is None:
+        return None
+    try:
+        return _StartWebDriver(browser_setting, driver_path, BrowserCapabilities(browser_setting, profile, lightweight))
+    except sce.SessionNotCreatedException:
+        # ウェブブラウザが更新されて、キャッシュしたドライバが対応しなくなった可能性がある
+        # ドライバを求め直し、変わっていればもう一度試す
+        new_driver_path = ResolveDriverPath(browser_setting, refresh=True)
+        if new_driver_path == driver_path:
+            raise
+        return _StartWebDriver(browser_setting, new_driver_path, BrowserCapabilities(browser_setting, profile, lightweight))
+
+
+def _StartWebDriver(browser_setting, driver_path, capabilities):
+    """
+    ドライバを指定して、ローカルのウェブブラウザのWebDriverを起動する
+
+    Args:
+        browser_setting (string): 使用するウェブブラウザ(RemoteではないBrowserの値)
+        driver_path (string): ドライバのパス
+        capabilities (dict): セッションの設定
+
+    Returns:
+        WebDriver: 起動したWebDriver
+    """
+    if browser_setting == Browser.CHROME.value:
+        return webdriver.Chrome(driver_path, desired_capabilities=capabilities)
+    elif browser_setting == Browser.EDGE.value:
+        return webdriver.Edge(driver_path, capabilities=capabilities)
+    else:
+        # Firefoxはなぜかexecutable_pathで指定しないとエラーが起きる
+        return webdriver.Firefox(executable_path=driver_path, desired_capabilities=capabilities)
+
+
+# 軽量モードのセッションが使用中のプロファイルのディレクトリ
+# 同じディレクトリを複数のウェブブラウザで同時に使うことはできないので、セッションごとに分ける
+_profiles_in_use = set()
+_profiles_lock = Lock()
+
+
+def _AcquireProfile():
+    """
+    使用中でないプロファイルのディレクトリを確保する
+
+    Returns:
+        Path: プロファイルのディレクトリ 設定でディレクトリが指定されていなければNone
+    """
+    root = Settings.WebDriver().browser_profile_dir
+    if root == "":
+        return None
+    with _profiles_lock:
+        n = 0
+        while Path(root, "session_" + str(n)).resolve() in _profiles_in_use:
+            n += 1
+        profile = Path(root, "session_" + str(n)).resolve()
+        _profiles_in_use.add(profile)
+    profile.mkdir(parents=True, exist_ok=True)
+    return profile
+
+
+def _ReleaseProfile(profile):
+    """
+    確保したプロファイルのディレクトリを、他のセッションが使えるようにする
+
+    Args:
+        profile (Path): _AcquireProfileで確保したディレクトリ Noneなら何もしない
+    """
+    with _profiles_lock:
+        _profiles_in_use.discard(profile)
+
+
+class RemoteNodes:
+    """
+    Remote WebDriver(Selenium Gridなど)のノードの一覧
+
+    ノードごとの同時セッション数の上限を守りつつ、上限に対して使用中のセッションが少ないノードから順に
+    セッションを作成する 応答しなくなったノードは一定時間候補から外す
+    ノードのURLと上限は、その都度設定から読み込む
+    """
+    def __init__(self):
+        self.__condition = Condition()
+        # ノードのURLごとの、使用中のセッション数と、候補から外した時刻
+        self.__sessions = {}
+        self.__evicted = {}
+        # セッションのIDごとの、そのセッションを作成したノードのURL
+        self.__nodesBySession = {}
+
+    @staticmethod
+    def Nodes():
+        """
+        Returns:
+            list of (string, int): 設定されたノードのURLと同時セッション数の上限のリスト
+        """
+        urls = Settings.WebDriver().remote_urls
+        max_sessions = Settings.WebDriver().remote_max_sessions
+        return [(url, max(1, max_sessions[i] if i < len(max_sessions) else 1)) for i, url in enumerate(urls)]
+
+    def Capacity(self):
+        """
+        Returns:
+            int: 設定された全てのノードの同時セッション数の上限の合計
+        """
+        return sum(limit for _, limit in RemoteNodes.Nodes())
+
+    def CreateWebDriver(self, capabilities):
+        """
+        上限に対して使用中のセッションが少ないノードにセッションを作成する
+        全てのノードが上限に達しているなら、セッションが閉じられるまで待つ
+        セッションを作成できなかったノードは候補から外し、次のノードを試す
+
+        Args:
+            capabilities (dict): セッションの設定
+
+        Returns:
+            WebDriver: 作成したセッションのWebDriver
+        """
+        tried = set()
+        while True:
+            with self.__condition:
+                candidates = [(url, limit) for url, limit in RemoteNodes.Nodes() if url not in tried and not self.__IsEvicted(url)]
+                if len(candidates) == 0:
+                    raise sce.WebDriverException("No Remote WebDriver node is available.")
+                free = [(self.__sessions.get(url, 0) / limit, url) for url, limit in candidates if self.__sessions.get(url, 0) < limit]
+                if len(free) == 0:
+                    # 候補から外したノードは、一定時間が経てば閉じられるセッションが無くても使えるようになるので、
+                    # それまでに閉じられなければ候補を選び直す
+                    self.__condition.wait(self.__SecondsUntilRetry(tried))
+                    continue
+                _, url = min(free)
+                self.__sessions[url] = self.__sessions.get(url, 0) + 1
+            # セッションの作成には時間がかかるので、ロックの外で行う
+            try:
+                driver = webdriver.Remote(command_executor=url, desired_capabilities=capabilities)
+            except (sce.WebDriverException, urllib3.exceptions.HTTPError, OSError):
+                self.__Release(url)
+                self.Evict(url)
+                tried.add(url)
+                continue
+            with self.__condition:
+                self.__nodesBySession[driver.session_id] = url
+            return driver
+
+    def Release(self, driver, alive=True):
+        """
+        閉じたセッションの分だけ、そのノードで新たなセッションを作成できるようにする
+        セッションが閉じられる前に応答しなくなっていた場合は、ノードが応答するか確かめ、
+        応答しなければ候補から外す
+
+        Args:
+            driver (WebDriver): CreateWebDriverで作成したセッションのWebDriver
+            alive (bool, optional): セッションが閉じる直前まで応答していたか
+        """
+        with self.__condition:
+            url = self.__nodesBySession.pop(driver.session_id, None)
+        if url is None:
+            return
+        # 待っているセッションの作成が応答しないノードで行われないよう、先に候補から外しておく
+        if not alive and not RemoteNodes.IsReachable(url):
+            self.Evict(url)
+        self.__Release(url)
+
+    def Evict(self, url):
+        """
+        ノードを一定時間候補から外す
+
+        Args:
+            url (string): ノードのURL
+        """
+        with self.__condition:
+            self.__evicted[url] = monotonic()
+            self.__condition.notify_all()
+        print("Remote WebDriver node " + url + " is not responding.", file=stderr)
+
+    @staticmethod
+    def IsReachable(url, timeout_secs=3):
+        """
+        Args:
+            url (string): ノードのURL
+            timeout_secs (int, optional): 応答しないと見なす時間
+
+        Returns:
+            bool: ノードが応答するならTrue
+        """
+        try:
+            response = urllib3.PoolManager(timeout=timeout_secs, retries=False).request("GET", url.rstrip("/") + "/status")
+            return response.status < 500
+        except urllib3.exceptions.HTTPError:
+            return False
+
+    def __IsEvicted(self, url):
+        return url in self.__evicted and monotonic() - self.__evicted[url] < Settings.WebDriver().remote_retry_secs
+
+    def __SecondsUntilRetry(self, tried):
+        """
+        Args:
+            tried (set of string): 今回のセッションの作成で既に試したノードのURL
+
+        Returns:
+            float: 候補から外したノードのうち、最も早く候補に戻るものが戻るまでの秒数 無ければNone
+        """
+        now = monotonic()
+        retry_secs = Settings.WebDriver().remote_retry_secs
+        remaining = [
+            self.__evicted[url] + retry_secs - now for url, _ in RemoteNodes.Nodes()
+            if url not in tried and self.__IsEvicted(url)]
+        return max(0, min(remaining)) if len(remaining) > 0 else None
+
+    def __Release(self, url):
+        with self.__condition:
+            self.__sessions[url] -= 1
+            self.__condition.notify_all()
+
+
+# 全ての翻訳で共有するRemote WebDriverのノードの一覧
+_remote_nodes = RemoteNodes()
+
+
+class _AttachedRemote(webdriver.Remote):
+    """
+    新たなセッションを作らず、既に開いているセッションに接続するRemote WebDriver
+    """
+    def __init__(self, command_executor, session_id):
+        """
+        Args:
+            command_executor (string): ドライバのURL
+            session_id (string): 接続するセッションのID
+        """
+        self.__sessionId = session_id
+        super().__init__(command_executor=command_executor, desired_capabilities={})
+
+    def start_session(self, capabilities, browser_profile=None):
+        self.session_id = self.__sessionId
+        self.capabilities = {}
+        self.w3c = True
+
+
+# 常駐させたウェブブラウザにこのプロセスのDeepLManagerが接続しているか
+# 1つのウェブブラウザを複数のDeepLManagerで同時に操作すると、タブの切り替えなどが衝突する
+_daemon_attached = False
+_daemon_lock = Lock()
+
+
+def AttachBrowserDaemon(browser_setting):
+    """
+    常駐させたウェブブラウザ(browserdaemon.py)に接続する
+
+    Args:
+        browser_setting (string): 使用するウェブブラウザ(Browserの値)
+
+    Returns:
+        WebDriver: 接続したWebDriver
+        常駐させていない、ウェブブラウザが異なる、既に接続している、応答しないといった場合はNone
+    """
+    global _daemon_attached
+    if not Settings.WebDriver().use_browser_daemon or not DAEMON_STATE_PATH.exists():
+        return None
+    try:
+        state = json.loads(DAEMON_STATE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if state.get("browser") != browser_setting:
+        return None
+
+    with _daemon_lock:
+        if _daemon_attached:
+            return None
+        try:
+            driver = _AttachedRemote(state["url"], state["session_id"])
+            # 応答するか確かめる
+            driver.get_window_position()
+        except (KeyError, sce.WebDriverException, urllib3.exceptions.HTTPError):
+            return None
+        _daemon_attached = True
+    return driver
+
+
+def DetachBrowserDaemon():
+    """
+    常駐させたウェブブラウザとの接続を切る ウェブブラウザは閉じない
+    """
+    global _daemon_attached
+    with _daemon_lock:
+        _daemon_attached = False
+
+
+def InputByScript(driver, textarea, text):
+    """
+    入力欄の値をスクリプトで一度に書き換える
+    send_keysのように一文字ずつキー入力しないので、長い文でもすぐに入力が終わる
+
+    Args:
+        driver (WebDriver): 入力欄のあるページを開いているWebDriver
+        textarea (WebElement): 入力欄
+        text (string): 入力する文字列
+    """
+    driver.execute_script(INPUT_SCRIPT, textarea, text)
+
+
+class _Tab:
+    """
+    DeepLManagerが開いたDeepLのタブ
+    """
+    def __init__(self, handle):
+        """
+        Args:
+            handle (string): タブのウインドウハンドル
+        """
+        self.handle = handle
+        # 選択済みの訳文の言語
+        self.language = None
+        # 直前に翻訳した原文
+        self.last_source = None
+        # 翻訳中の原文の番号と原文、入力前の訳文、翻訳が不可能であったと見なす時刻
+        self.index = None
+        self.text = None
+        self.previous = None
+        self.deadline = 0.0
+        # 原文の入力後に、ページが反応した(ポップアップが現れたか、訳文が入力前のものから変わった)か
+        self.reacted = False
+        # 最後に見た訳文と、それを最初に見た時刻
+        self.stable_value = None
+        self.stable_since = 0.0
+
+
 # DeepLでの翻訳を管理する
 class DeepLManager:
     def __init__(self):
         browser_setting = Settings().web_browser
+        # 常駐させたウェブブラウザに接続できればそれを使う
+        self.__webDriver = AttachBrowserDaemon(browser_setting)
+        # 常駐させたウェブブラウザに接続したか(その場合は閉じずに接続を切るだけにする)
+        self.attached = self.__webDriver is not None
+        # 軽量モードで起動したか 軽量モードではセッションごとのプロファイルのディレクトリを使い回す
+        self.lightweight = Settings.WebDriver().lightweight_browser and not self.attached
+        self.__profile = None
         try:
-            # 使用するウェブブラウザの設定に沿ってWebDriverを取得
-            # webdriver_managerのおかげで自動でダウンロードしてくれる
-            if browser_setting == Browser.CHROME.value:
-                self.__webDriver = webdriver.Chrome(ChromeDriverManager().install())
-            elif browser_setting == Browser.EDGE.value:
-                self.__webDriver = webdriver.Edge(EdgeChromiumDriverManager().install())
-            elif browser_setting == Browser.FIREFOX.value:
-                # Firefoxはなぜかexecutable_pathで指定しないとエラーが起きる
-                self.__webDriver = webdriver.Firefox(executable_path=GeckoDriverManager().install())
-            else:
+            # そうでなければ使用するウェブブラウザの設定に沿ってWebDriverを起動
+            if not self.attached:
+                if self.lightweight and browser_setting != Browser.REMOTE.value:
+                    self.__profile = _AcquireProfile()
+                self.__webDriver = CreateWebDriver(browser_setting, self.lightweight, self.__profile)
+            if self.__webDriver is None:
                 # 設定が壊れているなどで無効な値のときはエラーを発生させる
+                _ReleaseProfile(self.__profile)
                 DeepLManager.invalidBrowser()
         except sce.WebDriverException:
+            _ReleaseProfile(self.__profile)
+            if browser_setting == Browser.REMOTE.value:
+                # Remoteなら、どのノードにもセッションを作成できなかった
+                wx.LogError("Remote WebDriverのどのノードにも接続できませんでした。\n\n設定ファイル(settings.json)のweb_driverにあるノードのURLを確認してください。")
+                exit(1)
             # この状況でこの例外が発生するなら、指定のウェブブラウザがインストールされていない
             wx.LogError(browser_setting + "がインストールされていません。\n\n" + browser_setting + "をインストールするか、インストール済みの他の対応Webブラウザを選択してください。")
             exit(1)
 
+        # 起動したウェブブラウザ(Browserの値)
+        self.browser = browser_setting
+
         self.__webDriverRect = self.__webDriver.get_window_rect()
+        # 並行して翻訳に用いるDeepLのタブの数と、開いたタブ
+        self.tabs = max(1, Settings.WebDriver().tabs_per_session)
+        self.__tabs = []
+        # 今開いているタブのウインドウハンドル
+        self.__currentHandle = None
+        # 原文をスクリプトで入力するか
+        # Noneならまだページが反応するか確かめておらず、反応しなかった場合はFalseにしてキー入力に切り替える
+        self.__scriptInput = None
 
     def __isWebDriverAlive(self):
         """
@@ -53,111 +557,293 @@ class DeepLManager:
         except sce.WebDriverException:
             return False
 
+    def isAlive(self):
+        """
+        ウェブブラウザが今も開いているか確認する
+
+        Returns:
+            bool: WebDriverが閉じられていないならTrue
+        """
+        return self.__isWebDriverAlive()
+
     @staticmethod
     def invalidBrowser():
         wx.LogError("ブラウザの指定が無効な値です。")
         exit(1)
 
-    def openDeepLPage(self):
+    def openDeepLPage(self, tab_index=0):
         """
         DeepLのタブを開く
+        一度開いたタブはハンドルと選択した訳文の言語を覚えておき、次からはそのタブに切り替えるだけにする
+
+        Args:
+            tab_index (int, optional): 何番目のDeepLのタブを開くか
+
+        Returns:
+            _Tab: 開いたタブ
+        """
+        while len(self.__tabs) <= tab_index:
+            self.__tabs.append(None)
+        tab = self.__tabs[tab_index]
+        if tab is not None and tab.handle != self.__currentHandle:
+            try:
+                self.__webDriver.switch_to.window(tab.handle)
+            except sce.NoSuchWindowException:
+                # タブが閉じられていたら開き直す
+                tab = None
+        if tab is None:
+            tab = _Tab(self.__openDeepLTab())
+            self.__tabs[tab_index] = tab
+        self.__currentHandle = tab.handle
+
+        # 訳文の言語を選択していないか、設定が変わっていれば選択する
+        language = Settings().target_language_for_translate
+        if tab.language != language:
+            # 訳文の言語を選択するタブを開く
+            # 軽量モードではページのスクリプトの実行が終わる前に読み込みが完了したと見なされるので、押せるようになるまで待つ
+            WebDriverWait(self.__webDriver, 10).until(expected_conditions.element_to_be_clickable(
+                (By.XPATH, "//button[@dl-test='translator-target-lang-btn']"))).click()
+            # 訳文の言語のボタンが押せるようになったら押す
+            WebDriverWait(self.__webDriver, 10).until(expected_conditions.element_to_be_clickable(
+                (By.XPATH, "//button[@dl-test='translator-lang-option-" + language + "']"))).click()
+            tab.language = language
+        return tab
+
+    def __openDeepLTab(self):
         """
-        # 今のタブがDeepLなら何もしない
+        まだ使っていないDeepLのタブに移動する 無ければ新たに開く
+
+        Returns:
+            string: 移動したタブのウインドウハンドル
+        """
+        used = [tab.handle for tab in self.__tabs if tab is not None]
+
+        # 今のタブがDeepLならそれを使う
         try:
-            if search(r"^https://www.deepl.com/translator", self.__webDriver.current_url):
-                return
+            if self.__webDriver.current_window_handle not in used and search(r"^https://www.deepl.com/translator", self.__webDriver.current_url):
+                return self.__webDriver.current_window_handle
         except AttributeError:
             print("Error: webDriver is not initiated.", file=stderr)
             exit(1)
 
-        # 他のタブにそのページがあるならそれを開いて終わり
-        for tab in self.__webDriver.window_handles:
-            self.__webDriver.switch_to.window(tab)
-            if self.__webDriver.current_url == "https://www.deepl.com/translator":
-                return
+        # 他のタブにそのページがあるならそれを使う
+        # 常駐させたウェブブラウザでは、前に翻訳に用いたタブも使い回す
+        for handle in self.__webDriver.window_handles:
+            if handle in used:
+                continue
+            self.__webDriver.switch_to.window(handle)
+            if search(r"^https://www.deepl.com/translator", self.__webDriver.current_url):
+                return handle
 
         # もしDeepLのページを開いているタブが無ければ新たに開く
         # 新しいタブを開き、そのタブに移動
         self.__webDriver.execute_script("window.open('', '_blank');")
-        self.__webDriver.switch_to.window(self.__webDriver.window_handles[-1])
+        handle = self.__webDriver.window_handles[-1]
+        self.__webDriver.switch_to.window(handle)
 
         # 自動的に最小化する設定なら、このタイミングで最小化する
         # 最小化していても、↑のように新規タブ作成などでは復活してしまう
-        if Settings().minimize_translation_window:
+        # 軽量モードではウインドウを表示しないので最小化しない
+        if Settings().minimize_translation_window and not self.lightweight:
             self.MinimizeWindow()
 
         # DeepLに接続
         self.__webDriver.get("https://www.deepl.com/translator")
+        return handle
 
-        # 訳文の言語を選択するタブを開く
-        self.__webDriver.find_element_by_xpath("//button[@dl-test='translator-target-lang-btn']").click()
-        sleep(0.1)
-        # 訳文の言語のボタンを押す
-        self.__webDriver.find_element_by_xpath("//button[@dl-test='translator-lang-option-" + Settings().target_language_for_translate + "']").click()
-
-    def translate(self, text, first_wait_secs=10, wait_secs_max=60):
+    def translate(self, text, wait_secs_max=60, poll_secs=0.2, stable_secs=0.6):
         """
         DeepLで翻訳を行う
 
         Args:
             text (string): 原文
-            lang (str, optional): 翻訳先の言語 Settings.target_language_for_translateで取得可能
-            first_wait_secs (int, optional): 翻訳時に何秒待ってから翻訳完了の判定を行うか
             wait_secs_max (int, optional): 翻訳が不可能であったと見なす時間
+            poll_secs (float, optional): 翻訳完了の判定を行う間隔
+            stable_secs (float, optional): 訳文がこの秒数だけ変化しなければ翻訳完了と見なす
 
         Returns:
             string: 翻訳文
         """
+        return self.translateMany([text], wait_secs_max, poll_secs, stable_secs)[0]
+
+    def translateMany(self, texts, wait_secs_max=60, poll_secs=0.2, stable_secs=0.6):
+        """
+        複数の原文を、DeepLのタブに順に割り当てて並行して翻訳する
+        全てのタブの翻訳完了の判定をまとめて行い、翻訳が終わって空いたタブには次の原文を割り当てる
+
+        Args:
+            texts (list of string): 原文のリスト
+            wait_secs_max (int, optional): 1つの原文の翻訳が不可能であったと見なす時間
+            poll_secs (float, optional): 翻訳完了の判定を行う間隔
+            stable_secs (float, optional): 訳文がこの秒数だけ変化しなければ翻訳完了と見なす
+
+        Returns:
+            list of string: 原文と同じ順の翻訳文のリスト
+        """
+        results = [None] * len(texts)
+        next_index = 0
+        # 翻訳中のタブの番号
+        busy = []
+        while next_index < len(texts) or len(busy) > 0:
+            # 空いているタブに順に原文を割り当てる
+            for tab_index in range(self.tabs):
+                if next_index >= len(texts):
+                    break
+                if tab_index in busy:
+                    continue
+                self.__submit(tab_index, next_index, texts[next_index], wait_secs_max)
+                busy.append(tab_index)
+                next_index += 1
+
+            # 翻訳中の全てのタブについて翻訳完了の判定を行う
+            for tab_index in list(busy):
+                tab = self.openDeepLPage(tab_index)
+                translated = self.__pollTranslation(tab, stable_secs)
+                if translated is None and monotonic() >= tab.deadline:
+                    translated = self.__timedOut(tab, wait_secs_max)
+                if translated is not None:
+                    results[tab.index] = translated
+                    busy.remove(tab_index)
+            if len(busy) > 0:
+                sleep(poll_secs)
+        return results
+
+    def __submit(self, tab_index, index, text, wait_secs_max):
+        """
+        指定のタブに原文を入力し、翻訳を始める
+
+        Args:
+            tab_index (int): 何番目のDeepLのタブで翻訳するか
+            index (int): 原文の番号
+            text (string): 原文
+            wait_secs_max (int): 翻訳が不可能であったと見なす時間
+        """
         # DeepLのページが開かれていなければ開く
-        self.openDeepLPage()
+        tab = self.openDeepLPage(tab_index)
+
+        # 入力前の訳文を控えておく
+        # 原文を入力してもすぐには訳文の出力欄が更新されないので、前の訳文を新しい訳文と取り違えないようにする
+        tab.previous = self.__webDriver.find_element_by_css_selector(TARGET_TEXTAREA).get_property("value")
+        if text == tab.last_source:
+            # 前と同じ原文なら、訳文も前と同じになりうる
+            tab.previous = None
+        tab.last_source = text
+        tab.index = index
+        tab.text = text
+        tab.reacted = False
+        tab.stable_value = None
+
+        # 原文の入力欄を取得し、原文を入力
+        source_textarea = self.__webDriver.find_element_by_css_selector(SOURCE_TEXTAREA)
+        self.__inputSource(source_textarea, text, tab.previous)
+        tab.deadline = monotonic() + wait_secs_max
+
+    def __inputSource(self, source_textarea, text, previous, react_secs=5):
+        """
+        原文を入力する
+        まずスクリプトで入力欄の値を一度に書き換え、ページが反応しなければキー入力で入力し直す
+        スクリプトでの入力に一度反応しなかった場合は、以降は最初からキー入力で入力する
 
-        # 原文の入力欄を取得
-        source_textarea = self.__webDriver.find_element_by_css_selector(
-            "textarea.lmt__textarea.lmt__source_textarea.lmt__textarea_base_style")
+        Args:
+            source_textarea (WebElement): 原文の入力欄
+            text (string): 原文
+            previous (string): 入力前の訳文 Noneなら前と同じ原文なので反応を確かめない
+            react_secs (int, optional): ページが反応しなかったと見なす時間
+        """
+        if self.__scriptInput is not False:
+            InputByScript(self.__webDriver, source_textarea, text)
+            # 一度反応を確かめられたら、以降は待たずに次の処理に移る
+            if self.__scriptInput or previous is None:
+                return
+            self.__scriptInput = self.__waitReaction(previous, react_secs)
+            if self.__scriptInput:
+                return
         # Ctrl+Aで全選択し、前の文を消しつつ原文を入力
         source_textarea.clear()
         source_textarea.send_keys(text)
 
-        # 最初に規定の秒数だけ待つ
-        sleep(first_wait_secs)
+    def __waitReaction(self, previous, react_secs):
+        """
+        原文の入力にページが反応するまで待つ
+        翻訳の進行度を示すポップアップが現れるか、訳文が入力前のものから変われば反応したと見なす
 
-        # 翻訳の進行度を示すポップアップが無ければ翻訳完了と見なす
-        # 制限時間内に翻訳が終了しなければ翻訳失敗と見なす
-        wait_secs_sub = max(int(wait_secs_max - first_wait_secs), 1)
-        for i in range(wait_secs_sub):
-            try:
-                # 通常時はdiv.lmt_progress_popupだが、ポップアップが可視化するときは
-                # lmt_progress_popup--visible(_2)が追加される
-                _ = self.__webDriver.find_element_by_css_selector(
-                    "div.lmt__progress_popup.lmt__progress_popup--visible.lmt__progress_popup--visible_2")
-            except sce.NoSuchElementException:
-                # ポップアップが無く、かつ[...]が無ければ翻訳完了として抜け出す
-                translated = self.__webDriver.find_element_by_css_selector(
-                    "textarea.lmt__textarea.lmt__target_textarea.lmt__textarea_base_style").get_property("value")
-                if not re.search(r"\[\.\.\.\]", translated):
-                    break
-            # ポップアップがあり、かつ制限時間内ならばもう1秒待つ
-            if i < wait_secs_sub - 1:
-                sleep(1.0)
-                continue
-            else:
-                # 制限時間を過ぎたとき、大抵の場合は原文に[...]が含まれていて抜け出せない状態になっているので、その場合は翻訳が完了していると見なす
-                # 上のexcept区間でこの処理を行うと長い文の翻訳途中で抜けてしまう可能性があるため、制限時間を過ぎた場合にのみ行う
-                # このようなケースは稀であると考えられるため、多少時間がかかっても良い。
-                # あまりにも鬱陶しいなら原文の[...]を置換すれば良い。
-                if re.search(r"\[\.\.\.\]", text) and re.search(r"\[\.\.\.\]", translated):
-                    break
-                # 制限時間を過ぎたら失敗
-                # 段落と同じ数だけメッセージを生成
-                num_pars = len(text.splitlines())
-                messages = ["翻訳に" + str(wait_secs_max) + "秒以上を要するため、失敗と見なしました。同一のメッセージが表示されている原文のどれかに、翻訳を妨げる文字列が存在する可能性があります。" for _ in range(num_pars)]
-                return "\n".join(messages)
+        Args:
+            previous (string): 入力前の訳文
+            react_secs (int): ページが反応しなかったと見なす時間
+
+        Returns:
+            bool: 制限時間内にページが反応したならTrue
+        """
+        def Reacted(driver):
+            if len(driver.find_elements_by_css_selector(PROGRESS_POPUP)) > 0:
+                return True
+            value = driver.find_element_by_css_selector(TARGET_TEXTAREA).get_property("value")
+            return value != "" and value != previous
+
+        try:
+            return WebDriverWait(self.__webDriver, react_secs, poll_frequency=0.1).until(Reacted)
+        except sce.TimeoutException:
+            return False
+
+    def __pollTranslation(self, tab, stable_secs):
+        """
+        今開いているタブについて、ページの状態から翻訳の完了を判定する
+        翻訳の進行度を示すポップアップが無く、訳文が空でなく、[...]を含まず、かつ一定時間変化していなければ翻訳完了と見なす
+        ただし、原文の入力後にページが反応するまでは、入力前の訳文が残っている可能性があるので完了と見なさない
+        (訳文が入力前のものと同じでも、ポップアップが現れていれば新しい訳文と見なす)
+
+        Args:
+            tab (_Tab): 今開いているタブ
+            stable_secs (float): 訳文がこの秒数だけ変化しなければ翻訳完了と見なす
+
+        Returns:
+            string: 翻訳文 まだ翻訳が完了していなければNone
+        """
+        if len(self.__webDriver.find_elements_by_css_selector(PROGRESS_POPUP)) > 0:
+            tab.reacted = True
+            tab.stable_value = None
+            return None
+        value = self.__webDriver.find_element_by_css_selector(TARGET_TEXTAREA).get_property("value")
+        if value != tab.previous:
+            tab.reacted = True
+        if value == "" or re.search(r"\[\.\.\.\]", value):
+            tab.stable_value = None
+            return None
+        now = monotonic()
+        if value != tab.stable_value:
+            tab.stable_value = value
+            tab.stable_since = now
+            return None
+        if not tab.reacted:
+            return None
+        return value if now - tab.stable_since >= stable_secs else None
 
-        # 訳文の出力欄を取得し、訳文を取得
-        translated = self.__webDriver.find_element_by_css_selector(
-            "textarea.lmt__textarea.lmt__target_textarea.lmt__textarea_base_style").get_property("value")
+    def __timedOut(self, tab, wait_secs_max):
+        """
+        今開いているタブの翻訳が制限時間内に完了しなかったときの翻訳文を求める
+
+        Args:
+            tab (_Tab): 今開いているタブ
+            wait_secs_max (int): 翻訳が不可能であったと見なす時間
 
-        return translated
+        Returns:
+            string: 翻訳文
+        """
+        # 反応を見逃しただけで、新しい訳文が入力前のものと同じだった場合は、変化していない訳文をそのまま翻訳文とする
+        translated = self.__webDriver.find_element_by_css_selector(TARGET_TEXTAREA).get_property("value")
+        if translated == tab.stable_value and len(self.__webDriver.find_elements_by_css_selector(PROGRESS_POPUP)) == 0:
+            return translated
+        # 制限時間を過ぎたとき、大抵の場合は原文に[...]が含まれていて抜け出せない状態になっているので、その場合は翻訳が完了していると見なす
+        # 翻訳完了の判定の中でこの処理を行うと長い文の翻訳途中で抜けてしまう可能性があるため、制限時間を過ぎた場合にのみ行う
+        # このようなケースは稀であると考えられるため、多少時間がかかっても良い。
+        # あまりにも鬱陶しいなら原文の[...]を置換すれば良い。
+        if re.search(r"\[\.\.\.\]", tab.text) and re.search(r"\[\.\.\.\]", translated):
+            return translated
+        # 制限時間を過ぎたら失敗
+        # 段落と同じ数だけメッセージを生成
+        num_pars = len(tab.text.splitlines())
+        messages = ["翻訳に" + str(wait_secs_max) + "秒以上を要するため、失敗と見なしました。同一のメッセージが表示されている原文のどれかに、翻訳を妨げる文字列が存在する可能性があります。" for _ in range(num_pars)]
+        return "\n".join(messages)
 
     def MinimizeWindow(self):
         """
@@ -180,6 +866,224 @@ class DeepLManager:
     def closeWindow(self):
         """
         ブラウザが駆動しているならそのウインドウを閉じる
+        常駐させたウェブブラウザの場合は閉じずに接続を切る
         """
-        if self.__isWebDriverAlive():
+        if self.attached:
+            self.attached = False
+            DetachBrowserDaemon()
+            return
+        alive = self.__isWebDriverAlive()
+        if alive:
             self.__webDriver.quit()
+        _ReleaseProfile(self.__profile)
+        self.__profile = None
+        if self.browser == Browser.REMOTE.value:
+            # ノードで新たなセッションを作成できるようにする
+            _remote_nodes.Release(self.__webDriver, alive)
+
+
+class SessionPool:
+    """
+    全ての翻訳で共有するDeepLManager(WebDriverのセッション)のプール
+
+    翻訳はセッションを1単位ごとに借りて返すので、同時に開くウェブブラウザの数は最大数に抑えられ、
+    ウェブブラウザの起動も翻訳するファイルごとに行わずに済む
+    使われないまま一定時間が経ったセッションは閉じる
+    """
+    def __init__(self, size, idle_secs):
+        """
+        Args:
+            size (int): セッションの最大数
+            idle_secs (int): 使われないまま何秒経ったセッションを閉じるか
+        """
+        self.size = max(1, size)
+        self.idle_secs = idle_secs
+        self.__condition = Condition()
+        # 貸し出していないセッションと、それが返された時刻のリスト
+        self.__idle = []
+        # 作成した(貸し出し中や作成中のものも含む)セッションの数と、そのうち前もって準備中のものの数
+        self.__count = 0
+        self.__warming = 0
+        self.__closed = False
+        self.__closing = Event()
+        self.__reaper = None
+
+    def Checkout(self):
+        """
+        セッションを借りる
+        貸し出していないセッションが無く、最大数まで作成済みか前もって準備中のものがあれば、
+        返されるか準備が終わるまで待つ
+
+        Returns:
+            DeepLManager: 借りたセッション
+        """
+        while True:
+            with self.__condition:
+                while len(self.__idle) == 0 and (self.__count >= self.size or self.__warming > 0):
+                    self.__condition.wait()
+                if len(self.__idle) > 0:
+                    # 最後に返されたものを使う
+                    manager, _ = self.__idle.pop()
+                else:
+                    self.__count += 1
+                    manager = None
+            if manager is None:
+                # ウェブブラウザの起動には時間がかかるので、ロックの外で行う
+                try:
+                    return DeepLManager()
+                except BaseException:
+                    self.__Discard(None)
+                    raise
+            # ウインドウを閉じられていたり、ウェブブラウザの設定が変わっていたりすれば作り直す
+            if manager.isAlive() and manager.browser == Settings().web_browser:
+                return manager
+            self.__Discard(manager)
+
+    def Checkin(self, manager):
+        """
+        借りたセッションを返す
+
+        Args:
+            manager (DeepLManager): Checkoutで借りたセッション
+        """
+        with self.__condition:
+            # 閉じられたプールや、最大数が減って余ったセッションは閉じる
+            if not self.__closed and self.__count <= self.size:
+                self.__idle.append((manager, monotonic()))
+                self.__condition.notify()
+                if self.__reaper is None:
+                    self.__reaper = Thread(target=self.__Reaper, daemon=True)
+                    self.__reaper.start()
+                return
+        self.__Discard(manager)
+
+    def Prewarm(self):
+        """
+        貸し出していないセッションが無く、最大数に達していなければ、
+        別スレッドで新たなセッションを作成してDeepLのページを開いておく
+        翻訳の準備(PDFからの抽出など)の間にウェブブラウザの起動などを済ませておける
+        """
+        with self.__condition:
+            if self.__closed or len(self.__idle) > 0 or self.__count >= self.size:
+                return
+            # 準備中のセッションも数に含め、最大数を超えないようにする
+            self.__count += 1
+            self.__warming += 1
+        Thread(target=self.__Warm, daemon=True).start()
+
+    def __Warm(self):
+        """
+        新たなセッションを作成してDeepLのページを開き、貸し出せるようにする
+        """
+        try:
+            manager = DeepLManager()
+        except BaseException:
+            with self.__condition:
+                self.__warming -= 1
+            self.__Discard(None)
+            return
+        try:
+            for tab_index in range(manager.tabs):
+                manager.openDeepLPage(tab_index)
+        except sce.WebDriverException:
+            # ページを開けなくても、翻訳時に開き直せば良い
+            pass
+        with self.__condition:
+            self.__warming -= 1
+        self.Checkin(manager)
+
+    @contextmanager
+    def Session(self):
+        """
+        withの間だけセッションを借りる
+        """
+        manager = self.Checkout()
+        try:
+            yield manager
+        finally:
+            self.Checkin(manager)
+
+    def Reap(self):
+        """
+        使われないまま一定時間が経ったセッションを閉じる
+        """
+        now = monotonic()
+        with self.__condition:
+            expired = [manager for manager, checkin_time in self.__idle if now - checkin_time >= self.idle_secs]
+            self.__idle = [(manager, checkin_time) for manager, checkin_time in self.__idle if now - checkin_time < self.idle_secs]
+        for manager in expired:
+            self.__Discard(manager)
+
+    def Close(self):
+        """
+        貸し出していないセッションを全て閉じる 貸し出し中のものは返されたときに閉じる
+        """
+        with self.__condition:
+            self.__closed = True
+            idle = [manager for manager, _ in self.__idle]
+            self.__idle = []
+        self.__closing.set()
+        for manager in idle:
+            self.__Discard(manager)
+
+    def __Discard(self, manager):
+        """
+        セッションを閉じ、その分だけ新たに作成できるようにする
+
+        Args:
+            manager (DeepLManager): 閉じるセッション 作成に失敗した場合はNone
+        """
+        if manager is not None:
+            try:
+                manager.closeWindow()
+            except sce.WebDriverException:
+                pass
+        with self.__condition:
+            self.__count -= 1
+            self.__condition.notify()
+
+    def __Reaper(self):
+        """
+        使われないセッションを定期的に閉じるスレッド
+        """
+        while not self.__closing.wait(max(1, self.idle_secs / 2)):
+            self.Reap()
+
+
+# 全ての翻訳で共有するセッションプール
+_session_pool = None
+_session_pool_lock = Lock()
+
+
+def GetSessionPool():
+    """
+    全ての翻訳で共有するセッションプールを取得する まだ無ければ作成する
+    セッションの最大数などの設定が変わっていれば、それに合わせる
+
+    Returns:
+        SessionPool: セッションプール
+    """
+    global _session_pool
+    with _session_pool_lock:
+        size = Settings.WebDriver().session_pool_size
+        if Settings().web_browser == Browser.REMOTE.value:
+            # Remoteなら、ノードを増やした分だけ同時に翻訳できるようにする
+            size = _remote_nodes.Capacity()
+        idle_secs = Settings.WebDriver().session_idle_secs
+        if _session_pool is None:
+            _session_pool = SessionPool(size, idle_secs)
+        else:
+            _session_pool.size = max(1, size)
+            _session_pool.idle_secs = idle_secs
+        return _session_pool
+
+
+def CloseSessionPool():
+    """
+    全ての翻訳で共有するセッションプールのセッションを閉じる
+    """
+    global _session_pool
+    with _session_pool_lock:
+        if _session_pool is not None:
+            _session_pool.Close()
+            _session_pool = None
@@ -0,0 +1,118 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from data import Browser
+from pathlib import Path
+
+
+# ウェブブラウザのバージョンを調べるコマンド
+# OSごとに候補を並べ、最初にバージョンを得られたものを使う
+# WindowsのFirefoxは--versionでもウインドウを開いてしまうので、レジストリから調べる
+BROWSER_VERSION_COMMANDS = {
+    Browser.CHROME.value: {
+        "win32": [["reg", "query", r"HKEY_CURRENT_USER\Software\Google\Chrome\BLBeacon", "/v", "version"]],
+        "darwin": [["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome", "--version"]],
+        "linux": [["google-chrome", "--version"], ["google-chrome-stable", "--version"], ["chromium", "--version"], ["chromium-browser", "--version"]]
+    },
+    Browser.EDGE.value: {
+        "win32": [["reg", "query", r"HKEY_CURRENT_USER\Software\Microsoft\Edge\BLBeacon", "/v", "version"]],
+        "darwin": [["/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge", "--version"]],
+        "linux": [["microsoft-edge", "--version"], ["microsoft-edge-stable", "--version"]]
+    },
+    Browser.FIREFOX.value: {
+        "win32": [["reg", "query", r"HKEY_LOCAL_MACHINE\SOFTWARE\Mozilla\Mozilla Firefox", "/v", "CurrentVersion"]],
+        "darwin": [["/Applications/Firefox.app/Contents/MacOS/firefox", "--version"]],
+        "linux": [["firefox", "--version"]]
+    }
+}
+
+# バージョンを調べられなかったときのキー
+UNKNOWN_VERSION = "unknown"
+
+# 調べたウェブブラウザのバージョン
+# ウェブブラウザの起動のたびにコマンドを実行しないよう、プロセス内で使い回す
+_browser_versions = {}
+
+
+def BrowserVersion(browser, refresh=False):
+    """
+    インストールされているウェブブラウザのバージョンを調べる
+
+    Args:
+        browser (string): ウェブブラウザ(RemoteではないBrowserの値)
+        refresh (bool, optional): Trueなら前に調べた結果を使わずに調べ直す
+
+    Returns:
+        string: バージョン 調べられなかった場合はUNKNOWN_VERSION
+    """
+    if not refresh and browser in _browser_versions:
+        return _browser_versions[browser]
+
+    platform = "linux" if sys.platform.startswith("linux") else sys.platform
+    version = UNKNOWN_VERSION
+    for command in BROWSER_VERSION_COMMANDS.get(browser, {}).get(platform, []):
+        try:
+            output = subprocess.run(command, capture_output=True, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        m = re.search(r"\d+(\.\d+)+", output)
+        if m:
+            version = m.group()
+            break
+    _browser_versions[browser] = version
+    return version
+
+
+class DriverCache:
+    """
+    ウェブブラウザのバージョンごとに、webdriver_managerで求めたドライバの実行ファイルのパスを保存しておくキャッシュ
+
+    webdriver_managerはドライバを求めるたびに最新のバージョンを問い合わせるので、
+    ネットワークが制限された環境ではウェブブラウザの起動のたびに待たされる
+    ウェブブラウザのバージョンが変わらない限り同じドライバを使えるので、一度求めたパスを使い回す
+    """
+    def __init__(self, path="driver_cache.json"):
+        self.__path = Path(path)
+
+    def Lookup(self, browser, version):
+        """
+        キャッシュしたドライバのパスを取得する
+
+        Args:
+            browser (string): ウェブブラウザ(RemoteではないBrowserの値)
+            version (string): ウェブブラウザのバージョン
+
+        Returns:
+            string: ドライバのパス キャッシュに無いか、そのファイルが存在しない場合はNone
+        """
+        path = self.__Load().get(browser, {}).get(version)
+        if path is None or not Path(path).exists():
+            return None
+        return path
+
+    def Store(self, browser, version, driver_path):
+        """
+        ドライバのパスをキャッシュする
+
+        Args:
+            browser (string): ウェブブラウザ(RemoteではないBrowserの値)
+            version (string): ウェブブラウザのバージョン
+            driver_path (string): ドライバのパス
+        """
+        data = self.__Load()
+        data.setdefault(browser, {})[version] = driver_path
+        # 複数のプロセスが同時に書き込んでも壊れないよう、一時ファイルを経由する
+        temp_path = self.__path.with_name(self.__path.name + "." + str(os.getpid()) + ".tmp")
+        temp_path.write_text(json.dumps(data, indent=4, ensure_ascii=False), encoding="utf-8")
+        os.replace(str(temp_path), str(self.__path))
+
+    def __Load(self):
+        try:
+            data = json.loads(self.__path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            # 存在しない、あるいは壊れているキャッシュは無いものとして扱う
+            return {}
+        return data if isinstance(data, dict) else {}
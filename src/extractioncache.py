@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+import json
+import os
+import pdfminer
+
+from pathlib import Path
+
+
+class ExtractionCache:
+    """
+    PDFから抽出した加工前のテキストを、ページ単位でディスクに保存しておくキャッシュ
+
+    PDFファイルの内容のハッシュと抽出時のパラメータの組をキーとするため、
+    正規表現の設定を変えて同じファイルを翻訳し直す場合は、pdfminerによる解析を丸ごと省略できる
+    合計サイズが上限を超えた場合は、最後に使われてから最も時間が経ったものから削除する
+    """
+    def __init__(self, directory="cache", max_size_mb=200):
+        self.__directory = Path(directory)
+        self.__max_size = max_size_mb * 1024 * 1024
+
+    @staticmethod
+    def Key(filename, params=""):
+        """
+        キャッシュのキーを生成する
+
+        Args:
+            filename (string): 対象のPDFファイル名
+            params (string, optional): 抽出結果に影響するパラメータを文字列化したもの
+
+        Returns:
+            string: キー
+        """
+        h = hashlib.sha256()
+        with open(filename, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        # pdfminerのバージョンが変わると抽出結果も変わりうるので、キーに含める
+        h.update(("\0" + pdfminer.__version__ + "\0" + params).encode("utf-8"))
+        return h.hexdigest()
+
+    def Load(self, key):
+        """
+        キャッシュを読み込む
+
+        Args:
+            key (string): キー
+
+        Returns:
+            (int or None, dict of int: list of string): 文書のページ数(不明ならNone)と、
+            抽出済みのページ番号とそのページの行のリストの辞書
+            キャッシュが無い場合は(None, {})
+        """
+        path = self.__Path(key)
+        try:
+            with gzip.open(str(path), "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            # 最後に使われた時刻として更新日時を更新する
+            os.utime(str(path))
+        except (OSError, ValueError):
+            # 存在しない、あるいは壊れているキャッシュは無いものとして扱う
+            return None, {}
+
+        return data["num_pages"], {int(i): lines for i, lines in data["pages"].items()}
+
+    def Save(self, key, num_pages, pages):
+        """
+        キャッシュを保存し、上限を超えた分の古いキャッシュを削除する
+
+        Args:
+            key (string): キー
+            num_pages (int or None): 文書のページ数(不明ならNone)
+            pages (dict of int: list of string): 抽出済みのページ番号とそのページの行のリストの辞書
+        """
+        self.__directory.mkdir(exist_ok=True)
+        path = self.__Path(key)
+        # 複数の翻訳が並行して同じファイルを書き込んでも壊れないよう、一時ファイルを経由する
+        temp_path = path.with_name(path.name + "." + str(os.getpid()) + "." + str(id(pages)) + ".tmp")
+        with gzip.open(str(temp_path), "wt", encoding="utf-8") as f:
+            json.dump({"num_pages": num_pages, "pages": pages}, f, ensure_ascii=False)
+        os.replace(str(temp_path), str(path))
+
+        self.__Evict()
+
+    def __Path(self, key):
+        return self.__directory / (key + ".json.gz")
+
+    def __Evict(self):
+        """
+        合計サイズが上限に収まるまで、最後に使われた時刻が古いキャッシュから削除する
+        """
+        entries = []
+        for path in self.__directory.glob("*.json.gz"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total_size <= self.__max_size:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total_size -= size
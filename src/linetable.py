@@ -0,0 +1,123 @@
+from array import array
+
+
+# 各種条件の種類(ヒットしたかを表すビットの位置)
+CHART_START = 0
+RETURN = 1
+RETURN_IGNORE = 2
+HEADER = 3
+
+
+class LineTable:
+    """
+    PDFから抽出・加工した行を、列ごとの配列にまとめた表
+
+    行の文字列は一つの文字列に連結して保持し、各行はその中の位置と長さで表す
+    行ごとに文字列を保持しないので、長い文書でもPythonのオブジェクトの数が増えない
+    また、各種条件に最初にヒットした正規表現を一度だけ調べて保持し、以降の処理や
+    ヒットした行の出力ではそれを使い回す
+    """
+    def __init__(self, textlines):
+        """
+        Args:
+            textlines (list of string): PDFから抽出・加工した行のリスト
+        """
+        self.__text = "".join(textlines)
+        # 各行の連結した文字列における開始位置・長さ・最後の文字のコード(空行なら0)
+        self.offsets = array("q")
+        self.lengths = array("l")
+        self.last_chars = array("l")
+        offset = 0
+        for t in textlines:
+            self.offsets.append(offset)
+            self.lengths.append(len(t))
+            self.last_chars.append(ord(t[-1]) if len(t) > 0 else 0)
+            offset += len(t)
+        # 各行がどの種類の条件にヒットしたかのビットマスク
+        self.hit_masks = array("B", bytes(len(textlines)))
+        # 種類ごとの、各行に最初にヒットした正規表現の設定のリストにおける番号(ヒットしなければ-1)
+        self.rule_indices = {}
+        # 種類ごとの、調べるのに用いたRuleSetと、その正規表現の設定のリストにおける番号と正規表現の辞書
+        self.__rule_sets = {}
+        self.__rules_by_index = {}
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        offset = self.offsets[i]
+        return self.__text[offset:offset + self.lengths[i]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def Classify(self, category, rules, line_numbers=None):
+        """
+        各行について、指定の種類の条件で最初にヒットする正規表現を調べて保持する
+        同じ種類について二度目以降に呼ばれた場合は何もしない
+
+        Args:
+            category (int): 条件の種類(CHART_STARTなど)
+            rules (RuleSet): その種類の条件の正規表現
+            line_numbers (iterable of int, optional): 調べる行の番号 Noneなら全ての行
+        """
+        if category in self.__rule_sets:
+            return
+        self.__rule_sets[category] = rules
+        self.__rules_by_index[category] = {rule.index: rule for rule in rules.rules}
+        rule_indices = array("i", [-1]) * len(self)
+        bit = 1 << category
+        if line_numbers is None:
+            line_numbers = range(len(self))
+        for i in line_numbers:
+            rule = rules.Search(self[i])
+            if rule is not None:
+                rule_indices[i] = rule.index
+                self.hit_masks[i] |= bit
+        self.rule_indices[category] = rule_indices
+
+    def IsHit(self, category, i):
+        """
+        Args:
+            category (int): 条件の種類(CHART_STARTなど) Classifyで調べておく必要がある
+            i (int): 行の番号
+
+        Returns:
+            bool: その行が指定の種類の条件にヒットしたか
+        """
+        return self.hit_masks[i] & (1 << category) != 0
+
+    def HitRule(self, category, i):
+        """
+        Args:
+            category (int): 条件の種類(CHART_STARTなど) Classifyで調べておく必要がある
+            i (int): 行の番号
+
+        Returns:
+            Rule: その行に最初にヒットした正規表現 ヒットしなかった場合はNone
+        """
+        if not self.IsHit(category, i):
+            return None
+        return self.__rules_by_index[category][self.rule_indices[category][i]]
+
+    def WriteHitLines(self, category, f, all_rules=False):
+        """
+        指定の種類の条件にヒットした行を、ヒットした正規表現とともに書き込む
+
+        Args:
+            category (int): 条件の種類(CHART_STARTなど) Classifyで調べておく必要がある
+            f (file object): 書き込み先
+            all_rules (bool, optional): Trueなら最初にヒットしたものだけでなく、ヒットした全ての正規表現を書き込む
+        """
+        rules = self.__rule_sets[category]
+        bit = 1 << category
+        for i, mask in enumerate(self.hit_masks):
+            if mask & bit == 0:
+                continue
+            t = self[i]
+            hit_rules = rules.SearchAll(t) if all_rules else [self.HitRule(category, i)]
+            for rule in hit_rules:
+                f.write(rule.pattern + ", " + t + "\n")
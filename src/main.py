@@ -3,8 +3,10 @@ import wx
 import wx.lib.agw.floatspin as FS
 
 from data import Target_Lang, Browser, MainWindow_MenuBar_Menu
+from deeplmanager import CloseSessionPool
+from multiprocessing import freeze_support
 from pathlib import Path
-from pdftranslator import PDFTranslate
+from pdftranslator import CloseClassifyExecutor, PDFTranslate
 from re import search
 from res import RegularExpressionsWindow
 from settings import Settings
@@ -247,6 +249,8 @@ class WindowFrame(wx.Frame):
     # ウィンドウを閉じるときに発生するイベント
     def Window_Close_Event(self, event):
         Settings.SaveSettings()  # 変更した設定を保存する
+        CloseSessionPool()  # 翻訳に用いたウェブブラウザを閉じる
+        CloseClassifyExecutor()  # 条件の判定に用いたプロセスを終了させる
         self.Destroy()  # イベントを発行すると自動では閉じなくなるので手動で閉じる
 
     def __Settings_Change_Event(self, event):
@@ -391,7 +395,8 @@ class WindowFrame(wx.Frame):
             browser_combo_elements = (
                 Browser.CHROME.value,
                 Browser.EDGE.value,
-                Browser.FIREFOX.value
+                Browser.FIREFOX.value,
+                Browser.REMOTE.value
             )
             super().__init__(parent, id, "ブラウザを選択", choices=browser_combo_elements, style=wx.CB_READONLY)
 
@@ -458,6 +463,8 @@ class WindowFrame(wx.Frame):
 
 
 if __name__ == '__main__':
+    # PDFの並列抽出で子プロセスを用いるため、実行ファイル化した場合に備える
+    freeze_support()
     app = wx.App()
     WindowFrame()
     app.MainLoop()
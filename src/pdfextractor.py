@@ -0,0 +1,493 @@
+import os
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from itertools import islice
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfdevice import PDFTextDevice
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdffont import PDFUnicodeNotDefined
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import PDFException, PDFObjRef, resolve1
+from pdfminer.psparser import PSLiteral
+from pdfminer.utils import decode_text
+
+
+# 抽出結果に影響するパラメータ(キャッシュのキーに含める)
+LAYOUT_PARAMS = repr(sorted(vars(LAParams()).items()))
+
+
+def IterPDFPageLines(filename, page_numbers=None, workers=1, pages_per_shard=8, cache=None, cache_entry=None):
+    """
+    PDFファイルからテキストを1ページずつ抽出し、ページごとの行のリストを順に返すジェネレータ
+
+    pdfminer.high_level.extract_textと同じ手順でレイアウト解析を行うため、
+    全ページ分の結果をつなげるとextract_text(filename).splitlines()と同一になる
+    このジェネレータ自体は文書全体の文字列を一度に持たないが、返したページの行を保持するかどうかは呼び出し側次第
+    (PDFRawTextは抽出済みのページを全て保持し、翻訳は条件による加工を全ページ分終えてから始まるので、
+    メモリ使用量や最初の翻訳が始まるまでの時間はページ数に比例する)
+
+    workersが2以上(0なら自動)の場合は、ページをpages_per_shardずつの断片に分けて
+    複数のプロセスで並列にレイアウト解析を行い、ページ順に並べ直して返す
+
+    cacheを渡した場合は、キャッシュ済みのページはレイアウト解析を行わずにそれを返し、
+    新たに抽出したページはキャッシュに追加する
+
+    Args:
+        filename (string): 抽出対象のPDFファイル名
+        page_numbers (container of int, optional): 抽出するページ番号(0始まり) Noneなら全ページ
+        workers (int, optional): 抽出に用いるプロセス数 1なら並列化しない 0ならCPUのコア数
+        pages_per_shard (int, optional): 1プロセスに一度に任せるページ数
+        cache (ExtractionCache, optional): 抽出結果のキャッシュ
+        cache_entry ((string, int, dict of int: list of string), optional): cacheから読み込み済みの
+        キー・文書のページ数・抽出済みのページの辞書の組 渡された場合はファイルのハッシュの計算と
+        キャッシュの読み込みを省略し、新たに抽出したページはこの辞書に追加する
+
+    Yields:
+        (int, list of string): ページ番号(0始まり)と、そのページから抽出した行のリスト
+    """
+    if cache is None:
+        yield from _IterPDFPageLines_Extract(filename, page_numbers, workers, pages_per_shard)
+        return
+
+    if cache_entry is None:
+        key = cache.Key(filename, LAYOUT_PARAMS)
+        num_pages, pages = cache.Load(key)
+    else:
+        key, num_pages, pages = cache_entry
+    if num_pages is None:
+        num_pages = CountPDFPages(filename)
+
+    # キャッシュに無いページだけをまとめて抽出する
+    target_pages = [i for i in range(num_pages) if page_numbers is None or i in page_numbers]
+    missing_pages = {i for i in target_pages if i not in pages}
+    extracted = _IterPDFPageLines_Extract(filename, missing_pages, workers, pages_per_shard)
+    updated = False
+    try:
+        for page_index in target_pages:
+            if page_index in missing_pages:
+                # 抽出は小さいページ番号から順に行われるので、次に出てくるのがこのページ
+                _, pages[page_index] = next(extracted)
+                updated = True
+            yield page_index, pages[page_index]
+    finally:
+        extracted.close()
+        # 途中で読むのをやめた場合でも、それまでに抽出したページは保存しておく
+        if updated:
+            cache.Save(key, num_pages, pages)
+
+
+class PDFRawText:
+    """
+    PDFから抽出した、各種条件による加工を施す前のテキスト
+
+    ページは読み出されるまで抽出せず、一度抽出したページはメモリに保持する
+    そのため、条件を変えて加工し直す場合でもPDFを解析し直す必要が無いが、
+    メモリ使用量は抽出したページ数に比例して増える(このオブジェクトを破棄するまで解放されない)
+    """
+    def __init__(self, filename, workers=1, pages_per_shard=8, cache=None):
+        """
+        Args:
+            filename (string): 抽出対象のPDFファイル名
+            workers (int, optional): 抽出に用いるプロセス数 1なら並列化しない 0ならCPUのコア数
+            pages_per_shard (int, optional): 1プロセスに一度に任せるページ数
+            cache (ExtractionCache, optional): 抽出結果のキャッシュ
+
+        Raises:
+            PDFSyntaxError: ファイルがPDFでない場合
+        """
+        self.filename = filename
+        self.__workers = workers
+        self.__pages_per_shard = pages_per_shard
+        self.__cache = cache
+        self.__source = None        # 抽出中のジェネレータ
+        self.__source_pages = None  # 抽出中のジェネレータがこれから返すページ番号
+        self.__pages = {}           # 抽出済みのページ番号と行のリストの辞書
+        self.__outline = None
+        self.__cache_key = None     # キャッシュのキー
+        # ページ数を数えた時点で、PDFとして読めるかどうかが判明する
+        self.num_pages = CountPDFPages(filename)
+        # キャッシュ済みのページは最初から抽出済みとして扱う
+        # キーを求めるにはファイル全体のハッシュを計算する必要があるので、ここで一度だけ求めて使い回す
+        if cache is not None:
+            self.__cache_key = cache.Key(filename, LAYOUT_PARAMS)
+            _, pages = cache.Load(self.__cache_key)
+            self.__pages.update(pages)
+
+    @property
+    def extracted_page_numbers(self):
+        """
+        これまでに抽出したページ番号のリスト
+        """
+        return sorted(self.__pages.keys())
+
+    @property
+    def outline(self):
+        """
+        文書のアウトライン(しおり)の見出しとそのページ番号の組のリスト
+        """
+        if self.__outline is None:
+            self.__outline = ReadPDFOutline(self.filename)
+        return self.__outline
+
+    def __PullPage(self, page_index):
+        """
+        指定のページを抽出して保持する
+
+        Args:
+            page_index (int): ページ番号
+
+        Returns:
+            bool: ページを抽出できたか(ページ番号が範囲外ならFalse)
+        """
+        if page_index >= self.num_pages:
+            return False
+        if self.__source is None or len(self.__source_pages) == 0 or self.__source_pages[0] != page_index:
+            # 指定のページ以降で未抽出のページを、まとめて抽出し始める
+            self.Close()
+            self.__source_pages = deque(i for i in range(page_index, self.num_pages) if i not in self.__pages)
+            self.__source = IterPDFPageLines(
+                self.filename,
+                page_numbers=set(self.__source_pages),
+                workers=self.__workers,
+                pages_per_shard=self.__pages_per_shard,
+                cache=self.__cache,
+                cache_entry=None if self.__cache is None else (self.__cache_key, self.num_pages, self.__pages))
+        self.__source_pages.popleft()
+        _, self.__pages[page_index] = next(self.__source)
+        return True
+
+    def IterPages(self, first_page=0, last_page=None):
+        """
+        指定の範囲のページを順に返すジェネレータ 未抽出のページは1ページずつ抽出しながら返す
+
+        Args:
+            first_page (int, optional): 最初のページ番号
+            last_page (int, optional): 最後のページ番号(このページも含む) Noneなら文書の最後まで
+
+        Yields:
+            (int, list of string): ページ番号(0始まり)と、そのページから抽出した行のリスト
+        """
+        page_index = first_page
+        while last_page is None or page_index <= last_page:
+            if page_index not in self.__pages and not self.__PullPage(page_index):
+                break
+            yield page_index, self.__pages[page_index]
+            page_index += 1
+
+    def IterPageBatches(self, first_page=0, last_page=None, max_lines=0):
+        """
+        指定の範囲のページを、まとめて処理できる単位に区切って順に返すジェネレータ
+        抽出済みのページは、行数の合計がmax_linesに達するまで続くものを一つにまとめて返す
+        未抽出のページは、抽出を先読みし過ぎないよう1ページずつ抽出しながら単独で返す
+
+        Args:
+            first_page (int, optional): 最初のページ番号
+            last_page (int, optional): 最後のページ番号(このページも含む) Noneなら文書の最後まで
+            max_lines (int, optional): まとめるページの行数の合計の目安 0以下ならまとめない
+
+        Yields:
+            list of (int, list of string): ページ番号(0始まり)と、そのページから抽出した行のリストの組のリスト
+        """
+        batch = []
+        num_lines = 0
+        page_index = first_page
+        while last_page is None or page_index <= last_page:
+            if page_index not in self.__pages:
+                # 未抽出のページの前に、まとめていたページを返す
+                if len(batch) > 0:
+                    yield batch
+                    batch = []
+                    num_lines = 0
+                if not self.__PullPage(page_index):
+                    break
+                yield [(page_index, self.__pages[page_index])]
+            else:
+                batch.append((page_index, self.__pages[page_index]))
+                num_lines += len(self.__pages[page_index])
+                if num_lines >= max_lines:
+                    yield batch
+                    batch = []
+                    num_lines = 0
+            page_index += 1
+        if len(batch) > 0:
+            yield batch
+
+    def IterScanPages(self):
+        """
+        全ページを順に返すジェネレータ
+        抽出済みのページはそのまま返し、未抽出のページはScanPDFPageLinesで大まかに抽出して返す
+        (大まかに抽出した結果は保持しない)
+
+        Yields:
+            (int, list of string): ページ番号(0始まり)と、そのページから抽出した行のリスト
+        """
+        scanned = None
+        try:
+            for page_index in range(self.num_pages):
+                if page_index in self.__pages:
+                    yield page_index, self.__pages[page_index]
+                    continue
+                if scanned is None:
+                    # このページ以降で未抽出のページを、まとめて大まかに抽出し始める
+                    scanned = ScanPDFPageLines(self.filename, {i for i in range(page_index, self.num_pages) if i not in self.__pages})
+                yield next(scanned)
+        finally:
+            if scanned is not None:
+                scanned.close()
+
+    def Close(self):
+        """
+        抽出を中断し、並列抽出のためのプロセスなどを解放する
+        再び読み出された場合は、そのページから抽出を再開する
+        """
+        if self.__source is not None:
+            self.__source.close()
+            self.__source = None
+            self.__source_pages = None
+
+
+def ReadPDFOutline(filename):
+    """
+    PDFファイルのアウトライン(しおり)を読み取る(レイアウト解析は行わない)
+
+    Args:
+        filename (string): 対象のPDFファイル名
+
+    Returns:
+        list of (string, int): 見出しとそのページ番号(0始まり)の組のリスト(しおりの順)
+        アウトラインが無い場合は空リスト
+    """
+    outline = []
+    with open(filename, "rb") as fp:
+        document = PDFDocument(PDFParser(fp))
+        page_indices = {page.pageid: i for i, page in enumerate(PDFPage.create_pages(document))}
+        try:
+            for _, title, dest, action, _ in document.get_outlines():
+                # 移動先はリンク先として直接指定されている場合と、GoToアクションとして指定されている場合がある
+                if dest is None and isinstance(resolve1(action), dict):
+                    dest = resolve1(action).get("D")
+                page_index = _ResolveOutlineDest(document, dest, page_indices)
+                if page_index is None:
+                    continue
+                if isinstance(title, bytes):
+                    title = decode_text(title)
+                outline.append((str(title), page_index))
+        except PDFException:
+            # アウトラインが無い(PDFNoOutlines)場合や壊れている場合
+            return []
+
+    return outline
+
+
+def _ResolveOutlineDest(document, dest, page_indices):
+    """
+    アウトラインの移動先からページ番号を求める
+
+    Returns:
+        int: ページ番号(0始まり) 求められない場合はNone
+    """
+    dest = resolve1(dest)
+    # 名前付きの移動先は、文書中の移動先の一覧から引く
+    if isinstance(dest, (str, bytes, PSLiteral)):
+        name = dest.name if isinstance(dest, PSLiteral) else dest
+        try:
+            dest = resolve1(document.get_dest(name))
+        except (KeyError, PDFException):
+            return None
+    if isinstance(dest, dict):
+        dest = resolve1(dest.get("D"))
+    if not isinstance(dest, list) or len(dest) == 0:
+        return None
+
+    page_ref = dest[0]
+    if isinstance(page_ref, PDFObjRef):
+        return page_indices.get(page_ref.objid)
+    # ページ番号が直接指定されている場合もある
+    if isinstance(page_ref, int):
+        return page_ref
+    return None
+
+
+def ScanPDFPageLines(filename, page_numbers=None):
+    """
+    PDFファイルからレイアウト解析を行わずに大まかなテキストを1ページずつ抽出するジェネレータ
+
+    文字を描画順に、ベースラインと文字間の距離だけを見て行にまとめるため、
+    行の順序や段組みの扱いはIterPDFPageLinesほど正確ではないが、はるかに速い
+    抽出開始条件にヒットする行がどのページにあるかを探すなど、ページの特定に用いる
+
+    Args:
+        filename (string): 抽出対象のPDFファイル名
+        page_numbers (container of int, optional): 抽出するページ番号(0始まり) Noneなら全ページ
+
+    Yields:
+        (int, list of string): ページ番号(0始まり)と、そのページから抽出した行のリスト
+    """
+    with open(filename, "rb") as fp:
+        rsrcmgr = PDFResourceManager()
+        device = _ScanDevice(rsrcmgr)
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+
+        for page_index, page in enumerate(PDFPage.get_pages(fp)):
+            if page_numbers is not None and page_index not in page_numbers:
+                continue
+            interpreter.process_page(page)
+            yield page_index, device.page_lines
+
+
+class _ScanDevice(PDFTextDevice):
+    """
+    レイアウト解析を行わず、描画された文字を単純に行にまとめるデバイス
+
+    LTCharなどのレイアウト用のオブジェクトも作らず、文字と位置だけを記録する
+    """
+    def __init__(self, rsrcmgr):
+        super().__init__(rsrcmgr)
+        # 文字間の距離の閾値(文字の大きさに対する比)はLAParamsの既定値に合わせ、
+        # レイアウト解析を行った場合と同じ位置で行や単語が区切られるようにする
+        laparams = LAParams()
+        self.__char_margin = laparams.char_margin
+        self.__word_margin = laparams.word_margin
+        self.__chars = []
+        self.page_lines = []
+
+    def begin_page(self, page, ctm):
+        self.__chars = []
+
+    def end_page(self, page):
+        self.page_lines = self.__GroupLines(self.__chars)
+        self.__chars = []
+
+    def render_char(self, matrix, font, fontsize, scaling, rise, cid, *args):
+        try:
+            text = font.to_unichr(cid)
+        except PDFUnicodeNotDefined:
+            text = ""
+        adv = font.char_width(cid) * fontsize * scaling
+        (a, b, c, d, e, f) = matrix
+        # 文字の左下の位置と右端、大きさ(LTCharの外接矩形を簡略化したもの)
+        size = abs(fontsize * d) or abs(fontsize * a)
+        self.__chars.append((text, e, e + adv * a, f + rise * d, size))
+        return adv
+
+    def __GroupLines(self, chars):
+        lines = []
+        current = []
+        last = None
+        for char in chars:
+            text, x0, x1, y0, size = char
+            if last is not None:
+                size = max(size, last[4])
+                gap = x0 - last[2]
+                if abs(y0 - last[3]) > size / 2 or gap > self.__char_margin * size or gap < -size:
+                    # ベースラインが変わったか、文字が大きく離れたら別の行
+                    lines.append("".join(current))
+                    current = []
+                elif gap > self.__word_margin * size and not last[0].isspace() and not text.isspace():
+                    # 文字がある程度離れていれば単語の区切り
+                    current.append(" ")
+            current.append(text)
+            last = char
+        if len(current) > 0:
+            lines.append("".join(current))
+        return lines
+
+
+def _IterPDFPageLines_Extract(filename, page_numbers=None, workers=1, pages_per_shard=8):
+    """
+    IterPDFPageLinesのうち、キャッシュを用いずに実際に抽出を行う部分
+    """
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    pages_per_shard = max(1, pages_per_shard)
+
+    if workers == 1:
+        yield from _IterPDFPageLines_Serial(filename, page_numbers)
+        return
+
+    # 抽出対象のページを断片に分ける
+    target_pages = [i for i in range(CountPDFPages(filename)) if page_numbers is None or i in page_numbers]
+    shards = [target_pages[i:i + pages_per_shard] for i in range(0, len(target_pages), pages_per_shard)]
+    # 断片が一つしか無いなら、プロセスを立ち上げるだけ無駄なのでそのまま抽出する
+    if len(shards) <= 1:
+        yield from _IterPDFPageLines_Serial(filename, page_numbers)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+        # 読み出されるより先に抽出しておく断片は、プロセス数より一つ多い数までにとどめる
+        # 終了条件にヒットするなどして途中で読むのをやめた場合に、残りのページを無駄に解析しないため
+        remaining_shards = iter(shards)
+        futures = deque(executor.submit(_ExtractPDFPageShard, filename, shard) for shard in islice(remaining_shards, workers + 1))
+        try:
+            # 完了した順ではなくページ順に返す
+            while len(futures) > 0:
+                pages = futures.popleft().result()
+                for shard in islice(remaining_shards, 1):
+                    futures.append(executor.submit(_ExtractPDFPageShard, filename, shard))
+                yield from pages
+        finally:
+            # 途中で読むのをやめた場合は、まだ始まっていない断片の抽出を取りやめる
+            for future in futures:
+                future.cancel()
+
+
+def CountPDFPages(filename):
+    """
+    PDFファイルのページ数を数える(レイアウト解析は行わない)
+
+    Args:
+        filename (string): 対象のPDFファイル名
+
+    Returns:
+        int: ページ数
+    """
+    with open(filename, "rb") as fp:
+        document = PDFDocument(PDFParser(fp))
+        return sum(1 for _ in PDFPage.create_pages(document))
+
+
+def _ExtractPDFPageShard(filename, page_numbers):
+    """
+    ワーカープロセスで実行される、PDFの断片(いくつかのページ)の抽出処理
+
+    Args:
+        filename (string): 抽出対象のPDFファイル名
+        page_numbers (list of int): 抽出するページ番号(0始まり)
+
+    Returns:
+        list of (int, list of string): ページ番号とそのページから抽出した行のリストの組のリスト
+    """
+    return list(_IterPDFPageLines_Serial(filename, set(page_numbers)))
+
+
+def _IterPDFPageLines_Serial(filename, page_numbers=None):
+    """
+    IterPDFPageLinesのうち、単一のプロセスで抽出を行う部分
+    """
+    with open(filename, "rb") as fp:
+        rsrcmgr = PDFResourceManager()
+        output_string = StringIO()
+        device = TextConverter(rsrcmgr, output_string, laparams=LAParams())
+        interpreter = PDFPageInterpreter(rsrcmgr, device)
+
+        try:
+            for page_index, page in enumerate(PDFPage.get_pages(fp)):
+                # 対象外のページはレイアウト解析を行わずに飛ばす
+                if page_numbers is not None and page_index not in page_numbers:
+                    continue
+                interpreter.process_page(page)
+
+                # 1ページ分のテキストを取り出したら、次のページのためにバッファを空にする
+                page_text = output_string.getvalue()
+                output_string.seek(0)
+                output_string.truncate(0)
+
+                yield page_index, page_text.splitlines()
+        finally:
+            device.close()
+            output_string.close()
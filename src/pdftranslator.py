@@ -1,53 +1,61 @@
+import os
 import re
 import wx
 
-from deeplmanager import DeepLManager
+from concurrent.futures import ProcessPoolExecutor
+from deeplmanager import GetSessionPool
+from extractioncache import ExtractionCache
+from linetable import CHART_START, HEADER, RETURN, RETURN_IGNORE, LineTable
 from pathlib import Path
-from pdfminer.high_level import extract_text
+from pdfextractor import PDFRawText
 from pdfminer.pdfparser import PDFSyntaxError
+from ruleset import ClassifyLines, CompilePattern, GetRuleSet, GuardRules, ProfileRules, RuleGuard, RuleProfile
 from settings import Settings
+from threading import Lock
 
 
-def re_search(pattern, string, ignorecase):
-    if ignorecase:
-        return re.search(pattern, string, flags=re.IGNORECASE)
-    else:
-        return re.search(pattern, string)
-
-
-def re_sub(pattern, repl, string, ignorecase):
-    if ignorecase:
-        return re.sub(pattern, repl, string, flags=re.IGNORECASE)
-    else:
-        return re.sub(pattern, repl, string)
-
-
-def re_findall(pattern, string, ignorecase):
-    if ignorecase:
-        return re.findall(pattern, string, flags=re.IGNORECASE)
-    else:
-        return re.findall(pattern, string)
+# 全ての翻訳で共有する、開始・終了・無視条件の判定を並列に行うためのプロセスプール
+# 複数のファイルを同時に翻訳しても、プロセスが翻訳の数だけ増えないようにする
+_classify_executor = None
+_classify_executor_workers = 0
+_classify_executor_lock = Lock()
 
 
 def PDFTranslate(mainwindow, progress_window, filename):
     try:
-        textlines = PDFTextExtract(filename)
+        rawtext = PDFRawTextExtract(filename)
     except FileNotFoundError:
         wx.LogMessage("指定のファイルが見つかりませんでした。")
         progress_window.Destroy()
         return False
 
-    setting_ignore_start_condition = not Settings.RegularExpressions.StartLines().enabled_overall
-    setting_ignore_end_condition = not Settings.RegularExpressions.EndLines().enabled_overall
-
-    if textlines is None:
+    if rawtext is None:
         # ファイルがそもそもPDFではなかったとき
         wx.MessageBox(filename + "はPDF形式ではありません。", "notPDF")
         return False
-    elif len(textlines) == 0:
+
+    # ページの抽出や各種条件による加工を行っている間に、翻訳に用いるウェブブラウザを起動してDeepLのページを開いておく
+    # (ページは必要になった時点で抽出されるので、ここまではページ数を数えただけ)
+    # (ファイルが見つからなかったりPDFでなかったりした場合に、無駄に起動しないよう読み込めてから行う)
+    GetSessionPool().Prewarm()
+
+    # 正規表現ごとの処理時間を計測する場合は、その集計先
+    profile = RuleProfile() if Settings.RegularExpressions().profile_rules else None
+    # 指数関数的なバックトラックを起こしうる正規表現は、制限時間付きで照合する
+    time_budget_ms = Settings.RegularExpressions().rule_time_budget_ms
+    guard = RuleGuard(time_budget_ms / 1000) if time_budget_ms > 0 else None
+
+    with ProfileRules(profile), GuardRules(guard):
+        textlines = PDFTextExtract(filename, rawtext=rawtext)
+
+    setting_ignore_start_condition = not Settings.RegularExpressions.StartLines().enabled_overall
+    setting_ignore_end_condition = not Settings.RegularExpressions.EndLines().enabled_overall
+
+    if len(textlines) == 0:
         # PDFではあったがテキストが抽出できなかったとき、
         # 開始条件に引っかからなかったか、終了条件に引っかかりまくったかの可能性を考慮して、
-        # それらを無視するか聞き、どちらか片方でも無視するならもう一度抽出を行う
+        # それらを無視するか聞き、どちらか片方でも無視するならもう一度加工を行う
+        # PDFの解析結果は保持しているので、やり直すのは各種条件による加工のみ
         while True:
             ignore_start_condition = False
             ignore_end_condition = False
@@ -70,8 +78,9 @@ def PDFTranslate(mainwindow, progress_window, filename):
                     ignore_end_condition = True
 
             if ignore_start_condition or ignore_end_condition:
-                # どちらか片方でも無視するように変更するならもう一度抽出を行う
-                textlines = PDFTextExtract(filename, ignore_start_condition, ignore_end_condition)
+                # どちらか片方でも無視するように変更するならもう一度加工を行う
+                with ProfileRules(profile), GuardRules(guard):
+                    textlines = PDFTextExtract(filename, ignore_start_condition, ignore_end_condition, rawtext)
             else:
                 # そうでない(元の設定でどちらも無視するようになっていたり、
                 # 無視するように設定し直さない)なら失敗と見なす
@@ -83,16 +92,95 @@ def PDFTranslate(mainwindow, progress_window, filename):
             if len(textlines) != 0:
                 break
 
+    # 抽出の結果を出力する
+    if Settings.PDFExtraction().output_report:
+        OutputExtractionReport(filename, rawtext)
+
     # 抽出したテキストを翻訳単位ごとにまとめる
-    tl_units = OrganizeTranslationUnits(filename, textlines)
+    with ProfileRules(profile), GuardRules(guard):
+        tl_units, tl_headers = OrganizeTranslationUnits(filename, textlines)
+
+    # 正規表現ごとの処理時間の計測結果を出力する
+    if profile is not None:
+        OutputRuleProfile(filename, profile)
+    # 制限時間を超えて無効にした正規表現を知らせる
+    if guard is not None:
+        for name, rule, line in guard.timeouts:
+            wx.LogWarning(
+                name + "の正規表現「" + rule.pattern + "」は、次の行の照合に" + str(time_budget_ms) + "ミリ秒以上かかったため、"
+                + "このファイルの処理では無効にしました。\n" + line)
 
     # 翻訳の実行と翻訳結果の書き込み
-    TranslateAndWrite(mainwindow, progress_window, filename, tl_units)
+    TranslateAndWrite(mainwindow, progress_window, filename, tl_units, tl_headers)
 
     return True
 
 
-def PDFTextExtract(filename, force_ignore_start_condition=False, force_ignore_end_condition=False):
+def PDFRawTextExtract(filename):
+    """
+    渡されたPDFファイルからテキストを抽出する準備を行う
+    各種条件による加工は行わないので、条件を変えて何度でもPDFTextExtractに渡せる
+
+    Args:
+        filename (string): 抽出対象のPDFファイル名
+
+    Returns:
+        PDFRawText: ファイルがPDFでない場合はNone
+        それ以外の場合は加工前のテキスト(ページは必要になった時点で抽出される)
+    """
+    # 同じファイルを正規表現の設定だけ変えて翻訳し直す場合に備え、加工前のテキストをキャッシュする
+    cache = None
+    if Settings.PDFExtraction().use_cache:
+        cache = ExtractionCache(max_size_mb=Settings.PDFExtraction().cache_size_mb)
+
+    try:
+        return PDFRawText(
+            filename,
+            workers=Settings.PDFExtraction().parallel_workers,
+            pages_per_shard=Settings.PDFExtraction().pages_per_shard,
+            cache=cache)
+    except PDFSyntaxError:
+        # ドロップされたファイルがPDFでない場合はNone
+        return None
+
+
+def GetClassifyExecutor(workers):
+    """
+    全ての翻訳で共有する、開始・終了・無視条件の判定を並列に行うためのプロセスプールを取得する
+    まだ無いか、プロセス数が変わっていれば作成する
+
+    Args:
+        workers (int): プロセス数
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor: プロセスプール プロセス数が1以下ならNone(並列化しない)
+    """
+    global _classify_executor, _classify_executor_workers
+    if workers <= 1:
+        return None
+    with _classify_executor_lock:
+        if _classify_executor is None or _classify_executor_workers != workers:
+            if _classify_executor is not None:
+                # 使用中の翻訳があっても、依頼済みの判定は終わるまで待ってもらえる
+                _classify_executor.shutdown(wait=False)
+            _classify_executor = ProcessPoolExecutor(max_workers=workers)
+            _classify_executor_workers = workers
+        return _classify_executor
+
+
+def CloseClassifyExecutor():
+    """
+    全ての翻訳で共有する、開始・終了・無視条件の判定を並列に行うためのプロセスプールを終了させる
+    """
+    global _classify_executor, _classify_executor_workers
+    with _classify_executor_lock:
+        if _classify_executor is not None:
+            _classify_executor.shutdown()
+            _classify_executor = None
+            _classify_executor_workers = 0
+
+
+def PDFTextExtract(filename, force_ignore_start_condition=False, force_ignore_end_condition=False, rawtext=None):
     """
     渡されたPDFファイルからテキストを抽出し、各種条件によって加工を施して返す
     outputから始まる各種引数をTrueにすることで、各種条件にヒットする行をtxtファイルとして出力する
@@ -101,12 +189,19 @@ def PDFTextExtract(filename, force_ignore_start_condition=False, force_ignore_en
         filename (string): 抽出対象のPDFファイル名
         force_ignore_start_condition (bool, optional): 翻訳開始条件の無視を強制する
         force_ignore_end_condition (bool, optional): 翻訳終了条件の無視を強制する
+        rawtext (PDFRawText, optional): PDFRawTextExtractで抽出済みの加工前のテキスト
+        渡された場合はPDFの解析を行わず、これに対して加工を施す
 
     Returns:
-        list of string: ファイルがPDFでない場合はNone
-        翻訳開始条件に該当しないなどでテキストを抽出できなかった場合は空リスト
-        それ以外の場合は抽出・加工したテキスト
+        LineTable: ファイルがPDFでない場合はNone
+        翻訳開始条件に該当しないなどでテキストを抽出できなかった場合は空の表
+        それ以外の場合は抽出・加工したテキストの表
     """
+    if rawtext is None:
+        rawtext = PDFRawTextExtract(filename)
+        if rawtext is None:
+            return None
+
     # 出力をMarkdown式にするか
     # output_type_markdown = Settings().output_type_markdown
     # 各種条件が有効か
@@ -124,38 +219,13 @@ def PDFTextExtract(filename, force_ignore_start_condition=False, force_ignore_en
     output_markdown_replace_source_lines = Settings.RegularExpressions.ReplaceParts.Markdown().output_hit_lines
     output_header_lines = Settings.RegularExpressions.HeaderLines().output_hit_lines
 
-    # 各種正規表現のリスト
-    start_lines_enabled_list = Settings.RegularExpressions.StartLines().enabled_list
-    start_lines_ignorecase_list = Settings.RegularExpressions.StartLines().ignorecase_list
-    start_lines_pattern_list = Settings.RegularExpressions.StartLines().pattern_list
-    end_lines_enabled_list = Settings.RegularExpressions.EndLines().enabled_list
-    end_lines_ignorecase_list = Settings.RegularExpressions.EndLines().ignorecase_list
-    end_lines_pattern_list = Settings.RegularExpressions.EndLines().pattern_list
-    ignore_lines_enabled_list = Settings.RegularExpressions.IgnoreLines().enabled_list
-    ignore_lines_ignorecase_list = Settings.RegularExpressions.IgnoreLines().ignorecase_list
-    ignore_lines_pattern_list = Settings.RegularExpressions.IgnoreLines().pattern_list
-    replace_lines_enabled_list = Settings.RegularExpressions.ReplaceParts.Standard().enabled_list
-    replace_lines_ignorecase_list = Settings.RegularExpressions.ReplaceParts.Standard().ignorecase_list
-    replace_lines_pattern_list = Settings.RegularExpressions.ReplaceParts.Standard().pattern_list
-    replace_lines_target_list = Settings.RegularExpressions.ReplaceParts.Standard().target_list
-    markdown_replace_lines_enabled_list = Settings.RegularExpressions.ReplaceParts.Markdown().enabled_list
-    markdown_replace_lines_ignorecase_list = Settings.RegularExpressions.ReplaceParts.Markdown().ignorecase_list
-    markdown_replace_lines_pattern_list = Settings.RegularExpressions.ReplaceParts.Markdown().pattern_list
-    markdown_replace_lines_target_list = Settings.RegularExpressions.ReplaceParts.Markdown().target_list
-    header_lines_enabled_list = Settings.RegularExpressions.HeaderLines().enabled_list
-    header_lines_ignorecase_list = Settings.RegularExpressions.HeaderLines().ignorecase_list
-    header_lines_pattern_list = Settings.RegularExpressions.HeaderLines().pattern_list
-
-    # PDFからテキストを抽出
-    textlines = []
-    try:
-        textlines = extract_text(filename).splitlines()
-    except PDFSyntaxError:
-        # ドロップされたファイルがPDFでない場合はNone
-        return None
-
-    # 抽出したテキストから空行を除く
-    temp = list(filter(lambda s: s != "", textlines))
+    # 各種正規表現(コンパイル済み)
+    start_rules = GetRuleSet(Settings.RegularExpressions.StartLines())
+    end_rules = GetRuleSet(Settings.RegularExpressions.EndLines())
+    ignore_rules = GetRuleSet(Settings.RegularExpressions.IgnoreLines())
+    replace_rules = GetRuleSet(Settings.RegularExpressions.ReplaceParts.Standard())
+    markdown_replace_rules = GetRuleSet(Settings.RegularExpressions.ReplaceParts.Markdown())
+    header_rules = GetRuleSet(Settings.RegularExpressions.HeaderLines())
 
     # 出力用のディレクトリを作成
     Path("output").mkdir(exist_ok=True)
@@ -184,74 +254,159 @@ def PDFTextExtract(filename, force_ignore_start_condition=False, force_ignore_en
     # 除くべき行を除く
     textlines = []
     lines_extracting = False    # テキストを抽出中か
-    skipLine = False            # その行を飛ばすか
     # 開始条件を無視する場合
     if (not start_lines_enabled_overall) or force_ignore_start_condition:
         lines_extracting = True
-    for t in temp:
-        # 翻訳を開始する合図となる文字列を探す
-        if start_lines_enabled_overall:
-            for sli in range(len(start_lines_pattern_list)):
-                # その正規表現パターンが有効かつパターンにヒットした場合
-                if start_lines_enabled_list[sli] and re_search(start_lines_pattern_list[sli], t, start_lines_ignorecase_list[sli]):
-                    if output_start_lines:
-                        f_start.write(start_lines_pattern_list[sli] + ", " + t + "\n")
+    # 置換条件による置換を、抽出した行全体に対してまとめて行うか
+    bulk_replace = Settings.PDFExtraction().bulk_replace
+    # 終了条件にヒットした(かつその後開始条件にヒットしていない)か
+    end_condition_hit = False
+    # 終了条件にヒットしたら、それ以降のページの抽出を打ち切るか
+    # 開始条件が無効な場合は、終了条件にヒットした行を飛ばすだけで抽出は続くので打ち切らない
+    stop_at_end_condition = Settings.PDFExtraction().stop_at_end_condition and start_lines_enabled_overall and not force_ignore_end_condition
+    # 文書のアウトライン(しおり)から翻訳を開始・終了するページを求め、その範囲のみを抽出する
+    # アウトラインが無かったり、条件にヒットする見出しが無い場合は文書全体を対象にする
+    # 終了するページは、終了条件による抽出の打ち切りを行う(開始条件が有効な)場合のみ求める
+    find_start_page = start_lines_enabled_overall and not force_ignore_start_condition
+    first_page, last_page = 0, None
+    if Settings.PDFExtraction().use_outline:
+        first_page, last_page = FindPageRangeFromOutline(
+            rawtext.outline,
+            find_start_page,
+            end_lines_enabled_overall and stop_at_end_condition)
+    # アウトラインから開始するページが求まらなかった場合は、レイアウト解析を行わない大まかな抽出で
+    # 抽出開始条件にヒットするページを探し、そのページ以降のみレイアウト解析を行う
+    # (終了するページは、上の終了条件による抽出の打ち切りで対応できる)
+    if find_start_page and first_page == 0 and Settings.PDFExtraction().two_phase_extraction:
+        first_page = FindStartPageFromScan(rawtext)
+    # 開始・終了・無視条件の判定を並列に行うためのプロセスプール
+    # 抽出済みのページは数千行ずつまとめて、行ごとの判定を複数のプロセスで並列に行う
+    lines_per_chunk = Settings.PDFExtraction().lines_per_chunk
+    workers = Settings.PDFExtraction().parallel_workers
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    executor = GetClassifyExecutor(workers)
+    # 判定を行う条件
+    classify_rules = []
+    if start_lines_enabled_overall:
+        classify_rules.append(start_rules)
+    if end_lines_enabled_overall:
+        classify_rules.append(end_rules)
+    if ignore_lines_enabled_overall:
+        classify_rules.append(ignore_rules)
+    # ページ順に処理する
+    # まだ抽出されていないページは、ここで1ページずつ抽出される
+    for page_batch in rawtext.IterPageBatches(first_page, last_page, workers * lines_per_chunk if executor is not None else 0):
+        # 空行は飛ばす
+        lines = []
+        page_ends = []  # 各ページの最後の行の次の行の番号
+        for _, page_textlines in page_batch:
+            lines.extend(t for t in page_textlines if t != "")
+            page_ends.append(len(lines))
+
+        # 各行が開始・終了・無視条件のどれにヒットするかを調べる
+        classified = ClassifyLines(classify_rules, lines, executor, lines_per_chunk)
+        start_hits = classified.pop(0) if start_lines_enabled_overall else {}
+        end_hits = classified.pop(0) if end_lines_enabled_overall else {}
+        ignore_hits = classified.pop(0) if ignore_lines_enabled_overall else {}
+
+        # 開始・終了条件にヒットした行の間だけ状態が変わらないので、ヒットした行を順にたどって抽出する範囲を求める
+        extracted = []  # 抽出する行の番号
+        events = sorted(start_hits.keys() | end_hits.keys())
+        event_index = 0
+        line_index = 0
+        for page_end in page_ends:
+            while line_index < page_end:
+                # 次にヒットした行(このページに無ければページの終わり)までは状態が変わらない
+                next_event = events[event_index] if event_index < len(events) else len(lines)
+                segment_end = min(next_event, page_end)
+                if segment_end > line_index:
+                    # 開始条件が無効なら、一行ごとに抽出を開始する
+                    if not start_lines_enabled_overall:
+                        lines_extracting = True
+                        end_condition_hit = False
+                    if lines_extracting:
+                        extracted.extend(range(line_index, segment_end))
+                    line_index = segment_end
+                    continue
+
+                # 翻訳を開始する合図となる文字列にヒットした行
+                if start_lines_enabled_overall:
+                    rule = start_hits.get(line_index)
+                    if rule is not None:
+                        if output_start_lines:
+                            f_start.write(rule.pattern + ", " + lines[line_index] + "\n")
+                        lines_extracting = True
+                        end_condition_hit = False
+                else:
                     lines_extracting = True
-                    break
-        else:
-            lines_extracting = True
-        # 翻訳を打ち切る合図となる文字列を探す
-        if end_lines_enabled_overall:
-            for eli in range(len(end_lines_pattern_list)):
-                if end_lines_enabled_list[eli] and re_search(end_lines_pattern_list[eli], t, end_lines_ignorecase_list[eli]):
+                    end_condition_hit = False
+                # 翻訳を打ち切る合図となる文字列にヒットした行
+                rule = end_hits.get(line_index)
+                if rule is not None:
                     if output_end_lines:
-                        f_end.write(end_lines_pattern_list[eli] + ", " + t + "\n")
+                        f_end.write(rule.pattern + ", " + lines[line_index] + "\n")
                     # 強制的に条件を無視しないなら、抽出中止フラグを建てる
                     if not force_ignore_end_condition:
                         lines_extracting = False
-                    break
-        # 抽出しないことになったなら、その文字列は飛ばす
-        if not lines_extracting:
-            continue
-
-        # 抽出を開始しても、無視する文字列なら飛ばす
-        if ignore_lines_enabled_overall:
-            for ili in range(len(ignore_lines_pattern_list)):
-                if ignore_lines_enabled_list[ili] and re_search(ignore_lines_pattern_list[ili], t, ignore_lines_ignorecase_list[ili]):
-                    skipLine = True
-                    if output_ignore_lines:
-                        f_ignore.write(ignore_lines_pattern_list[ili] + ", " + t + "\n")
-                    break
-            if skipLine:
-                skipLine = False
+                        end_condition_hit = True
+                if lines_extracting:
+                    extracted.append(line_index)
+                line_index += 1
+                event_index += 1
+
+            # 終了条件にヒットしてから開始条件にヒットしていなければ、以降のページは抽出しない
+            # 抽出済みのページは無駄にならないよう最後まで処理する
+            if stop_at_end_condition and end_condition_hit:
+                break
+
+        for i in extracted:
+            t = lines[i]
+            # 抽出を開始しても、無視する文字列なら飛ばす
+            rule = ignore_hits.get(i)
+            if rule is not None:
+                if output_ignore_lines:
+                    f_ignore.write(rule.pattern + ", " + t + "\n")
                 continue
 
-        # 置換すべき文字列があったなら置換する
-        if replace_lines_enabled_overall:
-            for ri in range(len(replace_lines_pattern_list)):
-                if replace_lines_enabled_list[ri]:
+            # 置換すべき文字列があったなら置換する
+            # まとめて置換する場合は、抽出がすべて終わってから行う
+            if not bulk_replace:
+                if replace_lines_enabled_overall:
+                    hits = [] if output_replace_source_lines else None
+                    t = replace_rules.Sub(t, hits)
                     # ヒットした時の出力
-                    if output_replace_source_lines and re_search(replace_lines_pattern_list[ri], t, replace_lines_ignorecase_list[ri]):
-                        f_replace.write(replace_lines_pattern_list[ri] + ", " + t + "\n")
-                    # 置換
-                    t = re_sub(replace_lines_pattern_list[ri], replace_lines_target_list[ri], t, replace_lines_ignorecase_list[ri])
-        if markdown_replace_lines_enabled_overall:
-            for mri in range(len(markdown_replace_lines_pattern_list)):
-                if markdown_replace_lines_enabled_list[mri]:
+                    if output_replace_source_lines:
+                        for rule, source in hits:
+                            f_replace.write(rule.pattern + ", " + source + "\n")
+                if markdown_replace_lines_enabled_overall:
+                    hits = [] if output_markdown_replace_source_lines else None
+                    t = markdown_replace_rules.Sub(t, hits)
                     # ヒットした時の出力
-                    if output_markdown_replace_source_lines and re_search(markdown_replace_lines_pattern_list[mri], t, markdown_replace_lines_ignorecase_list[mri]):
-                        f_markdown_replace.write(markdown_replace_lines_pattern_list[mri] + ", " + t + "\n")
-                    # 置換
-                    t = re_sub(markdown_replace_lines_pattern_list[mri], markdown_replace_lines_target_list[mri], t, markdown_replace_lines_ignorecase_list[mri])
+                    if output_markdown_replace_source_lines:
+                        for rule, source in hits:
+                            f_markdown_replace.write(rule.pattern + ", " + source + "\n")
+
+            textlines.append(t)
 
-        if header_lines_enabled_overall and output_header_lines:
-            # 見出し条件に引っかかる場合は出力
-            for hli in range(len(header_lines_pattern_list)):
-                if header_lines_enabled_list[hli] and re_search(header_lines_pattern_list[hli], t, header_lines_ignorecase_list[hli]):
-                    f_header.write(header_lines_pattern_list[hli] + ", " + t + "\n")
-                    break
+        if stop_at_end_condition and end_condition_hit:
+            break
 
-        textlines.append(t)
+    # 次に加工し直すまで抽出の途中の状態を保持しないよう、抽出を中断する
+    rawtext.Close()
+
+    # 抽出した行全体に対して、置換条件の正規表現ごとに一度ずつ置換を行う
+    if bulk_replace:
+        if replace_lines_enabled_overall:
+            textlines = ReplaceLines(textlines, replace_rules, f_replace if output_replace_source_lines else None)
+        if markdown_replace_lines_enabled_overall:
+            textlines = ReplaceLines(textlines, markdown_replace_rules, f_markdown_replace if output_markdown_replace_source_lines else None)
+
+    # 以降の処理で使い回せるよう、加工した行を表にまとめる
+    table = LineTable(textlines)
+    if header_lines_enabled_overall and output_header_lines:
+        table.Classify(HEADER, header_rules)
+        table.WriteHitLines(HEADER, f_header)
 
     # ファイルクローズ
     if start_lines_enabled_overall and output_start_lines:
@@ -268,19 +423,152 @@ def PDFTextExtract(filename, force_ignore_start_condition=False, force_ignore_en
         f_header.close()
 
     # 抽出・加工したテキストを返す
+    return table
+
+
+def ReplaceLines(textlines, rules, f_hit=None):
+    """
+    各行に、置換条件の正規表現による置換をまとめて施す
+
+    Args:
+        textlines (list of string): 対象の行のリスト
+        rules (RuleSet): 置換条件の正規表現
+        f_hit (file object, optional): 渡された場合は、ヒットした正規表現と置換前の行を書き込む
+
+    Returns:
+        list of string: 置換後の行のリスト
+    """
+    hits = [] if f_hit is not None else None
+    textlines = rules.SubLines(textlines, hits)
+    # ヒットした時の出力
+    if f_hit is not None:
+        for _, rule, source in hits:
+            f_hit.write(rule.pattern + ", " + source + "\n")
     return textlines
 
 
-def OrganizeTranslationUnits(filename, textlines):
+def FindPageRangeFromOutline(outline, find_start, find_end):
+    """
+    文書のアウトライン(しおり)の見出しに抽出開始・終了条件を当てはめ、抽出すべきページの範囲を求める
+
+    Args:
+        outline (list of (string, int)): 見出しとそのページ番号の組のリスト
+        find_start (bool): 抽出開始条件にヒットする見出しを探すか
+        find_end (bool): 抽出終了条件にヒットする見出しを探すか
+
+    Returns:
+        (int, int): 最初のページ番号と最後のページ番号(このページも含む)
+        ヒットする見出しが無い場合は、それぞれ0とNone(文書の最後まで)
+    """
+    start_rules = GetRuleSet(Settings.RegularExpressions.StartLines())
+    end_rules = GetRuleSet(Settings.RegularExpressions.EndLines())
+
+    first_page, last_page = 0, None
+    start_index = 0     # 抽出開始条件にヒットした見出しの位置
+
+    if find_start:
+        for i, (title, page_index) in enumerate(outline):
+            if start_rules.Search(title) is not None:
+                first_page = page_index
+                start_index = i
+                break
+
+    if find_end:
+        # 抽出開始条件にヒットした見出しより後ろから探す
+        for title, page_index in outline[start_index:]:
+            if page_index < first_page:
+                continue
+            if end_rules.Search(title) is not None:
+                last_page = page_index
+                break
+
+    return first_page, last_page
+
+
+def FindStartPageFromScan(rawtext):
+    """
+    レイアウト解析を行わない大まかな抽出によって、抽出開始条件にヒットする最初のページを探す
+
+    Args:
+        rawtext (PDFRawText): 対象の加工前のテキスト
+
+    Returns:
+        int: 抽出開始条件にヒットする最初のページ番号 ヒットするページが無い場合は0
+    """
+    start_rules = GetRuleSet(Settings.RegularExpressions.StartLines())
+
+    for page_index, page_textlines in rawtext.IterScanPages():
+        for t in page_textlines:
+            if start_rules.Search(t) is not None:
+                return page_index
+
+    return 0
+
+
+def OutputExtractionReport(filename, rawtext):
+    """
+    PDFからの抽出の結果を(PDFのファイル名)_Report.txtとして出力する
+
+    Args:
+        filename (string): 抽出対象のPDFファイル名
+        rawtext (PDFRawText): 抽出に用いた加工前のテキスト
+    """
+    Path("output").mkdir(exist_ok=True)
+    file_path = str(Path("output/" + Path(filename).stem))
+    with open(file_path + "_Report.txt", mode="w", encoding="utf-8") as f:
+        extracted_page_numbers = rawtext.extracted_page_numbers
+        f.write("総ページ数: " + str(rawtext.num_pages) + "\n")
+        f.write("解析したページ数: " + str(len(extracted_page_numbers)) + "\n")
+        f.write("解析を省略したページ数: " + str(rawtext.num_pages - len(extracted_page_numbers)) + "\n")
+        f.write("解析したページ: " + ", ".join(FormatPageRanges(extracted_page_numbers)) + "\n")
+
+
+def OutputRuleProfile(filename, profile):
+    """
+    正規表現ごとの処理時間の計測結果を(PDFのファイル名)_RuleProfile.txtとして出力する
+
+    Args:
+        filename (string): 抽出対象のPDFファイル名
+        profile (RuleProfile): 計測結果
+    """
+    Path("output").mkdir(exist_ok=True)
+    file_path = str(Path("output/" + Path(filename).stem))
+    with open(file_path + "_RuleProfile.txt", mode="w", encoding="utf-8") as f:
+        profile.WriteReport(f)
+
+
+def FormatPageRanges(page_numbers):
+    """
+    ページ番号(0始まり)のリストを、連続する部分をまとめた表記(1始まり)のリストにする
+
+    例: [0, 1, 2, 5, 7, 8] -> ["1-3", "6", "8-9"]
+
+    Args:
+        page_numbers (list of int): 昇順に並んだページ番号のリスト
+
+    Returns:
+        list of string: ページ範囲の表記のリスト
+    """
+    ranges = []
+    for page_index in page_numbers:
+        if len(ranges) > 0 and ranges[-1][1] == page_index - 1:
+            ranges[-1][1] = page_index
+        else:
+            ranges.append([page_index, page_index])
+    return [str(a + 1) if a == b else str(a + 1) + "-" + str(b + 1) for a, b in ranges]
+
+
+def OrganizeTranslationUnits(filename, table):
     """
     PDFから抽出・加工したテキストから翻訳単位(DeepLで一回に翻訳する段落の集まり)を構成し、そのリストを返す
+    Markdown式で出力する場合は、各段落が見出しかどうかも併せて求める
 
     Args:
-        textlines (list of string): PDFから抽出・加工したテキストのリスト
-        tl_unit_max_len (int, optional): 翻訳単位の最大の長さ(無料版DeepLの制限が5000字まで)
+        table (LineTable): PDFから抽出・加工したテキストの表
 
     Returns:
-        2D-list of string: 翻訳単位のリスト
+        (2D-list of string, 2D-list of Rule): 翻訳単位のリストと、
+        各段落に最初にヒットした見出し条件の正規表現のリスト(ヒットしない段落や、Markdown式で出力しない場合はNone)
     """
     # 各種条件が有効か
     chart_start_lines_enabled_overall = Settings.RegularExpressions.ChartStartLines().enabled_overall
@@ -290,52 +578,61 @@ def OrganizeTranslationUnits(filename, textlines):
     output_chart_start_lines = Settings.RegularExpressions.ChartStartLines().output_hit_lines
     output_return_lines = Settings.RegularExpressions.ReturnLines.Possibility().output_hit_lines
     output_return_ignore_lines = Settings.RegularExpressions.ReturnLines.Ignore().output_hit_lines
-    # 各種正規表現のリスト
-    chart_start_lines_enabled_list = Settings.RegularExpressions.ChartStartLines().enabled_list
-    chart_start_lines_pattern_list = Settings.RegularExpressions.ChartStartLines().pattern_list
-    chart_start_lines_ignorecase_list = Settings.RegularExpressions.ChartStartLines().ignorecase_list
-    return_lines_enabled_list = Settings.RegularExpressions.ReturnLines.Possibility().enabled_list
-    return_lines_pattern_list = Settings.RegularExpressions.ReturnLines.Possibility().pattern_list
-    return_lines_ignorecase_list = Settings.RegularExpressions.ReturnLines.Possibility().ignorecase_list
-    return_ignore_lines_enabled_list = Settings.RegularExpressions.ReturnLines.Ignore().enabled_list
-    return_ignore_lines_pattern_list = Settings.RegularExpressions.ReturnLines.Ignore().pattern_list
-    return_ignore_lines_ignorecase_list = Settings.RegularExpressions.ReturnLines.Ignore().ignorecase_list
+    # 各種正規表現(コンパイル済み)
+    chart_start_rules = GetRuleSet(Settings.RegularExpressions.ChartStartLines())
+    return_rules = GetRuleSet(Settings.RegularExpressions.ReturnLines.Possibility())
+    return_ignore_rules = GetRuleSet(Settings.RegularExpressions.ReturnLines.Ignore())
+    # 見出しを調べるか(Markdown式で出力する場合のみ)
+    find_header = Settings().output_type_markdown and Settings.RegularExpressions.HeaderLines().enabled_overall
+    header_rules = GetRuleSet(Settings.RegularExpressions.HeaderLines())
+
+    # 各行が各種条件にヒットするかを、表にまとめて調べておく
+    # 文末と見なさない条件は、文末と見なす条件にヒットした行のみ調べる
+    if chart_start_lines_enabled_overall:
+        table.Classify(CHART_START, chart_start_rules)
+    if return_lines_enabled_overall:
+        table.Classify(RETURN, return_rules)
+        if return_ignore_lines_enabled_overall:
+            table.Classify(RETURN_IGNORE, return_ignore_rules, [i for i in range(len(table)) if table.IsHit(RETURN, i)])
+    if find_header:
+        table.Classify(HEADER, header_rules)
 
     # 出力用のディレクトリを作成
     Path("output").mkdir(exist_ok=True)
-    # 条件に該当する行を出力するためのファイル群
+    # 条件に該当する行を出力する
     file_path = str(Path("output/" + Path(filename).stem))
     if chart_start_lines_enabled_overall and output_chart_start_lines:
-        f_chart = open(file_path + "_Chart.txt", mode="w", encoding="utf-8")
+        with open(file_path + "_Chart.txt", mode="w", encoding="utf-8") as f_chart:
+            table.WriteHitLines(CHART_START, f_chart)
     if return_lines_enabled_overall and output_return_lines:
-        f_return = open(file_path + "_Return.txt", mode="w", encoding="utf-8")
+        with open(file_path + "_Return.txt", mode="w", encoding="utf-8") as f_return:
+            table.WriteHitLines(RETURN, f_return)
     if return_ignore_lines_enabled_overall and output_return_ignore_lines:
-        f_return_ignore = open(file_path + "_ReturnIgnore.txt", mode="w", encoding="utf-8")
+        with open(file_path + "_ReturnIgnore.txt", mode="w", encoding="utf-8") as f_return_ignore:
+            # 文末と見なす条件が無効の場合は調べないので、空のファイルとなる
+            if return_lines_enabled_overall:
+                table.WriteHitLines(RETURN_IGNORE, f_return_ignore, all_rules=True)
 
     tl_units = []   # 翻訳単位(4800字以内でまとめられた段落群)のリスト
+    tl_headers = []     # それぞれの翻訳単位の、各段落に最初にヒットした見出し条件の正規表現のリスト
     too_long_flags = []     # それぞれの翻訳単位が4800字を超えているか否かのリスト
     paragraphs = []     # 段落ごとに分けて格納
+    headers = []        # 各段落に最初にヒットした見出し条件の正規表現
     parslen = 0         # paragraphsの総文字数
     par_buffer = ""     # 今扱っている段落の文字列
     chart_buffer = ""   # 図表の説明の文字列
     chartParagraph = False     # 図表の説明の段落を扱っているフラグ
     tooLongParagraph = False    # 長過ぎる段落を扱っているフラグ
-    for i in range(len(textlines)):
+    for i in range(len(table)):
         # 図表の説明は本文を寸断している事が多いため、
         # 図表を示す文字列が文頭に現れた場合は別口で処理する
         # 例：Fig. 1. | Figure2: | Table 3. など
-        if chart_start_lines_enabled_overall:
-            for csi in range(len(chart_start_lines_pattern_list)):
-                # その正規表現パターンが有効かつパターンにヒットした場合
-                if chart_start_lines_enabled_list[csi] and re_search(chart_start_lines_pattern_list[csi], textlines[i], chart_start_lines_ignorecase_list[csi]):
-                    if output_chart_start_lines:
-                        f_chart.write(chart_start_lines_pattern_list[csi] + ", " + textlines[i] + "\n")
-                    chartParagraph = True
-                    break
+        if chart_start_lines_enabled_overall and table.IsHit(CHART_START, i):
+            chartParagraph = True
 
         # 待ち時間を短くするために、DeepLの制限ギリギリまで文字数を詰める
         # 現在扱っている文字列までの長さを算出
-        currentLen = parslen + len(textlines[i])
+        currentLen = parslen + table.lengths[i]
         if chartParagraph:
             currentLen += len(chart_buffer)
         else:
@@ -345,10 +642,12 @@ def OrganizeTranslationUnits(filename, textlines):
             # 1翻訳単位の制限文字数(既定値4500)を超えそうになったら、それまでの段落を翻訳にかける
             if parslen > 0:
                 tl_units.append(paragraphs)
+                tl_headers.append(headers)
                 too_long_flags.append(False)
 
                 parslen = 0
                 paragraphs = []
+                headers = []
             # 1段落で5000文字を超えるなら、手動での翻訳をお願いする
             else:
                 tooLongParagraph = True
@@ -357,73 +656,64 @@ def OrganizeTranslationUnits(filename, textlines):
         # その他return_linesに含まれる正規表現に当てはまればそこを文末と見なす
         return_flag = False
         if return_lines_enabled_overall:
-            for rli in range(len(return_lines_pattern_list)):
-                if return_lines_enabled_list[rli] and re_search(return_lines_pattern_list[rli], textlines[i], return_lines_ignorecase_list[rli]):
-                    if output_return_lines:
-                        f_return.write(return_lines_pattern_list[rli] + ", " + textlines[i] + "\n")
-                    return_flag = True
-                    break
+            if table.IsHit(RETURN, i):
+                return_flag = True
 
             # ただし、よくある略語だったりする場合は文末とは見なさない
-            if return_flag and return_ignore_lines_enabled_overall:
-                for rili in range(len(return_ignore_lines_pattern_list)):
-                    if return_ignore_lines_enabled_list[rili] and re_search(return_ignore_lines_pattern_list[rili], textlines[i], return_ignore_lines_ignorecase_list[rili]):
-                        if output_return_ignore_lines:
-                            f_return_ignore.write(return_ignore_lines_pattern_list[rili] + ", " + textlines[i] + "\n")
-                        return_flag = False
-
-        end_of_file = i == len(textlines) - 1   # ファイルの終端フラグ
+            if return_flag and return_ignore_lines_enabled_overall and table.IsHit(RETURN_IGNORE, i):
+                return_flag = False
+
+        end_of_file = i == len(table) - 1   # ファイルの終端フラグ
         # 文末かファイル終端の場合
         if return_flag or end_of_file:
             # 今までのバッファと今扱っている行をひとまとめにする
-            temp = ""
+            buffer = chart_buffer if chartParagraph else par_buffer
+            temp = buffer + table[i]
             if chartParagraph:
-                temp = chart_buffer + textlines[i]
                 chart_buffer = ""
             else:
-                temp = par_buffer + textlines[i]
                 par_buffer = ""
+            # 見出しかどうかを調べる
+            # 一行だけの段落なら、その行について調べた結果を使い回す
+            header = None
+            if find_header:
+                header = table.HitRule(HEADER, i) if buffer == "" else header_rules.Search(temp)
             # 5000字を超える一段落は、自動での翻訳を行わない
             # ファイルの終端でもそれは変わらない
             if tooLongParagraph:
                 tl_units.append([temp])
+                tl_headers.append([header])
                 too_long_flags.append(True)
             else:
                 # 長すぎない場合は翻訳待ちの段落として追加
                 parslen += len(temp)
                 paragraphs.append(temp)
+                headers.append(header)
                 # ファイルの終端の場合は最後に翻訳と書き込みを行う
                 if end_of_file:
                     tl_units.append(paragraphs)
+                    tl_headers.append(headers)
                     too_long_flags.append(False)
             chartParagraph = False
         else:
             # 文末でない場合は末尾に適切な処理を施す
             temp = ""
-            if textlines[i][-1] == "-":
+            if table.last_chars[i] == ord("-"):
                 # 文末がハイフンなら除く
-                temp = textlines[i][:-1]
+                temp = table[i][:-1]
             else:
                 # そうでないならスペース追加
-                temp = textlines[i] + " "
+                temp = table[i] + " "
             # バッファに追加
             if chartParagraph:
                 chart_buffer += temp
             else:
                 par_buffer += temp
 
-    # ファイルクローズ
-    if chart_start_lines_enabled_overall and output_chart_start_lines:
-        f_chart.close()
-    if return_lines_enabled_overall and output_return_lines:
-        f_return.close()
-    if return_ignore_lines_enabled_overall and output_return_ignore_lines:
-        f_return_ignore.close()
+    return tl_units, tl_headers
 
-    return tl_units
 
-
-def TranslateAndWrite(mainwindow, progress_window, filename, tl_units):
+def TranslateAndWrite(mainwindow, progress_window, filename, tl_units, tl_headers):
     # 翻訳文を一文ごとに改行するか
     add_target_return = Settings().add_target_return
     # 出力をMarkdown式にするか
@@ -435,9 +725,7 @@ def TranslateAndWrite(mainwindow, progress_window, filename, tl_units):
 
     # 見出しに関する設定
     header_lines_enabled_overall = Settings.RegularExpressions.HeaderLines().enabled_overall
-    header_lines_enabled_list = Settings.RegularExpressions.HeaderLines().enabled_list
     header_lines_ignorecase_list = Settings.RegularExpressions.HeaderLines().ignorecase_list
-    header_lines_pattern_list = Settings.RegularExpressions.HeaderLines().pattern_list
     header_lines_depth_count_list = Settings.RegularExpressions.HeaderLines().depth_count_list
     header_lines_target_remove_list = Settings.RegularExpressions.HeaderLines().target_remove_list
     header_lines_max_size_list = Settings.RegularExpressions.HeaderLines().max_size_list
@@ -450,44 +738,54 @@ def TranslateAndWrite(mainwindow, progress_window, filename, tl_units):
     # プログレスバーの長さを設定
     progress_window.ChangeMaxProgress(len(tl_units))
 
-    # DeepLを開く
-    deepLManager = DeepLManager()
+    # 全ての翻訳で共有するウェブブラウザのセッションを用いる
+    session_pool = GetSessionPool()
 
     with open(outputFilePath, mode="w", encoding="utf-8") as f:
-        for p, paragraphs in enumerate(tl_units):
+        first = 0
+        while first < len(tl_units):
             # プログレスウインドウの中止ボタンが押されていた場合、途中で終了する
             if progress_window.IsCanceled():
                 break
-            # プログレスバーを更新
-            progress_window.UpdateProgress(p + 1)
-
-            # 翻訳
-            translated = deepLManager.translate("\n".join(paragraphs)).splitlines()
-
-            tl_processed = []
-            for tl in translated:
-                if add_target_return:
-                    # 翻訳文を一文ごとに改行する
-                    if output_type_markdown:
-                        # Markdown方式の改行
-                        tl = re.sub(r"(。|．)", "。  \n", tl)
+
+            # 翻訳 セッションは翻訳するまとまりごとに借りて返す
+            # セッションがDeepLのタブを複数開くなら、その数だけの単位をまとめて並行して翻訳する
+            with session_pool.Session() as deepLManager:
+                batch = range(first, min(first + deepLManager.tabs, len(tl_units)))
+                # プログレスバーを更新
+                progress_window.UpdateProgress(batch[-1] + 1)
+                translated_batch = deepLManager.translateMany(["\n".join(tl_units[p]) for p in batch])
+            first = batch.stop
+
+            for p in batch:
+                paragraphs = tl_units[p]
+                translated = translated_batch[p - batch.start].splitlines()
+
+                tl_processed = []
+                for tl in translated:
+                    if add_target_return:
+                        # 翻訳文を一文ごとに改行する
+                        if output_type_markdown:
+                            # Markdown方式の改行
+                            tl = re.sub(r"(。|．)", "。  \n", tl)
+                        else:
+                            # 通常の改行
+                            tl = re.sub(r"(。|．)", "。\n", tl)
                     else:
-                        # 通常の改行
-                        tl = re.sub(r"(。|．)", "。\n", tl)
-                else:
-                    # 改行しない
-                    tl = re.sub(r"．", "。", tl)    # 句点を統一
-                tl_processed.append(tl)
-
-            for i in range(len(paragraphs)):
-                # Markdown方式で出力する場合は見出しに#を加える
-                header_line_hit = False
-                if output_type_markdown and header_lines_enabled_overall:
-                    for j in range(len(header_lines_pattern_list)):
-                        if header_lines_enabled_list[j] and re_search(header_lines_pattern_list[j], paragraphs[i], header_lines_ignorecase_list[j]):
+                        # 改行しない
+                        tl = re.sub(r"．", "。", tl)    # 句点を統一
+                    tl_processed.append(tl)
+
+                for i in range(len(paragraphs)):
+                    # Markdown方式で出力する場合は見出しに#を加える
+                    header_line_hit = False
+                    if output_type_markdown and header_lines_enabled_overall:
+                        rule = tl_headers[p][i]
+                        if rule is not None:
+                            j = rule.index
                             header_line_hit = True
                             # 見出しの深さを算出 & #を出力
-                            depth = max(1, len(re_findall(header_lines_depth_count_list[j], paragraphs[i], header_lines_ignorecase_list[j])))
+                            depth = max(1, len(CompilePattern(header_lines_depth_count_list[j], header_lines_ignorecase_list[j]).findall(paragraphs[i])))
                             f.write("#" * min(header_lines_max_size_list[j] + depth - 1, 6) + " ")
 
                             # 原文の出力を行う場合
@@ -495,21 +793,19 @@ def TranslateAndWrite(mainwindow, progress_window, filename, tl_units):
                                 # 原文の見出しとその直下に見出しの日本語訳を出力
                                 f.write(paragraphs[i] + "\n")
                                 # 日本語の見出し部分の先頭(1.2.など)を削除
-                                tl_processed[i] = re_sub(header_lines_target_remove_list[j], "", tl_processed[i], header_lines_ignorecase_list[j])
+                                tl_processed[i] = CompilePattern(header_lines_target_remove_list[j], header_lines_ignorecase_list[j]).sub("", tl_processed[i])
 
                             if len(tl_processed[i]) > 0:
                                 f.write(tl_processed[i] + ("\n" if tl_processed[i][-1] == "\n" else "\n\n"))
-                            break
+                        if not header_line_hit:
+                            if output_source and source_as_comment:
+                                # Markdown式の出力かつ原文の出力が有効で、
+                                # 見出しでない場合はコメントとして加工する
+                                paragraphs[i] = "%%" + paragraphs[i] + "%%"
                     if not header_line_hit:
-                        if output_source and source_as_comment:
-                            # Markdown式の出力かつ原文の出力が有効で、
-                            # 見出しでない場合はコメントとして加工する
-                            paragraphs[i] = "%%" + paragraphs[i] + "%%"
-                if not header_line_hit:
-                    # 見出しでない場合の出力
-                    if output_source:
-                        f.write(paragraphs[i] + "\n\n")
-                    f.write(tl_processed[i] + ("\n" if tl_processed[i][-1] == "\n" else "\n\n"))
-
-    deepLManager.closeWindow()
+                        # 見出しでない場合の出力
+                        if output_source:
+                            f.write(paragraphs[i] + "\n\n")
+                        f.write(tl_processed[i] + ("\n" if tl_processed[i][-1] == "\n" else "\n\n"))
+
     progress_window.Destroy()
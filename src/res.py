@@ -2,7 +2,10 @@ import wx
 
 from copy import copy, deepcopy
 from data import RegularExpressionsWindow_MenuBar_Menu, res_introduction, res_default_column_labels, res_default_column_tips, res_default_column_widths, res_replace_column_labels, res_replace_column_tips, res_replace_column_widths, res_header_column_labels, res_header_column_tips, res_header_column_widths
+from pathlib import Path
+from ruleset import PatternLint
 from settings import Settings
+from threading import Thread
 from wx.lib.agw import ultimatelistctrl as ULC
 from wx.lib.scrolledpanel import ScrolledPanel
 
@@ -72,6 +75,62 @@ class InputItemInfoWindow(wx.Frame):
         """
         pass
 
+    def _Check_Patterns(self, checks, save):
+        """
+        正規表現パターンを保存する前に検査し、問題が無ければ(あるいは警告を了承されれば)保存する
+        コンパイルできなければすぐに知らせ、時間がかかりうるなら処理時間の見積もりとともに警告する
+        処理時間の計測は別のスレッドで行い、その間もウインドウは操作できる(計測が終わると結果を知らせる)
+
+        Args:
+            checks (list of (str, str, bool, str, bool)): 入力フィールドのラベル(メッセージ用)・正規表現パターン・
+            大文字と小文字を区別しないか・マッチング例・処理時間を測るかの組のリスト
+            save (function): 保存する処理
+        """
+        for label, pattern, ignorecase, _, _ in checks:
+            lint = PatternLint(pattern, ignorecase, measure=False)
+            if lint.error is not None:
+                wx.MessageBox(label + "「" + pattern + "」は正規表現として不正です。\n" + lint.error, caption="正規表現の検査", style=wx.OK | wx.ICON_ERROR)
+                return
+
+        # 計測が終わるまで、もう一度OKボタンを押せないようにする
+        self.__button_ok.SetLabel("検査中...")
+        self.__button_ok.Disable()
+        Thread(target=self.__Measure_Patterns, args=(checks, save), daemon=True).start()
+
+    def __Measure_Patterns(self, checks, save):
+        """
+        正規表現パターンの処理時間を測り、結果をウインドウのスレッドに渡す(別のスレッドで実行される)
+        """
+        lints = [(label, pattern, PatternLint(pattern, ignorecase, example, measure)) for label, pattern, ignorecase, example, measure in checks]
+        wx.CallAfter(self.__Patterns_Measured, lints, save)
+
+    def __Patterns_Measured(self, lints, save):
+        """
+        正規表現パターンの処理時間を測り終えた時の処理
+        """
+        # 計測中にウインドウが閉じられていれば何もしない
+        if not self:
+            return
+        self.__button_ok.SetLabel("OK")
+        self.__button_ok.Enable()
+
+        for label, pattern, lint in lints:
+            if not lint.costly:
+                continue
+            message = label + "「" + pattern + "」は、照合に時間がかかる可能性があります。\n"
+            if lint.risky_reason is not None:
+                message += "理由: " + lint.risky_reason + "\n"
+            if lint.timed_out:
+                message += "次の文字列の照合が{:.0f}秒以内に終わりませんでした。\n".format(lint.worst_seconds)
+            elif lint.worst_string is not None:
+                message += "次の文字列の照合に{:.1f}ミリ秒かかりました(1万行の文書では最大で約{:.0f}秒)。\n".format(lint.worst_seconds * 1000, lint.worst_seconds * 10000)
+            if lint.worst_string is not None:
+                message += repr(lint.worst_string) + "\n"
+            message += "\nこのまま保存しますか？"
+            if wx.MessageBox(message, caption="正規表現の検査", style=wx.YES | wx.NO | wx.ICON_WARNING) != wx.YES:
+                return
+        save()
+
     def _Helper_Button_Event(self, event):
         """
         正規表現ヘルパーのボタンを押した時のイベント
@@ -384,9 +443,12 @@ class InputItemInfoWindow_Ordinary(InputItemInfoWindow):
         example = self.__field_example.GetValue()
         remarks = self.__field_remarks.GetValue()
 
-        self.__parent_tab.Add_Operation(self.__operation, [self.__position, enabled, ignorecase, pattern, example, remarks])
+        def Save():
+            self.__parent_tab.Add_Operation(self.__operation, [self.__position, enabled, ignorecase, pattern, example, remarks])
+            self.Destroy()
 
-        self.Destroy()
+        # 正規表現パターンに問題が無ければ保存する
+        self._Check_Patterns([("正規表現パターン", pattern, ignorecase, example, True)], Save)
 
 
 class InputItemInfoWindow_Replace(InputItemInfoWindow):
@@ -430,9 +492,12 @@ class InputItemInfoWindow_Replace(InputItemInfoWindow):
         example = self.__field_example.GetValue()
         remarks = self.__field_remarks.GetValue()
 
-        self.__parent_tab.Add_Operation(self.__operation, [self.__position, enabled, ignorecase, pattern, target, example, remarks])
+        def Save():
+            self.__parent_tab.Add_Operation(self.__operation, [self.__position, enabled, ignorecase, pattern, target, example, remarks])
+            self.Destroy()
 
-        self.Destroy()
+        # 正規表現パターンに問題が無ければ保存する
+        self._Check_Patterns([("正規表現パターン", pattern, ignorecase, example, True)], Save)
 
 
 class InputItemInfoWindow_Header(InputItemInfoWindow):
@@ -482,9 +547,16 @@ class InputItemInfoWindow_Header(InputItemInfoWindow):
         example = self.__field_example.GetValue()
         remarks = self.__field_remarks.GetValue()
 
-        self.__parent_tab.Add_Operation(self.__operation, [self.__position, enabled, ignorecase, pattern, depth_count, target_remove, max_size, example, remarks])
+        def Save():
+            self.__parent_tab.Add_Operation(self.__operation, [self.__position, enabled, ignorecase, pattern, depth_count, target_remove, max_size, example, remarks])
+            self.Destroy()
 
-        self.Destroy()
+        # 正規表現パターンに問題が無ければ保存する
+        # 見出しの深さ判定と訳文から除く文字列は、見出しの行にしか用いないので処理時間は測らない
+        self._Check_Patterns([
+            ("正規表現パターン", pattern, ignorecase, example, True),
+            ("見出しの深さ判定", depth_count, ignorecase, "", False),
+            ("訳文から除く文字列", target_remove, ignorecase, "", False)], Save)
 
 
 class RegularExpressionsWindow(wx.Frame):
@@ -681,6 +753,29 @@ class RegularExpressionsWindow(wx.Frame):
         if selected_menu == RegularExpressionsWindow_MenuBar_Menu.SHOW_MARKDOWN_SETTINGS.value:     # Markdown用の設定を表示する
             Settings.RegularExpressions().show_markdown_settings = self.__setting_menu.menu_chkbx_show_markdown_settings.IsChecked()    # 設定に反映
             self.__Refresh_SubPage(Settings.RegularExpressions().show_markdown_settings)
+        elif selected_menu == RegularExpressionsWindow_MenuBar_Menu.PROFILE_RULES.value:    # 正規表現ごとの処理時間を計測する
+            Settings.RegularExpressions().profile_rules = self.__setting_menu.menu_chkbx_profile_rules.IsChecked()    # 設定に反映
+        elif selected_menu == RegularExpressionsWindow_MenuBar_Menu.SHOW_RULE_PROFILE.value:    # 処理時間の計測結果を表示する
+            self.__Show_RuleProfile()
+
+    def __Show_RuleProfile(self, max_rows=10):
+        """
+        最後に出力された正規表現ごとの処理時間の計測結果から、処理時間の長いものを表示する
+
+        Args:
+            max_rows (int, optional): 表示する正規表現の数
+        """
+        reports = sorted(Path("output").glob("*_RuleProfile.txt"), key=lambda path: path.stat().st_mtime)
+        if len(reports) == 0:
+            wx.MessageBox("計測結果がありません。\n「正規表現ごとの処理時間を計測する」にチェックを入れてから翻訳を行ってください。", caption="処理時間の計測結果")
+            return
+
+        with open(reports[-1], encoding="utf-8") as f:
+            rows = [line.rstrip("\n").split("\t", 5) for line in f.readlines()[1:max_rows + 1]]
+        message = reports[-1].name + "\n\n"
+        for rank, (milliseconds, evaluations, hits, name, number, pattern) in enumerate(rows):
+            message += "{}. {} ms (照合{}回, ヒット{}回) {} {}行目: {}\n".format(rank + 1, milliseconds, evaluations, hits, name, number, pattern)
+        wx.MessageBox(message, caption="処理時間の計測結果")
 
     class SettingMenu(wx.Menu):
         """
@@ -690,6 +785,10 @@ class RegularExpressionsWindow(wx.Frame):
             super().__init__()
             self.menu_chkbx_show_markdown_settings = self.AppendCheckItem(RegularExpressionsWindow_MenuBar_Menu.SHOW_MARKDOWN_SETTINGS.value, "Markdown用の設定を表示する")
             self.menu_chkbx_show_markdown_settings.Check(Settings.RegularExpressions().show_markdown_settings)  # 最初からチェックされているか
+            self.AppendSeparator()
+            self.menu_chkbx_profile_rules = self.AppendCheckItem(RegularExpressionsWindow_MenuBar_Menu.PROFILE_RULES.value, "正規表現ごとの処理時間を計測する")
+            self.menu_chkbx_profile_rules.Check(Settings.RegularExpressions().profile_rules)  # 最初からチェックされているか
+            self.Append(RegularExpressionsWindow_MenuBar_Menu.SHOW_RULE_PROFILE.value, "処理時間の計測結果を表示する")
 
     class IntroductionPage(wx.Panel):
         """
@@ -0,0 +1,1404 @@
+import re
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from multiprocessing import Pipe, Process
+from sys import stderr
+from threading import RLock
+from time import perf_counter
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    # Python 3.10以前
+    import sre_parse
+
+
+# 必ず含まれる文字列による絞り込みを行う、必ず含まれる文字列が求まった正規表現の最小の数
+PREFILTER_MIN_RULES = 4
+
+# RuleGuardの照合用のプロセスが、依頼を受け付けられるようになるまで待つ最大の時間(秒)
+GUARD_START_TIMEOUT = 15
+
+# 正規表現ごとの処理時間を計測中のRuleProfile(計測中でなければNone)
+# 複数のファイルを同時に翻訳する場合に混ざらないよう、スレッドごとに保持する
+_profile = ContextVar("rule_profile", default=None)
+# 時間のかかりうる正規表現を制限時間付きで照合するRuleGuard(使わなければNone)
+# 複数のファイルを同時に翻訳する場合に互いに影響しないよう、スレッドごとに保持する
+_guard = ContextVar("rule_guard", default=None)
+
+
+@lru_cache(maxsize=1024)
+def CompilePattern(pattern, ignorecase, multiline=False):
+    """
+    正規表現パターンをコンパイルする
+    同じパターンは二度コンパイルしないよう、結果を保持しておく
+
+    Args:
+        pattern (string): 正規表現パターン
+        ignorecase (bool): 大文字と小文字を区別しないか
+        multiline (bool, optional): ^と$を各行の先頭と末尾にもヒットさせるか
+
+    Returns:
+        re.Pattern: コンパイルしたパターン
+    """
+    return re.compile(pattern, (re.IGNORECASE if ignorecase else 0) | (re.MULTILINE if multiline else 0))
+
+
+class _LineBreakInMatch(Exception):
+    """
+    複数行をまとめて置換する際に、ヒットした箇所か置換後の文字列が改行を含んでいた
+    """
+    pass
+
+
+class Rule:
+    """
+    コンパイル済みの正規表現パターン一つ分
+    """
+    def __init__(self, index, pattern, ignorecase, target=None):
+        # 設定のリストにおける位置
+        self.index = index
+        # 元の正規表現パターン(ヒットした行の出力用)
+        self.pattern = pattern
+        self.ignorecase = ignorecase
+        self.regex = CompilePattern(pattern, ignorecase)
+        # 置換後の文字列(置換条件の場合のみ)
+        self.target = target
+        # ヒットする行に必ず含まれる文字列の候補(いずれか一つは含まれる)
+        # 各要素は(文字列, 大文字と小文字を区別しないか)の組 求まらなければNone
+        self.literals = RequiredLiterals(pattern, ignorecase)
+        # 複数行を改行でつないだ文字列に対して置換する際に用いる、^と$が各行にヒットするもの
+        # 行をまたいで判定する部分を含み、まとめて置換すると意味が変わりうる場合はNone
+        self.multiline_regex = None
+        # 改行にヒットしうるか
+        self.matches_line_break = True
+        if target is not None and IsLineLocal(pattern):
+            self.multiline_regex = CompilePattern(pattern, ignorecase, multiline=True)
+            self.matches_line_break = MatchesLineBreak(pattern)
+        # 指数関数的なバックトラックを起こしうるか(RuleGuardを使う場合は、制限時間付きで照合する)
+        self.risky = RiskyReason(pattern, ignorecase) is not None
+
+
+class RuleSet:
+    """
+    ある種類の正規表現のうち、有効なものをコンパイルしてまとめたもの
+
+    re.searchなどにパターンの文字列を渡すと、パターンが多い場合にreモジュール内部のキャッシュから溢れて
+    毎回コンパイルし直すことになるので、一度だけコンパイルして使い回す
+    """
+    def __init__(self, enabled_list, ignorecase_list, pattern_list, target_list=None, name=""):
+        # 正規表現の種類の名前(StartLinesなど)
+        self.name = name
+        # 同じRuleSetを別のプロセスで作り直すための、設定の内容の組
+        self.key = (
+            tuple(enabled_list),
+            tuple(ignorecase_list),
+            tuple(pattern_list),
+            None if target_list is None else tuple(target_list),
+            name)
+        self.__rules = [
+            Rule(i, pattern_list[i], ignorecase_list[i], None if target_list is None else target_list[i])
+            for i in range(len(pattern_list))
+            if enabled_list[i]
+        ]
+        # 行頭に固定された正規表現を一つにまとめたものと、その中の名前付きグループに対応する(有効な正規表現のリストにおける位置, 正規表現)
+        self.__combined = None
+        self.__groups = {}
+        self.__combined_positions = frozenset()
+        # まとめなかった正規表現(個別に調べる)の(有効な正規表現のリストにおける位置, 正規表現)のリスト
+        self.__separate_rules = list(enumerate(self.__rules))
+        self.__Combine()
+        # 正規表現の中の必ず含まれる文字列と、それを含む正規表現の位置のリストの辞書
+        self.__literal_positions = {}
+        # 必ず含まれる文字列が求まらず、常に調べる正規表現の位置のリスト
+        self.__always_positions = []
+        self.__IndexLiterals()
+        # 指数関数的なバックトラックを起こしうる正規表現を含むか
+        self.has_risky_rules = any(rule.risky for rule in self.__rules)
+
+    def __IndexLiterals(self):
+        """
+        各正規表現の中の必ず含まれる文字列を集め、行に含まれる文字列から調べるべき正規表現を絞り込めるようにする
+        """
+        # 絞り込める正規表現が少ない場合は、絞り込みにかかる時間の方が長くなるので絞り込まない
+        if sum(rule.literals is not None for rule in self.__rules) < PREFILTER_MIN_RULES:
+            self.__always_positions = list(range(len(self.__rules)))
+            return
+        for position, rule in enumerate(self.__rules):
+            if rule.literals is None:
+                self.__always_positions.append(position)
+                continue
+            for literal in rule.literals:
+                self.__literal_positions.setdefault(literal, []).append(position)
+
+    def __Combine(self):
+        """
+        行頭(^)に固定された正規表現を、先頭の^を除いて名前付きグループの選択(|)として一つの正規表現にまとめる
+        一行につき一度の照合で、いずれかの正規表現にヒットするかとどれにヒットしたかがわかる
+
+        行頭でしか照合しないため、選択のうち最初にヒットしたものが、そのままヒットする最初の正規表現となる
+        行頭に固定されていない正規表現は、まとめると正規表現ごとの高速化(先頭の文字列による絞り込みなど)が効かず
+        かえって遅くなるので、後方参照などを含みまとめると意味が変わってしまうものと共に個別に調べる
+        """
+        parts = []
+        groups = {}
+        separate_rules = []
+        for position, rule in enumerate(self.__rules):
+            if not IsCombinable(rule.pattern, rule.ignorecase):
+                separate_rules.append((position, rule))
+                continue
+            name = "r" + str(position)
+            parts.append("(?P<" + name + ">" + ("(?i:" if rule.ignorecase else "(?:") + rule.pattern[1:] + "))")
+            groups[name] = (position, rule)
+        # まとめても個別に調べるのと変わらない場合はまとめない
+        if len(parts) < 2:
+            return
+        try:
+            self.__combined = re.compile("|".join(parts))
+        except (re.error, RecursionError):
+            return
+        self.__groups = groups
+        self.__separate_rules = separate_rules
+        self.__combined_positions = frozenset(position for position, _ in groups.values())
+
+    @property
+    def rules(self):
+        """
+        list of Rule: 有効な正規表現のリスト(設定のリストにおける順)
+        """
+        return self.__rules
+
+    def __IsInstrumented(self):
+        """
+        Returns:
+            bool: 正規表現を一つずつ、RuleProfileやRuleGuardを通して照合する必要があるか
+        """
+        return _profile.get() is not None or (_guard.get() is not None and self.has_risky_rules)
+
+    def __SearchRule(self, rule, string):
+        """
+        一つの正規表現で、RuleProfileやRuleGuardを通して照合する
+
+        Returns:
+            bool: ヒットしたか
+        """
+        guard = _guard.get()
+        if guard is not None and rule.risky:
+            return guard.Search(self, rule, string)
+        profile = _profile.get()
+        if profile is not None:
+            return profile.Search(self, rule, string)
+        return rule.regex.search(string) is not None
+
+    def __SubRule(self, rule, string):
+        """
+        一つの正規表現で、RuleProfileやRuleGuardを通して置換する
+
+        Returns:
+            (string, int): 置換後の文字列と、ヒットした箇所の数
+        """
+        guard = _guard.get()
+        if guard is not None and rule.risky:
+            return guard.Sub(self, rule, string)
+        profile = _profile.get()
+        if profile is not None:
+            return profile.Sub(self, rule, string)
+        return rule.regex.subn(rule.target, string)
+
+    def __CandidatePositions(self, string):
+        """
+        文字列にヒットしうる正規表現の位置を求める
+
+        Args:
+            string (string): 対象の文字列
+
+        Returns:
+            list of int: 必ず含まれる文字列が対象の文字列に含まれる(あるいは求まらない)正規表現の位置の昇順のリスト
+        """
+        if len(self.__literal_positions) == 0:
+            return self.__always_positions
+        positions = set(self.__always_positions)
+        folded = None
+        for (literal, ignorecase), literal_positions in self.__literal_positions.items():
+            if ignorecase:
+                if folded is None:
+                    folded = FoldCase(string)
+                if literal in folded:
+                    positions.update(literal_positions)
+            elif literal in string:
+                positions.update(literal_positions)
+        return sorted(positions)
+
+    def Search(self, string):
+        """
+        文字列にヒットする最初の正規表現(設定のリストにおいて最も前にあるもの)を探す
+
+        Args:
+            string (string): 対象の文字列
+
+        Returns:
+            Rule: ヒットした正規表現 どれにもヒットしなければNone
+        """
+        if self.__IsInstrumented():
+            # 計測中や制限時間付きで照合する場合は、まとめた正規表現も一つずつ調べる
+            for position in self.__CandidatePositions(string):
+                rule = self.__rules[position]
+                if self.__SearchRule(rule, string):
+                    return rule
+            return None
+
+        hit_position, hit_rule = len(self.__rules), None
+        if self.__combined is not None:
+            m = self.__combined.match(string)
+            if m is not None:
+                hit_position, hit_rule = self.__groups[m.lastgroup]
+        # まとめなかった正規表現のうち、ヒットしたものより前にあり、ヒットしうるものを調べる
+        if len(self.__literal_positions) == 0:
+            for position, rule in self.__separate_rules:
+                if position >= hit_position:
+                    break
+                if rule.regex.search(string):
+                    return rule
+        elif len(self.__separate_rules) > 0 and hit_position > self.__separate_rules[0][0]:
+            for position in self.__CandidatePositions(string):
+                if position >= hit_position:
+                    break
+                rule = self.__rules[position]
+                if position not in self.__combined_positions and rule.regex.search(string):
+                    return rule
+        return hit_rule
+
+    def SearchAll(self, string):
+        """
+        文字列にヒットする全ての正規表現を探す
+
+        Args:
+            string (string): 対象の文字列
+
+        Returns:
+            list of Rule: ヒットした正規表現のリスト(設定のリストにおける順)
+        """
+        if self.__IsInstrumented():
+            return [self.__rules[position] for position in self.__CandidatePositions(string) if self.__SearchRule(self.__rules[position], string)]
+        return [self.__rules[position] for position in self.__CandidatePositions(string) if self.__rules[position].regex.search(string)]
+
+    def Classify(self, lines):
+        """
+        各行について、最初にヒットする正規表現を探す
+
+        Args:
+            lines (list of string): 対象の行のリスト
+
+        Returns:
+            dict of int to Rule: いずれかの正規表現にヒットした行の番号と、最初にヒットした正規表現の辞書
+        """
+        hits = {}
+        for i, t in enumerate(lines):
+            rule = self.Search(t)
+            if rule is not None:
+                hits[i] = rule
+        return hits
+
+    def Sub(self, string, hits=None):
+        """
+        各正規表現による置換を、設定のリストにおける順に施す
+        ヒットしえない正規表現は飛ばす
+
+        Args:
+            string (string): 対象の文字列
+            hits (list, optional): 渡された場合は、ヒットした正規表現と置換前の文字列の組を順に追加する
+
+        Returns:
+            string: 置換後の文字列
+        """
+        instrumented = self.__IsInstrumented()
+        if len(self.__literal_positions) == 0 and hits is None and not instrumented:
+            for rule in self.__rules:
+                string = rule.regex.sub(rule.target, string)
+            return string
+
+        candidates = self.__CandidatePositions(string)
+        i = 0
+        while i < len(candidates):
+            position = candidates[i]
+            i += 1
+            rule = self.__rules[position]
+            if instrumented:
+                replaced, count = self.__SubRule(rule, string)
+            else:
+                replaced, count = rule.regex.subn(rule.target, string)
+            if count == 0:
+                continue
+            if hits is not None:
+                hits.append((rule, string))
+            # 置換によって文字列が変わったら、以降の正規表現についてヒットしうるかを調べ直す
+            if replaced != string:
+                string = replaced
+                candidates = [p for p in self.__CandidatePositions(string) if p > position]
+                i = 0
+        return string
+
+    def SubLines(self, lines, hits=None):
+        """
+        複数の行それぞれに、各正規表現による置換を設定のリストにおける順に施す
+        結果は各行をSubに渡した場合と同じになる
+
+        行を改行でつないだ一つの文字列に対して、正規表現ごとに一度だけ置換を行うので、
+        行数×正規表現の数だけPythonから置換を呼び出すより速い
+        必ず含まれる文字列が求まる正規表現は、それを含む行のみをつないだものに対して置換する
+        まとめて置換すると行をまたいでヒットしてしまう正規表現は、その正規表現のみ行ごとに置換する
+
+        Args:
+            lines (list of string): 対象の行のリスト(各行は改行を含まない)
+            hits (list, optional): 渡された場合は、ヒットした行の番号・正規表現・置換前の行の組を、
+            行の番号と設定のリストにおける順に追加する
+
+        Returns:
+            list of string: 置換後の行のリスト
+        """
+        lines = list(lines)
+        if len(lines) == 0:
+            return lines
+
+        # 計測中や制限時間付きで照合する場合は、正規表現ごとに扱えるよう行ごとに置換する
+        if self.__IsInstrumented():
+            for i, line in enumerate(lines):
+                line_hits = [] if hits is not None else None
+                lines[i] = self.Sub(line, line_hits)
+                if hits is not None:
+                    hits.extend((i, rule, source) for rule, source in line_hits)
+            return lines
+
+        # 行の番号, 正規表現の位置, 正規表現, 置換前の行
+        rule_hits = []
+        # 以下はlinesが変わったらNoneにする
+        block = None            # linesを改行でつないだもの
+        folded_block = None     # blockをFoldCaseで小文字にしたもの
+        folded_lines = None     # folded_blockを行ごとに分けたもの
+        line_break = False      # 置換によって改行を含む行ができたか
+        for position, rule in enumerate(self.__rules):
+            # 対象とする行の番号のリスト(Noneなら全ての行)
+            targets = None
+            if rule.literals is not None:
+                if block is None:
+                    block = "\n".join(lines)
+                if folded_block is None and any(ignorecase for _, ignorecase in rule.literals):
+                    folded_block = FoldCase(block)
+                # 必ず含まれる文字列が全体のどこにも無ければ、置換するまでもない
+                present = [(literal, ignorecase) for literal, ignorecase in rule.literals if literal in (folded_block if ignorecase else block)]
+                if len(present) == 0:
+                    continue
+                if folded_lines is None and any(ignorecase for _, ignorecase in present):
+                    folded_lines = folded_block.split("\n") if not line_break else [FoldCase(line) for line in lines]
+                targets = []
+                for literal, ignorecase in present:
+                    targets.extend(i for i, line in enumerate(folded_lines if ignorecase else lines) if literal in line)
+                if len(present) > 1:
+                    targets = sorted(set(targets))
+            target_lines = lines if targets is None else [lines[i] for i in targets]
+
+            result = None
+            if not line_break:
+                if targets is None:
+                    if block is None:
+                        block = "\n".join(lines)
+                    target_block = block
+                else:
+                    target_block = "\n".join(target_lines)
+                result = self.__SubBlock(rule, target_block, hits is not None)
+
+            if result is not None:
+                replaced, count, starts = result
+                if count == 0:
+                    continue
+                if hits is not None:
+                    # ヒットした箇所の位置から、ヒットした行を求める
+                    k, last_start, last_k = 0, 0, -1
+                    for start in starts:
+                        k += target_block.count("\n", last_start, start)
+                        last_start = start
+                        if k != last_k:
+                            rule_hits.append((k if targets is None else targets[k], position, rule, target_lines[k]))
+                            last_k = k
+                if targets is None:
+                    lines = replaced.split("\n")
+                    block = replaced
+                else:
+                    for i, line in zip(targets, replaced.split("\n")):
+                        lines[i] = line
+                    block = None
+                folded_block = None
+                folded_lines = None
+                continue
+
+            # まとめて置換できない場合は行ごとに置換する
+            for k, line in enumerate(target_lines):
+                replaced, count = rule.regex.subn(rule.target, line)
+                if count > 0:
+                    i = k if targets is None else targets[k]
+                    if hits is not None:
+                        rule_hits.append((i, position, rule, line))
+                    if replaced != line:
+                        lines[i] = replaced
+                        block = None
+                        folded_block = None
+                        folded_lines = None
+                        line_break |= "\n" in replaced
+
+        if hits is not None:
+            rule_hits.sort(key=lambda h: (h[0], h[1]))
+            hits.extend((line_number, rule, source) for line_number, _, rule, source in rule_hits)
+        return lines
+
+    def __SubBlock(self, rule, block, need_starts):
+        """
+        複数の行を改行でつないだ文字列に対して、一つの正規表現による置換を行う
+
+        Args:
+            rule (Rule): 置換に用いる正規表現
+            block (string): 複数の行を改行でつないだ文字列
+            need_starts (bool): ヒットした箇所の開始位置が必要か
+
+        Returns:
+            (string, int, list of int): 置換後の文字列と、ヒットした箇所の数と、
+            ヒットした箇所の開始位置のリスト(need_startsがFalseの場合は空とは限らない)
+            ヒットした箇所か置換後の文字列が改行を含み、行ごとに置換した場合と結果が変わる場合はNone
+        """
+        if rule.multiline_regex is None:
+            return None
+
+        # 改行にヒットしえない正規表現なら、置換後の文字列が改行を含むかは改行の数が増えたかでわかるので、
+        # ヒットした箇所ごとにPythonの関数を呼び出さずに済む
+        if not need_starts and not rule.matches_line_break:
+            replaced, count = rule.multiline_regex.subn(rule.target, block)
+            if count > 0 and replaced.count("\n") != block.count("\n"):
+                return None
+            return replaced, count, []
+
+        starts = []
+
+        def Replace(m):
+            replaced = m.expand(rule.target)
+            if "\n" in m.group() or "\n" in replaced:
+                raise _LineBreakInMatch()
+            starts.append(m.start())
+            return replaced
+
+        try:
+            replaced = rule.multiline_regex.sub(Replace, block)
+        except _LineBreakInMatch:
+            return None
+        return replaced, len(starts), starts
+
+
+def IsLineLocal(pattern):
+    """
+    正規表現を、複数の行を改行でつないだ文字列に^と$が各行にヒットするようにして用いても、
+    ヒットした箇所が改行を含まない限り行ごとに用いた場合と同じ結果になるか調べる
+
+    先読み・後読みは改行をまたいで判定し、\\Aと\\Zは文字列全体の先頭と末尾にしかヒットせず、
+    \\Bは空文字列にはヒットしないが改行の間にはヒットするため、同じにならない
+
+    Args:
+        pattern (string): 正規表現パターン
+
+    Returns:
+        bool: 同じ結果になるか
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, RecursionError):
+        return False
+    return _IsLineLocal(parsed)
+
+
+def _IsLineLocal(subpattern):
+    for op, av in subpattern:
+        if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            return False
+        if op is sre_parse.AT and av in (sre_parse.AT_BEGINNING_STRING, sre_parse.AT_END_STRING, sre_parse.AT_NON_BOUNDARY):
+            return False
+        for child in _IterSubpatterns(av):
+            if not _IsLineLocal(child):
+                return False
+    return True
+
+
+def MatchesLineBreak(pattern):
+    """
+    正規表現が改行文字にヒットしうるか調べる
+
+    Args:
+        pattern (string): 正規表現パターン
+
+    Returns:
+        bool: ヒットしうるか(判断できない場合もTrue)
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, RecursionError):
+        return True
+    state = getattr(parsed, "state", None) or parsed.pattern
+    return _MatchesLineBreak(parsed, bool(state.flags & re.DOTALL))
+
+
+def _MatchesLineBreak(subpattern, dotall):
+    for op, av in subpattern:
+        if op is sre_parse.LITERAL:
+            if av == ord("\n"):
+                return True
+        elif op is sre_parse.NOT_LITERAL:
+            if av != ord("\n"):
+                return True
+        elif op is sre_parse.ANY:
+            if dotall:
+                return True
+        elif op is sre_parse.IN:
+            if _SetMatchesLineBreak(av):
+                return True
+        elif op is sre_parse.SUBPATTERN:
+            _, add_flags, del_flags, p = av
+            if _MatchesLineBreak(p, (dotall or bool(add_flags & re.DOTALL)) and not (del_flags & re.DOTALL)):
+                return True
+        else:
+            for child in _IterSubpatterns(av):
+                if _MatchesLineBreak(child, dotall):
+                    return True
+    return False
+
+
+def _SetMatchesLineBreak(items):
+    """
+    文字集合([...]や\\sなど)が改行文字を含むか調べる
+    """
+    negate = False
+    contains = False
+    for op, av in items:
+        if op is sre_parse.NEGATE:
+            negate = True
+        elif op is sre_parse.LITERAL:
+            contains |= av == ord("\n")
+        elif op is sre_parse.RANGE:
+            contains |= av[0] <= ord("\n") <= av[1]
+        elif op is sre_parse.CATEGORY:
+            contains |= av in (sre_parse.CATEGORY_SPACE, sre_parse.CATEGORY_NOT_DIGIT, sre_parse.CATEGORY_NOT_WORD)
+        else:
+            # 判断できないものは含むものとする
+            return True
+    return contains != negate
+
+
+# 中でバックトラックを行わない要素(アトミックグループと強欲な量指定子 Python 3.11以降)
+_NO_BACKTRACK_OPS = tuple(getattr(sre_parse, name) for name in ["ATOMIC_GROUP", "POSSESSIVE_REPEAT"] if hasattr(sre_parse, name))
+
+
+def RiskyReason(pattern, ignorecase=False):
+    r"""
+    正規表現が、ヒットしない文字列に対して指数関数的なバックトラックを起こしうる形をしているか調べる
+
+    2回以上の繰り返しの中や、隣り合う繰り返しの間で、同じ文字列を複数通りに分けて照合できるものを探す
+    - 繰り返しの中に上限の無い繰り返しがあり、それらと重ならない文字で区切られていないもの 例: (\w+\s?)* (.*,){11}
+    - 繰り返しの中の選択肢が、同じ文字から始まりうるもの 例: (ab|a.)*
+    - 繰り返しの中の省略できる部分が、繰り返しの先頭と同じ文字から始まりうるもの 例: (a|aa)+ (a(?:a)?と解釈される)
+    - 上限の無い繰り返し同士が、重なる文字の繰り返しで隣り合っているもの 例: .*.*
+    アトミックグループや強欲な量指定子の中は調べない
+
+    Args:
+        pattern (string): 正規表現パターン
+        ignorecase (bool, optional): 大文字と小文字を区別しないか
+
+    Returns:
+        string: 起こしうる場合はその理由 起こさない(あるいは正規表現として不正な)場合はNone
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, RecursionError):
+        return None
+    return _RiskyReason(parsed, ignorecase)
+
+
+def _RiskyReason(subpattern, ignorecase):
+    previous_repeat = None  # 直前の要素が上限の無い一文字の繰り返しなら、その一文字を表す要素
+    for item in subpattern:
+        op, av = item
+        if op in _NO_BACKTRACK_OPS:
+            previous_repeat = None
+            continue
+        repeated = _RepeatedCharItem(item) if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[1] is sre_parse.MAXREPEAT else None
+        if repeated is not None and previous_repeat is not None and _CharItemsOverlap(previous_repeat, repeated, ignorecase):
+            return "上限の無い繰り返しが、重なる文字の繰り返しと隣り合っている"
+        previous_repeat = repeated
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[1] >= 2:
+            reason = _RepeatBodyRiskyReason(_UnwrapGroups(av[2]), ignorecase)
+            if reason is not None:
+                return reason
+        for child in _IterSubpatterns(av):
+            reason = _RiskyReason(child, ignorecase)
+            if reason is not None:
+                return reason
+    return None
+
+
+def _RepeatBodyRiskyReason(body, ignorecase):
+    """
+    2回以上の繰り返しの中身が、同じ文字列を複数通りに分けて照合できるか調べる
+    """
+    first = _FirstCharItem(body)
+    # 選択肢の共通の先頭部分は、選択の前にくくり出されている
+    for position, (op, av) in enumerate(body):
+        if op is not sre_parse.BRANCH:
+            continue
+        alternatives = [_UnwrapGroups(alternative) for alternative in av[1]]
+        for i in range(len(alternatives)):
+            for j in range(i + 1, len(alternatives)):
+                if len(alternatives[i]) == 0 and len(alternatives[j]) == 0:
+                    return "繰り返しの中の選択肢が、同じ文字から始まりうる"
+                if len(alternatives[i]) > 0 and len(alternatives[j]) > 0 and \
+                        _CharItemsOverlap(_FirstCharItem(alternatives[i]), _FirstCharItem(alternatives[j]), ignorecase):
+                    return "繰り返しの中の選択肢が、同じ文字から始まりうる"
+        # 空の選択肢がある(a|aaがa(?:a)?とくくり出された)場合、残りの選択肢が次の繰り返しの先頭と重なりうるなら、
+        # その部分を今回の繰り返しに含めるかどうかで分け方が複数通りになる
+        if position > 0 and any(len(alternative) == 0 for alternative in alternatives):
+            for alternative in alternatives:
+                if len(alternative) > 0 and _CharItemsOverlap(_FirstCharItem(alternative), first, ignorecase):
+                    return "繰り返しの中の選択肢が、同じ文字から始まりうる"
+    inner_repeats = list(_IterUnboundedRepeats(body))
+    if len(inner_repeats) > 0:
+        for item in body:
+            separator = _SeparatorItem(item)
+            if separator is not None and not any(_CharItemsOverlap(separator, inner, ignorecase) for inner in inner_repeats):
+                return None
+        return "上限の無い繰り返しが入れ子になっている"
+    return None
+
+
+def _UnwrapGroups(items):
+    """
+    一つのグループのみからなる部分を、グループの中身にする
+    """
+    items = list(items)
+    while len(items) == 1 and items[0][0] is sre_parse.SUBPATTERN:
+        items = list(items[0][1][3])
+    return items
+
+
+def _IterUnboundedRepeats(items):
+    """
+    上限の無い繰り返し(アトミックグループや強欲な量指定子の中は除く)の、繰り返す一文字を順に返す
+    一文字の繰り返しでない場合はNoneを返す
+    """
+    for op, av in items:
+        if op in _NO_BACKTRACK_OPS:
+            continue
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            if av[1] is sre_parse.MAXREPEAT:
+                yield _RepeatedCharItem((op, av))
+        for child in _IterSubpatterns(av):
+            yield from _IterUnboundedRepeats(child)
+
+
+def _RepeatedCharItem(item):
+    """
+    一文字の繰り返しについて、その一文字を表す要素を求める 一文字の繰り返しでなければNone
+    """
+    body = _UnwrapGroups(item[1][2])
+    return body[0] if len(body) == 1 and _IsCharItem(body[0]) else None
+
+
+def _SeparatorItem(item):
+    """
+    必ず一文字以上ヒットし、上限のある一文字の繰り返しでもある要素について、その一文字を表す要素を求める
+    そうでなければNone
+    """
+    op, av = item
+    if _IsCharItem(item):
+        return item
+    if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1 and av[1] is not sre_parse.MAXREPEAT:
+        body = _UnwrapGroups(av[2])
+        if len(body) == 1 and _IsCharItem(body[0]):
+            return body[0]
+    return None
+
+
+def _FirstCharItem(items):
+    """
+    最初にヒットする一文字を表す要素を求める 求まらなければNone
+    """
+    if len(items) == 0:
+        return None
+    op, av = items[0]
+    if _IsCharItem(items[0]):
+        return items[0]
+    if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+        return _FirstCharItem(_UnwrapGroups(av[2]))
+    if op is sre_parse.SUBPATTERN:
+        return _FirstCharItem(_UnwrapGroups(av[3]))
+    return None
+
+
+def _IsCharItem(item):
+    return item[0] in (sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.ANY, sre_parse.IN)
+
+
+# 一文字を表す要素同士が重なるかを調べるのに用いる文字
+_SAMPLE_CHARS = "".join(chr(c) for c in range(32, 127)) + "\t\n éαあ一０"
+
+# \dなどの文字集合と、それと同じ一文字の正規表現
+_CATEGORY_REGEXES = {
+    sre_parse.CATEGORY_DIGIT: re.compile(r"\d"),
+    sre_parse.CATEGORY_NOT_DIGIT: re.compile(r"\D"),
+    sre_parse.CATEGORY_SPACE: re.compile(r"\s"),
+    sre_parse.CATEGORY_NOT_SPACE: re.compile(r"\S"),
+    sre_parse.CATEGORY_WORD: re.compile(r"\w"),
+    sre_parse.CATEGORY_NOT_WORD: re.compile(r"\W"),
+}
+
+
+def _CharItemsOverlap(a, b, ignorecase):
+    """
+    一文字を表す要素同士が、同じ文字にヒットしうるか調べる 判断できない場合はヒットしうるものとする
+    """
+    if a is None or b is None:
+        return True
+    for ch in _SAMPLE_CHARS:
+        matches_a = _CharItemMatches(a, ch, ignorecase)
+        matches_b = _CharItemMatches(b, ch, ignorecase)
+        if matches_a is None or matches_b is None:
+            return True
+        if matches_a and matches_b:
+            return True
+    return False
+
+
+def _CharItemMatches(item, ch, ignorecase):
+    """
+    一文字を表す要素が、その文字にヒットするか調べる 判断できない場合はNone
+    """
+    op, av = item
+    chars = {ch, ch.lower(), ch.upper()} if ignorecase else {ch}
+    if op is sre_parse.LITERAL:
+        return chr(av) in chars
+    if op is sre_parse.NOT_LITERAL:
+        return chr(av) not in chars
+    if op is sre_parse.ANY:
+        return True
+    negate = False
+    contains = False
+    for set_op, set_av in av:
+        if set_op is sre_parse.NEGATE:
+            negate = True
+        elif set_op is sre_parse.LITERAL:
+            contains |= chr(set_av) in chars
+        elif set_op is sre_parse.RANGE:
+            contains |= any(set_av[0] <= ord(c) <= set_av[1] for c in chars)
+        elif set_op is sre_parse.CATEGORY and set_av in _CATEGORY_REGEXES:
+            contains |= _CATEGORY_REGEXES[set_av].match(ch) is not None
+        else:
+            return None
+    return contains != negate
+
+
+def IsCombinable(pattern, ignorecase):
+    """
+    正規表現が行頭(^)に固定されていて、先頭の^を除いて他の正規表現と選択(|)で一つにまとめても意味が変わらないか調べる
+
+    後方参照はグループの番号がずれるため、名前付きグループは名前が重複しうるため、
+    (?m)などパターン全体に掛かるフラグは他の正規表現にも掛かってしまうため、まとめられない
+
+    Args:
+        pattern (string): 正規表現パターン
+        ignorecase (bool): 大文字と小文字を区別しないか
+
+    Returns:
+        bool: まとめられるか
+    """
+    try:
+        regex = CompilePattern(pattern, ignorecase)
+        parsed = sre_parse.parse(pattern)
+    except (re.error, RecursionError):
+        return False
+    if not pattern.startswith("^") or len(parsed) == 0 or parsed[0] != (sre_parse.AT, sre_parse.AT_BEGINNING):
+        return False
+    if regex.groupindex:
+        return False
+    # パターン中でパターン全体に掛かるフラグが指定されていないか
+    state = getattr(parsed, "state", None) or parsed.pattern
+    if state.flags & ~re.UNICODE:
+        return False
+    return not _HasGroupReference(parsed)
+
+
+def _HasGroupReference(subpattern):
+    """
+    解析済みの正規表現が、後方参照や条件付きのグループを含むか調べる
+    """
+    for op, av in subpattern:
+        if op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+            return True
+        for child in _IterSubpatterns(av):
+            if _HasGroupReference(child):
+                return True
+    return False
+
+
+def _IterSubpatterns(av):
+    if isinstance(av, sre_parse.SubPattern):
+        yield av
+    elif isinstance(av, (tuple, list)):
+        for a in av:
+            yield from _IterSubpatterns(a)
+
+
+@lru_cache(maxsize=32)
+def _GetRuleSet(enabled_tuple, ignorecase_tuple, pattern_tuple, target_tuple, name=""):
+    return RuleSet(enabled_tuple, ignorecase_tuple, pattern_tuple, target_tuple, name)
+
+
+def GetRuleSet(condition_lines):
+    """
+    各種正規表現の設定からRuleSetを得る
+    設定の内容(パターン・有効か・大文字と小文字を区別しないか・置換後の文字列)が同じなら、
+    前回作ったものを使い回す
+
+    Args:
+        condition_lines (ConditionLines): 各種正規表現の設定
+
+    Returns:
+        RuleSet: 有効な正規表現をコンパイルしてまとめたもの
+    """
+    target_list = getattr(condition_lines, "target_list", None)
+    return _GetRuleSet(
+        tuple(condition_lines.enabled_list),
+        tuple(condition_lines.ignorecase_list),
+        tuple(condition_lines.pattern_list),
+        None if target_list is None else tuple(target_list),
+        type(condition_lines).__qualname__.split("RegularExpressions.")[-1])
+
+
+class RuleProfile:
+    """
+    正規表現ごとの照合回数・ヒット回数・処理時間を集計したもの
+
+    ProfileRulesで計測している間は、RuleSetは正規表現を一つにまとめて照合したり、
+    まとめて置換したりせず、正規表現を一つずつ照合・置換してその処理時間を集計する
+    (必ず含まれる文字列による絞り込みは行うので、絞り込みで飛ばされた場合は照合回数に数えない)
+    """
+    def __init__(self):
+        # (種類の名前, 設定のリストにおける番号)と、[パターン, 照合回数, ヒット回数, 処理時間(秒)]の辞書
+        self.stats = {}
+
+    def __Record(self, rule_set, rule, hit, seconds):
+        stat = self.stats.get((rule_set.name, rule.index))
+        if stat is None:
+            stat = self.stats[(rule_set.name, rule.index)] = [rule.pattern, 0, 0, 0.0]
+        stat[1] += 1
+        stat[2] += hit
+        stat[3] += seconds
+
+    def Search(self, rule_set, rule, string):
+        """
+        一つの正規表現で照合し、その処理時間を集計する
+
+        Returns:
+            bool: ヒットしたか
+        """
+        start = perf_counter()
+        hit = rule.regex.search(string) is not None
+        self.__Record(rule_set, rule, hit, perf_counter() - start)
+        return hit
+
+    def Sub(self, rule_set, rule, string):
+        """
+        一つの正規表現で置換し、その処理時間を集計する
+
+        Returns:
+            (string, int): 置換後の文字列と、ヒットした箇所の数
+        """
+        start = perf_counter()
+        replaced, count = rule.regex.subn(rule.target, string)
+        self.__Record(rule_set, rule, count > 0, perf_counter() - start)
+        return replaced, count
+
+    def Ranking(self):
+        """
+        Returns:
+            list of (string, int, string, int, int, float): 種類の名前・設定のリストにおける番号・パターン・
+            照合回数・ヒット回数・処理時間(秒)の組の、処理時間の長い順のリスト
+        """
+        ranking = [(name, index, pattern, evaluations, hits, seconds) for (name, index), (pattern, evaluations, hits, seconds) in self.stats.items()]
+        ranking.sort(key=lambda r: r[5], reverse=True)
+        return ranking
+
+    def WriteReport(self, f):
+        """
+        集計結果を、処理時間の長い順にタブ区切りで書き込む
+        番号は正規表現の編集画面における行番号(1始まり)
+
+        Args:
+            f (file object): 書き込み先
+        """
+        f.write("処理時間(ms)\t照合回数\tヒット回数\t種類\t番号\tパターン\n")
+        for name, index, pattern, evaluations, hits, seconds in self.Ranking():
+            f.write("{:.3f}\t{}\t{}\t{}\t{}\t{}\n".format(seconds * 1000, evaluations, hits, name, index + 1, pattern))
+
+
+@contextmanager
+def ProfileRules(profile):
+    """
+    この中でのRuleSetによる照合・置換の処理時間を、正規表現ごとに計測する
+    計測するのはこのスレッドでの照合・置換のみで、同時に行われている他の翻訳の分は含まない
+
+    Args:
+        profile (RuleProfile): 計測結果を集計する先 Noneなら計測しない
+    """
+    if profile is None:
+        yield
+        return
+    token = _profile.set(profile)
+    try:
+        yield
+    finally:
+        _profile.reset(token)
+
+
+class RuleGuard:
+    """
+    指数関数的なバックトラックを起こしうる正規表現(Rule.risky)を、別のプロセスで制限時間付きで照合する
+
+    reモジュールの照合は途中で止められないため、制限時間を超えた場合はそのプロセスごと終了させる
+    制限時間を超えた正規表現は、それ以降(このRuleGuardを使う間)はどの行にもヒットしないものとして扱う
+    それ以外の正規表現は、これまで通りこのプロセスで照合する
+    """
+    def __init__(self, time_budget):
+        """
+        Args:
+            time_budget (float): 一つの正規表現で一行を照合する際の制限時間(秒)
+        """
+        self.time_budget = time_budget
+        # 制限時間を超えた正規表現の種類の名前・正規表現・その時の行の組のリスト
+        self.timeouts = []
+        self.__disabled = set()     # 制限時間を超えた正規表現の(種類の名前, 設定のリストにおける番号)
+        self.__process = None
+        self.__connection = None
+        self.__unavailable = False  # 照合用のプロセスが起動できなかったか
+        # 複数のスレッドから使われても、依頼と結果の組が入れ替わらないようにする
+        self.__lock = RLock()
+
+    def __Start(self):
+        """
+        照合用のプロセスを起動し、依頼を受け付けられるようになるまで待つ
+        (Windowsなどではプロセスの起動に時間がかかるので、その時間を制限時間に含めない)
+        一定時間待っても起動しない場合は、以降は制限時間を設けずにこのプロセスで照合する
+
+        Returns:
+            bool: 起動できたか
+        """
+        self.__connection, child_connection = Pipe()
+        self.__process = Process(target=_GuardWorker, args=(child_connection,), daemon=True)
+        try:
+            self.__process.start()
+            child_connection.close()
+            if self.__connection.poll(GUARD_START_TIMEOUT):
+                self.__connection.recv()
+                return True
+        except (OSError, EOFError):
+            pass
+        child_connection.close()
+        if self.__process.is_alive():
+            self.__process.terminate()
+            self.__process.join()
+        self.__connection.close()
+        self.__process = None
+        self.__connection = None
+        self.__unavailable = True
+        print("Rule guard worker did not start; matching risky rules without a time budget.", file=stderr)
+        return False
+
+    def __Call(self, name, rule, request):
+        """
+        別のプロセスに照合・置換を依頼し、制限時間内に終わればその結果と処理時間を返す
+
+        Args:
+            name (string): 正規表現の種類の名前
+            rule (Rule): 照合・置換に用いる正規表現
+            request (tuple): パターン・大文字と小文字を区別しないか・置換後の文字列(照合ならNone)・対象の文字列の組
+
+        Returns:
+            (object, float): 制限時間内に終わった場合はその結果と処理時間(秒)
+            終わらなかった場合や、既に無効にした正規表現の場合はNone
+            照合用のプロセスが起動できなかった場合は、このプロセスで制限時間を設けずに行った結果と処理時間
+        """
+        with self.__lock:
+            if (name, rule.index) in self.__disabled:
+                return None
+            if self.__unavailable or (self.__process is None and not self.__Start()):
+                return _MatchRequest(request)
+            self.__connection.send(request)
+            if self.__connection.poll(self.time_budget):
+                return self.__connection.recv()
+
+            # 制限時間を超えたら、プロセスを終了させてその正規表現を無効にする(次の依頼時にプロセスを起動し直す)
+            self.Close()
+            self.__disabled.add((name, rule.index))
+            self.timeouts.append((name, rule, request[-1]))
+            return None
+
+    def Search(self, rule_set, rule, string):
+        """
+        一つの正規表現で照合する
+
+        Returns:
+            bool: ヒットしたか(制限時間を超えた場合はFalse)
+        """
+        result = self.__Call(rule_set.name, rule, (rule.pattern, rule.ignorecase, None, string))
+        return result is not None and result[0]
+
+    def Sub(self, rule_set, rule, string):
+        """
+        一つの正規表現で置換する
+
+        Returns:
+            (string, int): 置換後の文字列と、ヒットした箇所の数(制限時間を超えた場合は元の文字列と0)
+        """
+        result = self.__Call(rule_set.name, rule, (rule.pattern, rule.ignorecase, rule.target, string))
+        return (string, 0) if result is None else result[0]
+
+    def Time(self, rule, string):
+        """
+        一つの正規表現で照合し、その処理時間を測る
+
+        Returns:
+            float: 処理時間(秒) 制限時間を超えた場合はNone
+        """
+        result = self.__Call("", rule, (rule.pattern, rule.ignorecase, None, string))
+        return None if result is None else result[1]
+
+    def Close(self):
+        """
+        照合用のプロセスを終了させる
+        """
+        with self.__lock:
+            if self.__process is not None:
+                self.__process.terminate()
+                self.__process.join()
+                self.__connection.close()
+                self.__process = None
+                self.__connection = None
+
+
+def _GuardWorker(connection):
+    """
+    RuleGuardが起動するプロセスで、依頼された照合・置換を順に行う
+
+    Args:
+        connection (multiprocessing.connection.Connection): RuleGuardとの通信に用いる接続
+    """
+    # 依頼を受け付けられるようになったことを知らせる
+    connection.send(None)
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        connection.send(_MatchRequest(request))
+
+
+def _MatchRequest(request):
+    """
+    RuleGuardに依頼された照合・置換を行う
+
+    Args:
+        request (tuple): パターン・大文字と小文字を区別しないか・置換後の文字列(照合ならNone)・対象の文字列の組
+
+    Returns:
+        (object, float): 照合ならヒットしたか、置換なら置換後の文字列とヒットした箇所の数の組と、処理時間(秒)
+    """
+    pattern, ignorecase, target, string = request
+    regex = CompilePattern(pattern, ignorecase)
+    start = perf_counter()
+    if target is None:
+        result = regex.search(string) is not None
+    else:
+        result = regex.subn(target, string)
+    return result, perf_counter() - start
+
+
+@contextmanager
+def GuardRules(guard):
+    """
+    この中でのRuleSetによる照合・置換のうち、指数関数的なバックトラックを起こしうる正規表現を
+    制限時間付きで行う 抜ける際に照合用のプロセスを終了させる
+    制限するのはこのスレッドでの照合・置換のみで、同時に行われている他の翻訳には影響しない
+
+    Args:
+        guard (RuleGuard): 照合に用いるRuleGuard Noneなら制限しない
+    """
+    if guard is None:
+        yield
+        return
+    token = _guard.set(guard)
+    try:
+        yield
+    finally:
+        _guard.reset(token)
+        guard.Close()
+
+
+# 正規表現の検査で処理時間を測るのに用いる、バックトラックを起こさせやすい文字列
+ADVERSARIAL_STRINGS = [
+    "a" * 28 + "!",
+    "a " * 20 + "!",
+    "1." * 20 + "!",
+    " " * 28 + "!",
+    "-" * 28 + "\n",
+]
+
+# 一行の照合にこれ以上の時間(秒)がかかる正規表現は、時間がかかるものとして警告する
+SLOW_MATCH_SECONDS = 0.005
+
+
+class PatternLint:
+    """
+    正規表現パターンを、設定に保存する前に検査した結果
+    """
+    def __init__(self, pattern, ignorecase, example="", measure=True, time_budget=1.0):
+        """
+        Args:
+            pattern (string): 正規表現パターン
+            ignorecase (bool): 大文字と小文字を区別しないか
+            example (string, optional): マッチング例 空でなければ処理時間を測る文字列に加える
+            measure (bool, optional): 処理時間を測るか
+            time_budget (float, optional): 一つの文字列の照合にかける時間の上限(秒)
+        """
+        # コンパイルできない場合はその理由
+        self.error = None
+        # 指数関数的なバックトラックを起こしうる形をしている場合はその理由
+        self.risky_reason = None
+        # 最も時間のかかった照合の処理時間(秒)と、その文字列
+        self.worst_seconds = 0.0
+        self.worst_string = None
+        # 上限の時間内に照合が終わらなかったか
+        self.timed_out = False
+
+        try:
+            CompilePattern(pattern, ignorecase)
+        except re.error as e:
+            self.error = str(e)
+            return
+        self.risky_reason = RiskyReason(pattern, ignorecase)
+        if not measure:
+            return
+
+        # 照合が終わらない場合に備え、別のプロセスで測る
+        guard = RuleGuard(time_budget)
+        rule = Rule(0, pattern, ignorecase)
+        try:
+            for string in ([example] if example != "" else []) + ADVERSARIAL_STRINGS:
+                seconds = guard.Time(rule, string)
+                if seconds is None:
+                    self.timed_out = True
+                    self.worst_seconds = time_budget
+                    self.worst_string = string
+                    break
+                if seconds > self.worst_seconds:
+                    self.worst_seconds = seconds
+                    self.worst_string = string
+        finally:
+            guard.Close()
+
+    @property
+    def costly(self):
+        """
+        bool: 時間がかかる(あるいはかかりうる)ため、警告すべきか
+        """
+        return self.risky_reason is not None or self.timed_out or self.worst_seconds >= SLOW_MATCH_SECONDS
+
+
+def ClassifyLines(rule_sets, lines, executor=None, chunk_lines=5000):
+    """
+    各行について、それぞれのRuleSetで最初にヒットする正規表現を探す
+    executorが渡され、行数がchunk_linesを超える場合は、chunk_linesずつの断片に分けて
+    複数のプロセスで並列に調べる(結果は並列化しない場合と同一)
+
+    Args:
+        rule_sets (list of RuleSet): 調べる正規表現の種類ごとのRuleSet
+        lines (list of string): 対象の行のリスト
+        executor (concurrent.futures.ProcessPoolExecutor, optional): 並列に調べるためのプロセスプール
+        chunk_lines (int, optional): 1プロセスに一度に任せる行数
+
+    Returns:
+        list of dict of int to Rule: RuleSetごとの、ヒットした行の番号と最初にヒットした正規表現の辞書
+    """
+    chunk_lines = max(1, chunk_lines)
+    # 計測中は計測結果を集めるため、制限時間付きで照合する場合は別のプロセスでは制限できないため、並列化しない
+    if executor is None or len(lines) <= chunk_lines or _profile.get() is not None or \
+            (_guard.get() is not None and any(rule_set.has_risky_rules for rule_set in rule_sets)):
+        return [rule_set.Classify(lines) for rule_set in rule_sets]
+
+    # 別のプロセスにはRuleSetではなく設定の内容を渡し、向こうで作り直してもらう
+    # (プロセスごとに_GetRuleSetのキャッシュが効くので、作り直すのは最初の一度だけ)
+    keys = tuple(rule_set.key for rule_set in rule_sets)
+    futures = [executor.submit(_ClassifyChunk, keys, lines[i:i + chunk_lines]) for i in range(0, len(lines), chunk_lines)]
+    # 結果は設定のリストにおける番号で返ってくるので、こちらの正規表現に対応させる
+    rules_by_index = [{rule.index: rule for rule in rule_set.rules} for rule_set in rule_sets]
+    results = [{} for _ in rule_sets]
+    for chunk_index, future in enumerate(futures):
+        offset = chunk_index * chunk_lines
+        for hits, sparse_hits, rules in zip(results, future.result(), rules_by_index):
+            for i, rule_index in sparse_hits:
+                hits[offset + i] = rules[rule_index]
+    return results
+
+
+def _ClassifyChunk(keys, lines):
+    """
+    ClassifyLinesで、別のプロセスが一つの断片を調べる
+
+    Args:
+        keys (tuple of tuple): RuleSetごとの設定の内容の組(RuleSet.key)
+        lines (list of string): 対象の行のリスト
+
+    Returns:
+        list of list of (int, int): RuleSetごとの、ヒットした行の番号と最初にヒットした正規表現の設定のリストにおける番号の組のリスト
+    """
+    return [[(i, rule.index) for i, rule in _GetRuleSet(*key).Classify(lines).items()] for key in keys]
+
+
+# 大文字と小文字を区別しない照合で、ASCIIの文字と同一視されるASCII以外の文字
+_ASCII_CASE_EQUIVALENTS = str.maketrans({
+    "\u0130": "i",     # LATIN CAPITAL LETTER I WITH DOT ABOVE
+    "\u0131": "i",     # LATIN SMALL LETTER DOTLESS I
+    "\u017f": "s",     # LATIN SMALL LETTER LONG S
+    "\u212a": "k",     # KELVIN SIGN
+})
+
+
+def FoldCase(string):
+    """
+    大文字と小文字を区別しない正規表現の、必ず含まれる文字列(ASCIIのみ・小文字)と比べるために文字列を小文字にする
+    正規表現でASCIIの文字と同一視される文字は、そのASCIIの文字にする
+
+    Args:
+        string (string): 対象の文字列
+
+    Returns:
+        string: 小文字にした文字列
+    """
+    if string.isascii():
+        return string.lower()
+    return string.translate(_ASCII_CASE_EQUIVALENTS).lower()
+
+
+def RequiredLiterals(pattern, ignorecase):
+    """
+    正規表現にヒットする文字列に必ず含まれる文字列の候補を求める
+
+    例: "^\\s*(Fig\\.|Figure|Table)\\s*\\d+" -> (("Fig.", False), ("Figure", False), ("Table", False))
+
+    Args:
+        pattern (string): 正規表現パターン
+        ignorecase (bool): 大文字と小文字を区別しないか
+
+    Returns:
+        tuple of (string, bool): ヒットする文字列には、これらのうちいずれかが含まれる
+        大文字と小文字を区別しない部分から求まったものは、FoldCaseにより小文字にしたASCIIの文字列(第二要素がTrue)
+        求まらなければNone
+    """
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE if ignorecase else 0)
+    except (re.error, RecursionError):
+        return None
+    state = getattr(parsed, "state", None) or parsed.pattern
+    return _BestLiterals(_LiteralCandidates(parsed, bool(state.flags & re.IGNORECASE)))
+
+
+_REPEATS = tuple(getattr(sre_parse, name) for name in ["MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"] if hasattr(sre_parse, name))
+
+
+def _LiteralCandidates(subpattern, ignorecase):
+    """
+    解析済みの正規表現から、必ず含まれる文字列の候補を全て求める
+
+    Returns:
+        list of tuple of (string, bool): 候補のリスト 各候補はRequiredLiteralsの戻り値と同じ形式
+    """
+    candidates = []
+    run = []
+
+    def Flush():
+        if len(run) > 0:
+            literal = "".join(run)
+            candidates.append(((literal.lower() if ignorecase else literal, ignorecase),))
+            run.clear()
+
+    for op, av in subpattern:
+        if op is sre_parse.LITERAL and _IsFoldable(av, ignorecase):
+            run.append(chr(av))
+            continue
+        if op is sre_parse.BRANCH and len(run) > 0:
+            # 選択肢の共通の先頭部分はまとめられているので、直前の文字列と各選択肢の先頭の文字列をつなげたものも候補とする
+            # 例: "e\\.g|etc" は "e(?:\\.g|tc)" と解析される
+            heads = [_LeadingLiteral(branch, ignorecase) for branch in av[1]]
+            if all(len(head) > 0 for head in heads):
+                prefix = "".join(run)
+                candidates.append(tuple(sorted(set(
+                    ((prefix + head).lower() if ignorecase else prefix + head, ignorecase) for head in heads))))
+        Flush()
+        if op is sre_parse.SUBPATTERN:
+            _, add_flags, del_flags, p = av
+            group_ignorecase = (ignorecase or bool(add_flags & re.IGNORECASE)) and not (del_flags & re.IGNORECASE)
+            candidates.extend(_LiteralCandidates(p, group_ignorecase))
+        elif op in _REPEATS:
+            min_count, _, item = av
+            if min_count >= 1:
+                candidates.extend(_LiteralCandidates(item, ignorecase))
+        elif op is sre_parse.BRANCH:
+            # 全ての選択肢に候補があれば、そのいずれかが含まれる
+            literals = []
+            for branch in av[1]:
+                best = _BestLiterals(_LiteralCandidates(branch, ignorecase))
+                if best is None:
+                    break
+                literals.extend(best)
+            else:
+                candidates.append(tuple(sorted(set(literals))))
+        elif op is getattr(sre_parse, "ATOMIC_GROUP", None):
+            candidates.extend(_LiteralCandidates(av, ignorecase))
+    Flush()
+
+    return candidates
+
+
+def _LeadingLiteral(subpattern, ignorecase):
+    """
+    解析済みの正規表現の先頭にある文字列を求める
+    """
+    head = []
+    for op, av in subpattern:
+        if op is not sre_parse.LITERAL or not _IsFoldable(av, ignorecase):
+            break
+        head.append(chr(av))
+    return "".join(head)
+
+
+def _IsFoldable(code, ignorecase):
+    """
+    文字を必ず含まれる文字列として扱えるか調べる
+    大文字と小文字を区別しない場合は、FoldCaseで他の文字と同一視したものと比べられる
+    ASCIIの文字か、大文字と小文字の区別が無い記号などのみ扱う
+    """
+    if not ignorecase or code < 128:
+        return True
+    c = chr(code)
+    return c.lower() == c and c.upper() == c and not c.isalpha()
+
+
+def _BestLiterals(candidates):
+    """
+    候補のうち、最も短い文字列が最も長いもの(行を絞り込む効果が最も高いと思われるもの)を選ぶ
+    """
+    if len(candidates) == 0:
+        return None
+    return max(candidates, key=lambda c: min(len(literal) for literal, _ in c))
@@ -257,6 +257,230 @@ class Settings():
     def source_as_comment(self, bool_source_as_comment):
         self.__settings["bool_source_as_comment"] = bool_source_as_comment
 
+    class PDFExtraction:
+        """
+        PDFからのテキスト抽出まわりの設定を扱うクラス
+        """
+        def __subsettings(self):
+            return settings()["pdf_extraction"]
+
+        # 抽出と開始・終了・無視条件の判定に用いるプロセス数(1なら並列化しない、0ならCPUのコア数)
+        # 子プロセスの起動に時間がかかるため、既定では並列化しない
+        @property
+        def parallel_workers(self):
+            return self.__subsettings()["int_parallel_workers"]
+
+        @parallel_workers.setter
+        def parallel_workers(self, int_parallel_workers):
+            self.__subsettings()["int_parallel_workers"] = int_parallel_workers
+
+        # 並列抽出時に1プロセスに一度に任せるページ数
+        @property
+        def pages_per_shard(self):
+            return self.__subsettings()["int_pages_per_shard"]
+
+        @pages_per_shard.setter
+        def pages_per_shard(self, int_pages_per_shard):
+            self.__subsettings()["int_pages_per_shard"] = int_pages_per_shard
+
+        # 開始・終了・無視条件の並列判定時に1プロセスに一度に任せる行数
+        @property
+        def lines_per_chunk(self):
+            return self.__subsettings()["int_lines_per_chunk"]
+
+        @lines_per_chunk.setter
+        def lines_per_chunk(self, int_lines_per_chunk):
+            self.__subsettings()["int_lines_per_chunk"] = int_lines_per_chunk
+
+        # 抽出結果をキャッシュするか
+        @property
+        def use_cache(self):
+            return self.__subsettings()["bool_use_cache"]
+
+        @use_cache.setter
+        def use_cache(self, bool_use_cache):
+            self.__subsettings()["bool_use_cache"] = bool_use_cache
+
+        # キャッシュの合計サイズの上限(MB)
+        @property
+        def cache_size_mb(self):
+            return self.__subsettings()["int_cache_size_mb"]
+
+        @cache_size_mb.setter
+        def cache_size_mb(self, int_cache_size_mb):
+            self.__subsettings()["int_cache_size_mb"] = int_cache_size_mb
+
+        # 抽出終了条件にヒットしたら、それ以降のページの解析を打ち切るか
+        # 参考文献以降が長い文書の解析を速くするためのもの 打ち切ると、終了条件の後で再び開始条件にヒットする部分
+        # (付録や、1つのファイルにまとめられた別の論文など)が抽出されなくなるため、既定では打ち切らない
+        @property
+        def stop_at_end_condition(self):
+            return self.__subsettings()["bool_stop_at_end_condition"]
+
+        @stop_at_end_condition.setter
+        def stop_at_end_condition(self, bool_stop_at_end_condition):
+            self.__subsettings()["bool_stop_at_end_condition"] = bool_stop_at_end_condition
+
+        # 文書のアウトライン(しおり)から、抽出するページの範囲を絞り込むか
+        # 見出しのページより前(目次など)にある抽出開始条件のヒットは無視されるため、既定では絞り込まない
+        @property
+        def use_outline(self):
+            return self.__subsettings()["bool_use_outline"]
+
+        @use_outline.setter
+        def use_outline(self, bool_use_outline):
+            self.__subsettings()["bool_use_outline"] = bool_use_outline
+
+        # アウトラインが使えない場合に、レイアウト解析を行わない大まかな抽出で抽出開始ページを探すか
+        # 見つけたページより前(目次など)にある抽出開始条件のヒットは無視されるため、既定では探さない
+        @property
+        def two_phase_extraction(self):
+            return self.__subsettings()["bool_two_phase_extraction"]
+
+        @two_phase_extraction.setter
+        def two_phase_extraction(self, bool_two_phase_extraction):
+            self.__subsettings()["bool_two_phase_extraction"] = bool_two_phase_extraction
+
+        # 置換条件による置換を、行ごとではなく抽出した行全体に対してまとめて行うか
+        @property
+        def bulk_replace(self):
+            return self.__subsettings()["bool_bulk_replace"]
+
+        @bulk_replace.setter
+        def bulk_replace(self, bool_bulk_replace):
+            self.__subsettings()["bool_bulk_replace"] = bool_bulk_replace
+
+        # 抽出の結果(解析したページ数など)をtxtファイルとして出力するか
+        @property
+        def output_report(self):
+            return self.__subsettings()["bool_output_report"]
+
+        @output_report.setter
+        def output_report(self, bool_output_report):
+            self.__subsettings()["bool_output_report"] = bool_output_report
+
+    class WebDriver:
+        """
+        翻訳に用いるWebDriverまわりの設定を扱うクラス
+        """
+        def __subsettings(self):
+            return settings()["web_driver"]
+
+        # 全ての翻訳で共有するWebDriverのセッション(ウェブブラウザ)の最大数
+        @property
+        def session_pool_size(self):
+            return self.__subsettings()["int_session_pool_size"]
+
+        @session_pool_size.setter
+        def session_pool_size(self, int_session_pool_size):
+            self.__subsettings()["int_session_pool_size"] = int_session_pool_size
+
+        # 使われないまま何秒経ったセッションを閉じるか
+        @property
+        def session_idle_secs(self):
+            return self.__subsettings()["int_session_idle_secs"]
+
+        @session_idle_secs.setter
+        def session_idle_secs(self, int_session_idle_secs):
+            self.__subsettings()["int_session_idle_secs"] = int_session_idle_secs
+
+        # 1つのセッションで並行して翻訳に用いるDeepLのタブの数
+        @property
+        def tabs_per_session(self):
+            return self.__subsettings()["int_tabs_per_session"]
+
+        @tabs_per_session.setter
+        def tabs_per_session(self, int_tabs_per_session):
+            self.__subsettings()["int_tabs_per_session"] = int_tabs_per_session
+
+        # 常駐させたウェブブラウザ(browserdaemon.py)が起動していれば、それに接続して翻訳に用いるか
+        @property
+        def use_browser_daemon(self):
+            return self.__subsettings()["bool_use_browser_daemon"]
+
+        @use_browser_daemon.setter
+        def use_browser_daemon(self, bool_use_browser_daemon):
+            self.__subsettings()["bool_use_browser_daemon"] = bool_use_browser_daemon
+
+        # Remote WebDriver(Selenium Gridなど)のノードで使用するウェブブラウザ(RemoteではないBrowserの値)
+        @property
+        def remote_browser(self):
+            return self.__subsettings()["str_remote_browser"]
+
+        @remote_browser.setter
+        def remote_browser(self, str_remote_browser):
+            self.__subsettings()["str_remote_browser"] = str_remote_browser
+
+        # Remote WebDriverのノードのURLのリスト
+        @property
+        def remote_urls(self):
+            return self.__subsettings()["list_str_remote_urls"]
+
+        @remote_urls.setter
+        def remote_urls(self, list_str_remote_urls):
+            self.__subsettings()["list_str_remote_urls"] = list_str_remote_urls
+
+        # Remote WebDriverのノードごとの同時セッション数の上限のリスト
+        @property
+        def remote_max_sessions(self):
+            return self.__subsettings()["list_int_remote_max_sessions"]
+
+        @remote_max_sessions.setter
+        def remote_max_sessions(self, list_int_remote_max_sessions):
+            self.__subsettings()["list_int_remote_max_sessions"] = list_int_remote_max_sessions
+
+        # 応答しなくなったRemote WebDriverのノードを、何秒間使わないようにするか
+        @property
+        def remote_retry_secs(self):
+            return self.__subsettings()["int_remote_retry_secs"]
+
+        @remote_retry_secs.setter
+        def remote_retry_secs(self, int_remote_retry_secs):
+            self.__subsettings()["int_remote_retry_secs"] = int_remote_retry_secs
+
+        # ウェブブラウザを軽量モード(ウインドウを表示せず、画像やWebフォントを読み込まない)で起動するか
+        @property
+        def lightweight_browser(self):
+            return self.__subsettings()["bool_lightweight_browser"]
+
+        @lightweight_browser.setter
+        def lightweight_browser(self, bool_lightweight_browser):
+            self.__subsettings()["bool_lightweight_browser"] = bool_lightweight_browser
+
+        # 軽量モードで使い回すプロファイルを保存するディレクトリ(空なら一時的なプロファイルを用いる)
+        @property
+        def browser_profile_dir(self):
+            return self.__subsettings()["str_browser_profile_dir"]
+
+        @browser_profile_dir.setter
+        def browser_profile_dir(self, str_browser_profile_dir):
+            self.__subsettings()["str_browser_profile_dir"] = str_browser_profile_dir
+
+        # 各ウェブブラウザのドライバの実行ファイルのパス(空ならwebdriver_managerで求めてキャッシュする)
+        @property
+        def chrome_driver_path(self):
+            return self.__subsettings()["str_chrome_driver_path"]
+
+        @chrome_driver_path.setter
+        def chrome_driver_path(self, str_chrome_driver_path):
+            self.__subsettings()["str_chrome_driver_path"] = str_chrome_driver_path
+
+        @property
+        def edge_driver_path(self):
+            return self.__subsettings()["str_edge_driver_path"]
+
+        @edge_driver_path.setter
+        def edge_driver_path(self, str_edge_driver_path):
+            self.__subsettings()["str_edge_driver_path"] = str_edge_driver_path
+
+        @property
+        def firefox_driver_path(self):
+            return self.__subsettings()["str_firefox_driver_path"]
+
+        @firefox_driver_path.setter
+        def firefox_driver_path(self, str_firefox_driver_path):
+            self.__subsettings()["str_firefox_driver_path"] = str_firefox_driver_path
+
     class RegularExpressions:
         """
         正規表現まわりの設定を扱うクラス
@@ -272,6 +496,24 @@ class Settings():
         def show_markdown_settings(self, bool_show_markdown_settings):
             self.__subsettings()["bool_show_markdown_settings"] = bool_show_markdown_settings
 
+        # 正規表現ごとの照合回数・ヒット回数・処理時間を計測して、txtファイルとして出力するか
+        @property
+        def profile_rules(self):
+            return self.__subsettings()["bool_profile_rules"]
+
+        @profile_rules.setter
+        def profile_rules(self, bool_profile_rules):
+            self.__subsettings()["bool_profile_rules"] = bool_profile_rules
+
+        # 指数関数的なバックトラックを起こしうる正規表現で一行を照合する際の制限時間(ミリ秒 0なら制限しない)
+        @property
+        def rule_time_budget_ms(self):
+            return self.__subsettings()["int_rule_time_budget_ms"]
+
+        @rule_time_budget_ms.setter
+        def rule_time_budget_ms(self, int_rule_time_budget_ms):
+            self.__subsettings()["int_rule_time_budget_ms"] = int_rule_time_budget_ms
+
         class StartLines(ConditionLines):
             def _subsettings(self):
                 return settings()["regular_expressions"]["start_lines"]
@@ -0,0 +1,23 @@
+import sys
+
+from pathlib import Path
+
+import pytest
+
+
+# ソースは src 直下にフラットに置かれているので、そのままimportできるようにする
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+
+@pytest.fixture
+def isolated_settings(tmp_path, monkeypatch):
+    """
+    既定の設定を、一時ディレクトリのsettings.jsonから読み込ませる
+    (作業ディレクトリのsettings.jsonを読み書きしないようにする)
+    """
+    import settings
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "settings_path", tmp_path / "settings.json")
+    monkeypatch.setattr(settings, "settings_dict", None)
+    return settings.Settings
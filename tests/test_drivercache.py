@@ -0,0 +1,88 @@
+import subprocess
+import sys
+
+import pytest
+
+import drivercache
+
+from data import Browser
+from drivercache import UNKNOWN_VERSION, BrowserVersion, DriverCache
+
+
+@pytest.fixture
+def fake_run(monkeypatch):
+    """
+    ウェブブラウザのバージョンを調べるコマンドを実行せず、outputsの出力を順に返す
+    """
+    monkeypatch.setattr(drivercache, "_browser_versions", {})
+    monkeypatch.setattr(sys, "platform", "linux")
+    outputs = []
+    commands = []
+
+    def Run(command, **kwargs):
+        commands.append(command)
+        output = outputs.pop(0)
+        if isinstance(output, Exception):
+            raise output
+        return subprocess.CompletedProcess(command, 0, stdout=output)
+
+    monkeypatch.setattr(subprocess, "run", Run)
+    return outputs, commands
+
+
+def test_browser_version_is_memoized(fake_run):
+    outputs, commands = fake_run
+    outputs.append("Mozilla Firefox 115.0.2\n")
+    assert BrowserVersion(Browser.FIREFOX.value) == "115.0.2"
+    assert BrowserVersion(Browser.FIREFOX.value) == "115.0.2"
+    assert len(commands) == 1
+    # 調べ直す場合はコマンドを再び実行する
+    outputs.append("Mozilla Firefox 116.0\n")
+    assert BrowserVersion(Browser.FIREFOX.value, refresh=True) == "116.0"
+    assert len(commands) == 2
+
+
+def test_browser_version_tries_next_command(fake_run):
+    outputs, commands = fake_run
+    outputs.extend([FileNotFoundError(), "", "Chromium 120.0.6099.109 snap\n"])
+    assert BrowserVersion(Browser.CHROME.value) == "120.0.6099.109"
+    assert [command[0] for command in commands] == ["google-chrome", "google-chrome-stable", "chromium"]
+
+
+def test_browser_version_unknown(fake_run):
+    outputs, _ = fake_run
+    outputs.extend([subprocess.TimeoutExpired("microsoft-edge", 10), ""])
+    assert BrowserVersion(Browser.EDGE.value) == UNKNOWN_VERSION
+
+
+def test_driver_cache_store_and_lookup(tmp_path):
+    driver = tmp_path / "geckodriver"
+    driver.write_text("")
+    cache = DriverCache(tmp_path / "driver_cache.json")
+    assert cache.Lookup(Browser.FIREFOX.value, "115.0") is None
+    cache.Store(Browser.FIREFOX.value, "115.0", str(driver))
+    assert cache.Lookup(Browser.FIREFOX.value, "115.0") == str(driver)
+    # ウェブブラウザのバージョンが変われば使わない
+    assert cache.Lookup(Browser.FIREFOX.value, "116.0") is None
+    # 別のインスタンスからも読める
+    assert DriverCache(tmp_path / "driver_cache.json").Lookup(Browser.FIREFOX.value, "115.0") == str(driver)
+    assert not any(path.name.endswith(".tmp") for path in tmp_path.iterdir())
+
+
+def test_driver_cache_ignores_missing_driver(tmp_path):
+    cache = DriverCache(tmp_path / "driver_cache.json")
+    cache.Store(Browser.CHROME.value, "120.0", str(tmp_path / "deleted"))
+    assert cache.Lookup(Browser.CHROME.value, "120.0") is None
+
+
+@pytest.mark.parametrize("content", ["{broken", "[1, 2]"])
+def test_driver_cache_ignores_corrupt_file(tmp_path, content):
+    path = tmp_path / "driver_cache.json"
+    path.write_text(content)
+    driver = tmp_path / "chromedriver"
+    driver.write_text("")
+    cache = DriverCache(path)
+    assert cache.Lookup(Browser.CHROME.value, "120.0") is None
+    # 壊れたキャッシュは上書きされる
+    cache.Store(Browser.CHROME.value, "120.0", str(driver))
+    assert cache.Lookup(Browser.CHROME.value, "120.0") == str(driver)
@@ -0,0 +1,51 @@
+import os
+
+from extractioncache import ExtractionCache
+
+
+def _WriteFile(path, content):
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_key_depends_on_content_and_params(tmp_path):
+    a = _WriteFile(tmp_path / "a.pdf", b"%PDF-1.4 a")
+    b = _WriteFile(tmp_path / "b.pdf", b"%PDF-1.4 a")
+    c = _WriteFile(tmp_path / "c.pdf", b"%PDF-1.4 c")
+    # ファイル名ではなく内容で決まる
+    assert ExtractionCache.Key(a) == ExtractionCache.Key(b)
+    assert ExtractionCache.Key(a) != ExtractionCache.Key(c)
+    assert ExtractionCache.Key(a, "params1") != ExtractionCache.Key(a, "params2")
+    assert ExtractionCache.Key(a, "params1") == ExtractionCache.Key(a, "params1")
+
+
+def test_save_and_load(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache")
+    assert cache.Load("missing") == (None, {})
+    cache.Save("key", 3, {0: ["a", "b"], 2: ["c"]})
+    assert cache.Load("key") == (3, {0: ["a", "b"], 2: ["c"]})
+
+
+def test_broken_entry_is_ignored(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache")
+    cache.Save("key", 1, {0: ["a"]})
+    (tmp_path / "cache" / "key.json.gz").write_bytes(b"not gzip")
+    assert cache.Load("key") == (None, {})
+
+
+def test_evicts_least_recently_used(tmp_path):
+    directory = tmp_path / "cache"
+    cache = ExtractionCache(directory, max_size_mb=1)
+    # 圧縮されにくい内容にして、3つ分で上限を超えるようにする
+    pages = {0: [os.urandom(400 * 1024).hex()]}
+    cache.Save("old", 1, pages)
+    cache.Save("used", 1, pages)
+    os.utime(str(directory / "old.json.gz"), (1000, 1000))
+    os.utime(str(directory / "used.json.gz"), (2000, 2000))
+    # 読み込むと最後に使われた時刻が更新される
+    cache.Load("old")
+    cache.Save("new", 1, pages)
+
+    remaining = sorted(path.name for path in directory.glob("*.json.gz"))
+    assert remaining == ["new.json.gz", "old.json.gz"]
+    assert not any(path.name.endswith(".tmp") for path in directory.iterdir())
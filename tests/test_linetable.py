@@ -0,0 +1,57 @@
+import io
+
+from linetable import CHART_START, HEADER, RETURN, RETURN_IGNORE, LineTable
+from ruleset import RuleSet
+
+
+LINES = ["1 Introduction", "", "Fig. 1 Overview", "This is a sentence.", "e.g. an example", "2 Method"]
+
+
+def test_rows_round_trip():
+    table = LineTable(LINES)
+    assert len(table) == len(LINES)
+    assert list(table) == LINES
+    assert table[-1] == LINES[-1]
+    assert list(table.lengths) == [len(t) for t in LINES]
+    assert list(table.last_chars) == [ord(t[-1]) if t != "" else 0 for t in LINES]
+
+
+def test_masks_per_category():
+    table = LineTable(LINES)
+    header_rules = RuleSet([True, True], [False, False], [r"^\d+ [A-Z]", r"^Method$"])
+    chart_rules = RuleSet([True], [False], [r"^Fig\."])
+    return_rules = RuleSet([True, True], [False, False], [r"\.$", r"Overview$"])
+    table.Classify(HEADER, header_rules)
+    table.Classify(CHART_START, chart_rules)
+    # 一部の行のみ調べる
+    table.Classify(RETURN, return_rules, line_numbers=[2, 3])
+
+    assert [table.IsHit(HEADER, i) for i in range(len(table))] == [True, False, False, False, False, True]
+    assert [table.IsHit(CHART_START, i) for i in range(len(table))] == [False, False, True, False, False, False]
+    assert [table.IsHit(RETURN, i) for i in range(len(table))] == [False, False, True, True, False, False]
+    assert not any(table.IsHit(RETURN_IGNORE, i) for i in range(len(table)))
+    # 各種類のビットは独立している
+    assert table.hit_masks[2] == (1 << CHART_START) | (1 << RETURN)
+
+    assert table.HitRule(HEADER, 0).index == 0
+    assert table.HitRule(HEADER, 1) is None
+    assert table.HitRule(RETURN, 2).index == 1
+    assert list(table.rule_indices[RETURN]) == [-1, -1, 1, 0, -1, -1]
+
+
+def test_classify_only_once_per_category():
+    table = LineTable(LINES)
+    table.Classify(HEADER, RuleSet([True], [False], [r"^1 "]))
+    table.Classify(HEADER, RuleSet([True], [False], [r"^2 "]))
+    assert [table.IsHit(HEADER, i) for i in range(len(table))] == [True, False, False, False, False, False]
+
+
+def test_write_hit_lines():
+    table = LineTable(LINES)
+    table.Classify(HEADER, RuleSet([True, True], [False, False], [r"^\d", r"Intro"]))
+    f = io.StringIO()
+    table.WriteHitLines(HEADER, f)
+    assert f.getvalue() == "^\\d, 1 Introduction\n^\\d, 2 Method\n"
+    f = io.StringIO()
+    table.WriteHitLines(HEADER, f, all_rules=True)
+    assert f.getvalue() == "^\\d, 1 Introduction\nIntro, 1 Introduction\n^\\d, 2 Method\n"
@@ -0,0 +1,133 @@
+import pytest
+
+# pdftranslatorはGUIとウェブブラウザの操作に用いるライブラリをimportする
+pytest.importorskip("wx")
+pytest.importorskip("selenium")
+pytest.importorskip("webdriver_manager")
+
+
+class FakeRawText:
+    """
+    PDFRawTextの代わりに、ページごとの行をそのまま返すもの
+    """
+    def __init__(self, pages, outline=()):
+        self.pages = pages
+        self.outline = list(outline)
+        # 読み出されたページ番号
+        self.read_pages = []
+
+    def IterPageBatches(self, first_page=0, last_page=None, max_lines=0):
+        for page_index, lines in enumerate(self.pages):
+            if page_index < first_page or (last_page is not None and page_index > last_page):
+                continue
+            self.read_pages.append(page_index)
+            yield [(page_index, lines)]
+
+    def IterScanPages(self):
+        return enumerate(self.pages)
+
+    def Close(self):
+        pass
+
+
+# 目次に開始条件にヒットする行があり、参考文献の後ろに別の論文が続く文書
+PAGES = [
+    ["Contents", "1 Introduction ........ 1", "2 Method ........ 2"],
+    ["1 Introduction", "Intro text."],
+    ["2 Method", "Method text.", "References"],
+    ["[1] A. Author. A paper."],
+    ["1 Introduction", "Second paper text."],
+]
+# しおりは最初の論文の本文の見出しを指す
+OUTLINE = [("1 Introduction", 1), ("2 Method", 2), ("References", 2)]
+
+
+@pytest.fixture
+def extraction(isolated_settings):
+    import pdftranslator
+
+    Settings = isolated_settings
+    Settings.PDFExtraction().use_cache = False
+    Settings.RegularExpressions.IgnoreLines().enabled_overall = False
+    Settings.RegularExpressions.ReplaceParts.Standard().enabled_overall = False
+    Settings.RegularExpressions.ReplaceParts.Markdown().enabled_overall = False
+
+    def Extract(rawtext, **kwargs):
+        return list(pdftranslator.PDFTextExtract("test.pdf", rawtext=rawtext, **kwargs))
+
+    return pdftranslator, Settings, Extract
+
+
+def test_default_extracts_every_start_to_end_section(extraction):
+    _, _, Extract = extraction
+    rawtext = FakeRawText(PAGES, OUTLINE)
+    # しおりや大まかな抽出による絞り込みは既定では行わないので、目次から抽出が始まる
+    # 既定では終了条件にヒットしても解析を続けるので、再び開始条件にヒットした後も抽出される
+    assert Extract(rawtext) == PAGES[0][1:] + PAGES[1] + PAGES[2][:2] + PAGES[4]
+    assert rawtext.read_pages == [0, 1, 2, 3, 4]
+
+
+def test_stop_at_end_condition(extraction):
+    _, Settings, Extract = extraction
+    Settings.PDFExtraction().stop_at_end_condition = True
+    rawtext = FakeRawText(PAGES)
+    # 終了条件にヒットしたページより後は読まないので、その後の開始条件のヒットも無くなる
+    assert Extract(rawtext) == PAGES[0][1:] + PAGES[1] + PAGES[2][:2]
+    assert rawtext.read_pages == [0, 1, 2]
+
+
+def test_end_hit_with_start_disabled_skips_only_that_line(extraction):
+    _, Settings, Extract = extraction
+    Settings.RegularExpressions.StartLines().enabled_overall = False
+    Settings.PDFExtraction().stop_at_end_condition = True
+    # 終了条件にヒットする行がページの最後の行でも、以降のページを抽出する
+    pages = [["Body.", "References"], ["More body."], ["REFERENCES"], ["Tail."]]
+    assert Extract(FakeRawText(pages)) == ["Body.", "More body.", "Tail."]
+    Settings.PDFExtraction().use_outline = True
+    assert Extract(FakeRawText(pages, [("References", 0)])) == ["Body.", "More body.", "Tail."]
+
+
+def test_force_ignore_end_condition(extraction):
+    _, Settings, Extract = extraction
+    Settings.PDFExtraction().stop_at_end_condition = True
+    assert Extract(FakeRawText(PAGES), force_ignore_end_condition=True) == [
+        line for page in PAGES for line in page][1:]
+
+
+def test_outline_narrows_page_range_when_enabled(extraction):
+    _, Settings, Extract = extraction
+    Settings.PDFExtraction().use_outline = True
+    rawtext = FakeRawText(PAGES, OUTLINE)
+    # 終了するページは、終了条件による解析の打ち切りを行う場合のみ求める
+    assert Extract(rawtext) == PAGES[1] + PAGES[2][:2] + PAGES[4]
+    assert rawtext.read_pages == [1, 2, 3, 4]
+    Settings.PDFExtraction().stop_at_end_condition = True
+    rawtext = FakeRawText(PAGES, OUTLINE)
+    assert Extract(rawtext) == PAGES[1] + PAGES[2][:2]
+    assert rawtext.read_pages == [1, 2]
+
+
+def test_two_phase_starts_at_scanned_page_when_enabled(extraction):
+    _, Settings, Extract = extraction
+    Settings.PDFExtraction().two_phase_extraction = True
+    pages = [["Title page"], ["1 Introduction", "Intro text."], ["Body."]]
+    rawtext = FakeRawText(pages)
+    assert Extract(rawtext) == pages[1] + pages[2]
+    assert rawtext.read_pages == [1, 2]
+
+
+def test_find_page_range_from_outline(extraction):
+    pdftranslator, _, _ = extraction
+    find = pdftranslator.FindPageRangeFromOutline
+    assert find(OUTLINE, True, True) == (1, 2)
+    assert find(OUTLINE, True, False) == (1, None)
+    assert find(OUTLINE, False, True) == (0, 2)
+    assert find([], True, True) == (0, None)
+    # 終了条件は開始条件にヒットした見出しより後ろから探す
+    assert find([("References", 0), ("1 Introduction", 1), ("Appendix", 5)], True, True) == (1, None)
+
+
+def test_find_start_page_from_scan(extraction):
+    pdftranslator, _, _ = extraction
+    assert pdftranslator.FindStartPageFromScan(FakeRawText([["Title"], ["Abstract"], ["1 Introduction"]])) == 2
+    assert pdftranslator.FindStartPageFromScan(FakeRawText([["Title"], ["Body"]])) == 0
@@ -0,0 +1,89 @@
+import io
+import threading
+import time
+
+import pytest
+
+# deeplmanagerはGUIとウェブブラウザの操作に用いるライブラリをimportする
+pytest.importorskip("wx")
+pytest.importorskip("selenium")
+pytest.importorskip("webdriver_manager")
+
+
+NODE_A = "http://a:4444/wd/hub"
+NODE_B = "http://b:4444/wd/hub"
+
+
+@pytest.fixture
+def nodes(isolated_settings, monkeypatch):
+    import deeplmanager
+    import selenium.common.exceptions as sce
+
+    Settings = isolated_settings
+    Settings.WebDriver().remote_urls = [NODE_A, NODE_B]
+    Settings.WebDriver().remote_max_sessions = [2, 1]
+    # 応答しないノード
+    unreachable = set()
+    created = []
+
+    class FakeRemote:
+        """
+        ノードに接続しないwebdriver.Remoteの代わり
+        """
+        def __init__(self, command_executor, desired_capabilities):
+            if command_executor in unreachable:
+                raise sce.WebDriverException("unreachable")
+            self.node = command_executor
+            self.session_id = str(len(created))
+            created.append(self)
+
+    monkeypatch.setattr(deeplmanager.webdriver, "Remote", FakeRemote)
+    monkeypatch.setattr(deeplmanager.RemoteNodes, "IsReachable", staticmethod(lambda url, timeout_secs=3: url not in unreachable))
+    monkeypatch.setattr(deeplmanager, "stderr", io.StringIO())
+    return deeplmanager.RemoteNodes(), Settings, unreachable
+
+
+def test_sessions_go_to_least_loaded_node(nodes):
+    remote_nodes, _, _ = nodes
+    drivers = [remote_nodes.CreateWebDriver({}) for _ in range(3)]
+    # 上限に対する使用中のセッションの割合が小さいノードから順に使う
+    assert [driver.node for driver in drivers] == [NODE_A, NODE_B, NODE_A]
+    assert remote_nodes.Capacity() == 3
+
+
+def test_unreachable_node_is_evicted(nodes):
+    remote_nodes, _, unreachable = nodes
+    unreachable.add(NODE_A)
+    assert remote_nodes.CreateWebDriver({}).node == NODE_B
+    unreachable.clear()
+    # 候補から外したノードは一定時間使わないので、空きが無ければ作成できない
+    remote_nodes.Evict(NODE_B)
+    with pytest.raises(Exception, match="No Remote WebDriver node"):
+        remote_nodes.CreateWebDriver({})
+
+
+def test_release_evicts_node_that_stopped_responding(nodes):
+    remote_nodes, _, unreachable = nodes
+    driver = remote_nodes.CreateWebDriver({})
+    assert driver.node == NODE_A
+    unreachable.add(NODE_A)
+    remote_nodes.Release(driver, alive=False)
+    unreachable.clear()
+    assert remote_nodes.CreateWebDriver({}).node == NODE_B
+
+
+def test_waiting_resumes_when_eviction_expires(nodes):
+    remote_nodes, Settings, _ = nodes
+    Settings.WebDriver().remote_max_sessions = [1, 1]
+    Settings.WebDriver().remote_retry_secs = 1
+    assert remote_nodes.CreateWebDriver({}).node == NODE_A
+    remote_nodes.Evict(NODE_B)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(remote_nodes.CreateWebDriver({})), daemon=True)
+    start = time.monotonic()
+    thread.start()
+    # セッションが閉じられなくても、候補から外したノードが戻れば作成される
+    thread.join(5)
+    assert not thread.is_alive()
+    assert [driver.node for driver in result] == [NODE_B]
+    assert time.monotonic() - start >= 0.5
@@ -0,0 +1,273 @@
+import io
+import re
+import threading
+
+import pytest
+
+import ruleset
+
+from data import default_settings
+from ruleset import (
+    FoldCase, GuardRules, PatternLint, ProfileRules, RequiredLiterals, RiskyReason, RuleGuard, RuleProfile, RuleSet)
+
+
+# 既定の設定の正規表現の種類
+CATEGORIES = [
+    "start_lines", "end_lines", "ignore_lines", "chart_start_lines", "header_lines",
+    "return_lines/possibility", "return_lines/ignore", "replace_parts/standard", "replace_parts/markdown"]
+
+# 正規表現をまとめたり、必ず含まれる文字列で絞り込んだりする処理を通すための、架空の正規表現
+SYNTHETIC_PATTERNS = [
+    (r"^Proceedings\b.*\d+", False),
+    (r"^arxiv:\d+\.\d+", True),
+    (r"doi\.org/\S+", True),
+    (r"^(Fig\.|Figure|Table)\s*\d+", False),
+    (r"Copyright \d{4}", False),
+    (r"^\s*\d+(\.\d+)*\s+[A-Z]", False),
+    (r"(\w)\1", False),
+    (r"licensed", True),
+    (r"^vol\.\s*\d+", True),
+    (r"[.?!]$", False),
+]
+
+LINES = [
+    "",
+    "Abstract",
+    "1 Introduction",
+    "1.2 Related Work",
+    "Fig. 3 shows the result.",
+    "Figure 12: Overview",
+    "Table 2",
+    "References",
+    "REFERENCES",
+    "Proceedings of the 2021 Conference, pp. 12",
+    "arXiv:2101.00001v2 [cs.CL] 1 Jan 2021",
+    "ARXIV:1234.5678",
+    "https://doi.org/10.1000/xyz123",
+    "Copyright 2020 by the authors.",
+    "Vol. 12, No. 3",
+    "This line ends with a sentence.",
+    "e.g. this is an abbreviation",
+    "Is this a question?",
+    "aabb cc",
+    "This work is Licensed under CC BY 4.0",
+    "  2.3.1 Results here",
+    "Kelvin sign K and long s ſ and dotless ı",
+    "日本語の行。",
+    "Acknowledgements",
+    "Appendix A",
+]
+
+
+def _Subsettings(name):
+    subsettings = default_settings["regular_expressions"]
+    for key in name.split("/"):
+        subsettings = subsettings[key]
+    return subsettings
+
+
+def _Lists(name):
+    if name == "synthetic":
+        patterns = [p for p, _ in SYNTHETIC_PATTERNS]
+        return [True] * len(patterns), [i for _, i in SYNTHETIC_PATTERNS], patterns, ["<" + str(i) + ">" for i in range(len(patterns))]
+    subsettings = _Subsettings(name)
+    return (
+        subsettings["list_bool_enabled"],
+        subsettings["list_bool_ignore_case"],
+        subsettings["list_str_pattern"],
+        subsettings.get("list_str_target"))
+
+
+def _ReferenceSearch(enabled_list, ignorecase_list, pattern_list, string):
+    """
+    まとめたり絞り込んだりせず、正規表現を一つずつ設定のリストの順に照合する
+    """
+    for i, pattern in enumerate(pattern_list):
+        if enabled_list[i] and re.search(pattern, string, re.IGNORECASE if ignorecase_list[i] else 0):
+            return i
+    return None
+
+
+def _ReferenceSub(enabled_list, ignorecase_list, pattern_list, target_list, string):
+    """
+    まとめたり絞り込んだりせず、正規表現を一つずつ設定のリストの順に置換する
+    """
+    for i, pattern in enumerate(pattern_list):
+        if enabled_list[i]:
+            string = re.sub(pattern, target_list[i], string, flags=re.IGNORECASE if ignorecase_list[i] else 0)
+    return string
+
+
+@pytest.mark.parametrize("name", CATEGORIES + ["synthetic"])
+def test_search_matches_uncombined_rules(name):
+    enabled_list, ignorecase_list, pattern_list, _ = _Lists(name)
+    rule_set = RuleSet(enabled_list, ignorecase_list, pattern_list, name=name)
+    for line in LINES:
+        rule = rule_set.Search(line)
+        assert (None if rule is None else rule.index) == _ReferenceSearch(enabled_list, ignorecase_list, pattern_list, line), line
+
+
+@pytest.mark.parametrize("name", CATEGORIES + ["synthetic"])
+def test_search_all_and_classify_match_uncombined_rules(name):
+    enabled_list, ignorecase_list, pattern_list, _ = _Lists(name)
+    rule_set = RuleSet(enabled_list, ignorecase_list, pattern_list, name=name)
+    for line in LINES:
+        expected = [
+            i for i, pattern in enumerate(pattern_list)
+            if enabled_list[i] and re.search(pattern, line, re.IGNORECASE if ignorecase_list[i] else 0)]
+        assert [rule.index for rule in rule_set.SearchAll(line)] == expected, line
+    expected = {i: _ReferenceSearch(enabled_list, ignorecase_list, pattern_list, line) for i, line in enumerate(LINES)}
+    assert {i: rule.index for i, rule in rule_set.Classify(LINES).items()} == {i: r for i, r in expected.items() if r is not None}
+
+
+@pytest.mark.parametrize("name", ["replace_parts/standard", "replace_parts/markdown", "synthetic"])
+def test_sub_and_sub_lines_match_uncombined_rules(name):
+    enabled_list, ignorecase_list, pattern_list, target_list = _Lists(name)
+    rule_set = RuleSet(enabled_list, ignorecase_list, pattern_list, target_list, name=name)
+    expected = [_ReferenceSub(enabled_list, ignorecase_list, pattern_list, target_list, line) for line in LINES]
+
+    assert [rule_set.Sub(line) for line in LINES] == expected
+
+    line_hits = []
+    for i, line in enumerate(LINES):
+        hits = []
+        rule_set.Sub(line, hits)
+        line_hits.extend((i, rule.index, source) for rule, source in hits)
+    hits = []
+    assert rule_set.SubLines(LINES, hits) == expected
+    assert [(i, rule.index, source) for i, rule, source in hits] == line_hits
+
+
+def test_sub_lines_falls_back_for_rules_spanning_lines():
+    # 行末や改行にヒットしうる正規表現は、まとめて置換しても行をまたがない
+    patterns = [r"\s+$", r"a\s*b", r"^$", r"x*"]
+    rule_set = RuleSet([True] * 4, [False] * 4, patterns, ["", "-", "(empty)", "_"])
+    lines = ["a", "b  ", "", "ab", "xx y"]
+    assert rule_set.SubLines(lines) == [rule_set.Sub(line) for line in lines]
+
+
+def test_disabled_rules_are_skipped():
+    rule_set = RuleSet([False, True], [False, False], [r"^Abstract", r"^Abs"])
+    assert rule_set.Search("Abstract").index == 1
+    assert [rule.index for rule in rule_set.rules] == [1]
+
+
+def test_required_literals():
+    assert RequiredLiterals(r"^\s*(Fig\.|Figure|Table)\s*\d+", False) == (("Fig.", False), ("Figure", False), ("Table", False))
+    # 大文字と小文字を区別しない場合は、小文字にした文字列が求まる
+    assert RequiredLiterals(r"^References$", True) == (("references", True),)
+    # 必ず含まれる文字列が無い場合や、不正な場合は求まらない
+    assert RequiredLiterals(r"^\d+$", False) is None
+    assert RequiredLiterals(r"a|\d", False) is None
+    assert RequiredLiterals(r"(", False) is None
+
+
+@pytest.mark.parametrize("pattern, ignorecase", [(p, i) for p, i in SYNTHETIC_PATTERNS] + [
+    (r"^References$", True), (r"(?i)abstract", False), (r"Fig(ure)?\.? \d", False), (r"colou?r", True)])
+def test_required_literals_are_contained_in_hits(pattern, ignorecase):
+    literals = RequiredLiterals(pattern, ignorecase)
+    if literals is None:
+        return
+    for line in LINES + ["Figure. 1", "COLOR", "colour", "fig 1"]:
+        if re.search(pattern, line, re.IGNORECASE if ignorecase else 0):
+            assert any((literal in FoldCase(line)) if folded else (literal in line) for literal, folded in literals), line
+
+
+@pytest.mark.parametrize("pattern", [
+    r"(a+)+$", r"(\w+\s?)*$", r"(ab|a.)*c", r"(x+x+)+y", r"^(\d+\.?)*$",
+    r"^(a|aa)+$", r"(.*,){11}P", r"(.*a){20}", r"^.*.*.*.*.*x$"])
+def test_risky_reason_flags_backtracking_patterns(pattern):
+    assert RiskyReason(pattern) is not None
+
+
+@pytest.mark.parametrize("pattern", [
+    r"^Abstract$", r"\d+(\.\d+)*\s", r"(ab|cd)*e", r"^\s*(Fig\.|Figure)\s*\d+", r"(", r"[a-z]+,\s[a-z]+",
+    r"(ab|a)*c", r"(\w+\s){3}", r"\s*\d+"])
+def test_risky_reason_accepts_safe_patterns(pattern):
+    assert RiskyReason(pattern) is None
+
+
+def test_pattern_lint_static():
+    assert PatternLint("(", False, measure=False).error is not None
+    lint = PatternLint(r"(a+)+$", False, measure=False)
+    assert lint.error is None and lint.costly and not lint.timed_out
+    assert not PatternLint(r"^Abstract$", False, measure=False).costly
+
+
+def test_pattern_lint_measures_in_worker():
+    # 照合が終わらない正規表現は、制限時間で打ち切られる
+    lint = PatternLint(r"^(a+)+$", False, time_budget=0.2)
+    assert lint.timed_out and lint.costly and lint.worst_string is not None
+    lint = PatternLint(r"^Abstract$", False, example="Abstract")
+    assert not lint.timed_out and not lint.costly
+    assert lint.worst_seconds < ruleset.SLOW_MATCH_SECONDS
+
+
+def test_guard_disables_rule_over_budget():
+    rule_set = RuleSet([True, True], [False, False], [r"^(a+)+$", r"^b"], name="Test")
+    guard = RuleGuard(0.2)
+    with GuardRules(guard):
+        assert rule_set.Search("aaaa").index == 0
+        assert rule_set.Search("a" * 40 + "!") is None
+        # 一度制限時間を超えた正規表現は、以降はヒットしないものとして扱う
+        assert rule_set.Search("aaaa") is None
+        assert rule_set.Search("b").index == 1
+    assert [(name, rule.index) for name, rule, _ in guard.timeouts] == [("Test", 0)]
+    # 抜けた後は制限しない
+    assert rule_set.Search("aaaa").index == 0
+
+
+def test_guard_falls_back_when_worker_does_not_start(monkeypatch):
+    class SilentProcess:
+        """
+        起動しても依頼を受け付けられるようにならないプロセス
+        """
+        def __init__(self, target, args, daemon):
+            pass
+
+        def start(self):
+            pass
+
+        def is_alive(self):
+            return False
+
+    monkeypatch.setattr(ruleset, "Process", SilentProcess)
+    monkeypatch.setattr(ruleset, "GUARD_START_TIMEOUT", 0.1)
+    monkeypatch.setattr(ruleset, "stderr", io.StringIO())
+    rule_set = RuleSet([True], [False], [r"^(a+)+$"], name="Test")
+    guard = RuleGuard(0.2)
+    with GuardRules(guard):
+        # 制限時間を設けずにこのプロセスで照合する
+        assert rule_set.Search("aaaa").index == 0
+        assert rule_set.Search("aaab") is None
+    assert guard.timeouts == []
+    # 起動し直そうとはせず、警告は一度だけ出す
+    assert ruleset.stderr.getvalue().count("did not start") == 1
+
+
+def test_profile_is_per_thread():
+    rule_set = RuleSet([True, True], [False, False], [r"^a", r"b$"], name="Test")
+    profiles = [RuleProfile(), RuleProfile()]
+    entered = threading.Barrier(2)
+    finished = threading.Event()
+
+    def Job(i):
+        with ProfileRules(profiles[i]):
+            entered.wait()
+            for _ in range(i + 1):
+                rule_set.Search("ab")
+            if i == 0:
+                # 先に抜けても、もう一方の計測は続く
+                return
+            finished.wait()
+            rule_set.Search("xb")
+
+    threads = [threading.Thread(target=Job, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    threads[0].join()
+    finished.set()
+    threads[1].join()
+
+    assert {key: stat[1] for key, stat in profiles[0].stats.items()} == {("Test", 0): 1}
+    assert {key: stat[1] for key, stat in profiles[1].stats.items()} == {("Test", 0): 3, ("Test", 1): 1}
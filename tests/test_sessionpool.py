@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+
+# deeplmanagerはGUIとウェブブラウザの操作に用いるライブラリをimportする
+pytest.importorskip("wx")
+pytest.importorskip("selenium")
+pytest.importorskip("webdriver_manager")
+
+
+class FakeManager:
+    """
+    ウェブブラウザを起動しないDeepLManagerの代わり
+    """
+    def __init__(self, browser):
+        self.browser = browser
+        self.tabs = 1
+        self.alive = True
+        self.closed = False
+
+    def isAlive(self):
+        return self.alive
+
+    def openDeepLPage(self, tab_index=0):
+        pass
+
+    def closeWindow(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool_factory(isolated_settings, monkeypatch):
+    import deeplmanager
+
+    Settings = isolated_settings
+    created = []
+
+    def Create():
+        manager = FakeManager(Settings().web_browser)
+        created.append(manager)
+        return manager
+
+    monkeypatch.setattr(deeplmanager, "DeepLManager", Create)
+    pools = []
+
+    def Factory(size=1, idle_secs=300):
+        pool = deeplmanager.SessionPool(size, idle_secs)
+        pools.append(pool)
+        return pool
+
+    yield Factory, created
+    for pool in pools:
+        pool.Close()
+
+
+def test_checkin_reuses_session(pool_factory):
+    Factory, created = pool_factory
+    pool = Factory()
+    with pool.Session() as first:
+        pass
+    with pool.Session() as second:
+        pass
+    assert first is second
+    assert len(created) == 1 and not first.closed
+
+
+def test_checkout_waits_when_pool_is_full(pool_factory):
+    Factory, created = pool_factory
+    pool = Factory(size=1)
+    first = pool.Checkout()
+    result = []
+    thread = threading.Thread(target=lambda: result.append(pool.Checkout()))
+    thread.start()
+    # 最大数まで貸し出し中なので、返されるまで待つ
+    thread.join(0.2)
+    assert thread.is_alive() and len(created) == 1
+    pool.Checkin(first)
+    thread.join(5)
+    assert result == [first]
+
+
+def test_dead_session_is_replaced(pool_factory):
+    Factory, created = pool_factory
+    pool = Factory()
+    with pool.Session() as first:
+        first.alive = False
+    with pool.Session() as second:
+        pass
+    assert second is not first
+    assert first.closed and len(created) == 2
+
+
+def test_reap_closes_idle_sessions(pool_factory):
+    Factory, created = pool_factory
+    pool = Factory(size=1, idle_secs=0)
+    with pool.Session() as first:
+        pass
+    pool.Reap()
+    assert first.closed
+    # 閉じた分だけ新たに作成できる
+    with pool.Session() as second:
+        pass
+    assert second is not first and len(created) == 2
+
+
+def test_close_discards_idle_and_returned_sessions(pool_factory):
+    Factory, _ = pool_factory
+    pool = Factory(size=2)
+    idle = pool.Checkout()
+    lent = pool.Checkout()
+    pool.Checkin(idle)
+    pool.Close()
+    assert idle.closed and not lent.closed
+    # 閉じた後に返されたものは閉じる
+    pool.Checkin(lent)
+    assert lent.closed